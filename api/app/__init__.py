@@ -15,7 +15,8 @@ load_dotenv()
 db = SQLAlchemy()
 jwt = JWTManager()
 
-def create_app(config_name=None):
+def create_app(config_name=None, config=None):
+    """config : valeurs qui remplacent la configuration par défaut (tests : base SQLite, dossier d'upload)"""
     app = Flask(__name__)
     
     # Configuration Flask
@@ -23,7 +24,8 @@ def create_app(config_name=None):
     
     # Configuration JWT
     app.config['JWT_SECRET_KEY'] = os.getenv('JWT_SECRET_KEY', 'jwt-secret')
-    app.config['JWT_ACCESS_TOKEN_EXPIRES'] = timedelta(hours=24)
+    app.config['JWT_ACCESS_TOKEN_EXPIRES'] = timedelta(minutes=int(os.getenv('JWT_ACCESS_TOKEN_MINUTES', 24 * 60)))
+    app.config['JWT_REFRESH_TOKEN_EXPIRES'] = timedelta(days=int(os.getenv('JWT_REFRESH_TOKEN_DAYS', 30)))
     
     # Configuration base de données
     DB_USERNAME = os.getenv('DB_USERNAME', 'root')
@@ -35,13 +37,57 @@ def create_app(config_name=None):
     app.config['SQLALCHEMY_DATABASE_URI'] = f'mysql+pymysql://{DB_USERNAME}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}'
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
     
+    # Fichiers envoyés (images de profil : app/services/image_store.py)
+    app.config['UPLOAD_FOLDER'] = os.getenv('UPLOAD_FOLDER', os.path.join(os.getcwd(), 'uploads'))
+    # Corps de requête refusé (413) avant d'être écrit sur disque par le parseur multipart
+    app.config['MAX_CONTENT_LENGTH'] = int(os.getenv('MAX_CONTENT_LENGTH', 16 * 1024 * 1024))
+    
+    if config:
+        app.config.update(config)
+    
     # Initialiser les extensions
     db.init_app(app)
     jwt.init_app(app)
     migrate = Migrate(app, db)
     
     # 🔧 CORS SIMPLE ET FONCTIONNEL - SANS CONFLIT
-    CORS(app)  # Configuration par défaut accepte tout
+    CORS(app, expose_headers=['X-Query-Count'])  # Configuration par défaut accepte tout
+    
+    # Comptage des requêtes SQL par requête HTTP (en-tête X-Query-Count)
+    from app.utils.query_counter import init_query_counter
+    init_query_counter(app)
+    
+    # Agrégats journaliers des courses, maintenus à chaque écriture
+    from app.services.stats_rollups import init_stats_rollups
+    init_stats_rollups(app)
+    
+    # Meilleurs temps par itinéraire (classements), maintenus à chaque écriture de course
+    from app.services.route_leaderboard import init_route_leaderboards
+    init_route_leaderboards(app)
+    
+    # Résumés par utilisateur (totaux, records, séries), maintenus à chaque écriture de course
+    from app.services.user_summary import init_user_summaries
+    init_user_summaries(app)
+    
+    # Utilisateur courant lu dans les claims du token (version vérifiée via un cache en mémoire)
+    from app.utils.auth import init_auth
+    init_auth(app, jwt)
+    
+    # Tokens révoqués (déconnexion, rotation) : filtre de Bloom + LRU devant la table token_blocklist
+    from app.services.token_revocation import init_token_revocation
+    init_token_revocation(app, jwt)
+    
+    # Dernières connexions et hash migrés écrits par lots en arrière-plan
+    from app.services.login_activity import init_login_activity
+    init_login_activity(app)
+    
+    # Positions GPS des courses en cours : vidage périodique des tampons et à l'arrêt du process
+    from app.services.gps_ingestion import init_gps_ingestion
+    init_gps_ingestion(app)
+    
+    # Traitement des images envoyées dans un pool de process
+    from app.services.image_pipeline import init_image_pipeline
+    init_image_pipeline(app)
     
     # Gestionnaires d'erreurs JWT
     @jwt.expired_token_loader
@@ -85,6 +131,7 @@ def create_app(config_name=None):
         from app.routes.admin import admin_bp
         from app.routes.dashboard import dashboard_bp
         from app.routes.upload import upload_bp
+        from app.routes.stats import stats_bp
         
         # Import du modèle stats_cache
         from app.models.stats_cache import StatsCache
@@ -95,46 +142,54 @@ def create_app(config_name=None):
         app.register_blueprint(admin_bp, url_prefix='/api/admin')
         app.register_blueprint(dashboard_bp, url_prefix='/api/dashboard')
         app.register_blueprint(upload_bp, url_prefix='/api/uploads')
+        app.register_blueprint(stats_bp, url_prefix='/api/stats')
         
         print("✅ Blueprints enregistrés avec succès")
     except ImportError as e:
         print(f"⚠️ Erreur import blueprints: {e}")
     
+    # Planificateur des tâches de cache dans ce process (SCHEDULER_MODE=thread), après
+    # l'import des blueprints qui déclarent les clés à garder chaudes
+    from app.tasks.scheduler import init_scheduler
+    init_scheduler(app)
+    
     # 🔧 Routes manquantes pour l'ApiScanner
     @app.route('/api/stats/global', methods=['GET'])
     @jwt_required(optional=True)
     def get_global_stats():
         try:
             from app.models.user import User
-            from app.models.run import Run
-            from sqlalchemy import func
-            
-            # Calculer les statistiques de base
-            total_users = db.session.query(func.count(User.id)).scalar() or 0
-            active_users = db.session.query(func.count(User.id)).filter(User.is_active == True).scalar() or 0
-            total_runs = db.session.query(func.count(Run.id)).scalar() or 0
-            
-            # Statistiques de distance
-            total_distance = db.session.query(func.sum(Run.distance)).scalar() or 0
+            from app.services.stats_rollups import user_rollup_totals, month_start
+            from sqlalchemy import func, case
             
-            # Statistiques temporelles
+            # Utilisateurs (table de petite taille) : une requête
             this_month_start = datetime.now().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-            runs_this_month = db.session.query(func.count(Run.id)).filter(Run.created_at >= this_month_start).scalar() or 0
-            distance_this_month = db.session.query(func.sum(Run.distance)).filter(Run.created_at >= this_month_start).scalar() or 0
-            new_users_this_month = db.session.query(func.count(User.id)).filter(User.created_at >= this_month_start).scalar() or 0
+            total_users, active_users, new_users_this_month = db.session.query(
+                func.count(User.id),
+                func.coalesce(func.sum(case((User.is_active == True, 1), else_=0)), 0),
+                func.coalesce(func.sum(case((User.created_at >= this_month_start, 1), else_=0)), 0)
+            ).one()
+            
+            # Courses : lues dans les agrégats journaliers
+            totals = user_rollup_totals()
+            month_totals = user_rollup_totals(day_from=month_start())
+            total_runs = totals['runs_count']
+            total_distance = totals['total_distance']
+            runs_this_month = month_totals['runs_count']
+            distance_this_month = month_totals['total_distance']
             
             return jsonify({
                 'status': 'success',
                 'stats': {
-                    'total_users': total_users,
-                    'active_users': active_users,
+                    'total_users': int(total_users or 0),
+                    'active_users': int(active_users or 0),
                     'total_runs': total_runs,
                     'total_routes': 0,
                     'total_distance': float(total_distance),
                     'average_pace': 0.0,
                     'runs_this_month': runs_this_month,
                     'distance_this_month': float(distance_this_month or 0),
-                    'new_users_this_month': new_users_this_month,
+                    'new_users_this_month': int(new_users_this_month or 0),
                     'active_routes': 0
                 }
             }), 200
@@ -177,11 +232,11 @@ def create_app(config_name=None):
     @jwt_required(optional=True)
     def get_runs_stats():
         try:
-            from app.models.run import Run
-            from sqlalchemy import func
+            from app.services.stats_rollups import user_rollup_totals
             
-            total_runs = db.session.query(func.count(Run.id)).scalar() or 0
-            total_distance = db.session.query(func.sum(Run.distance)).scalar() or 0
+            totals = user_rollup_totals()
+            total_runs = totals['runs_count']
+            total_distance = totals['total_distance']
             
             return jsonify({
                 'status': 'success',
@@ -261,6 +316,14 @@ def create_app(config_name=None):
             'error_code': 'NOT_FOUND'
         }), 404
 
+    @app.errorhandler(413)
+    def request_too_large(error):
+        return jsonify({
+            'status': 'error',
+            'message': 'Requête trop volumineuse',
+            'error_code': 'REQUEST_TOO_LARGE'
+        }), 413
+
     @app.errorhandler(500)
     def internal_error(error):
         return jsonify({
@@ -271,7 +334,7 @@ def create_app(config_name=None):
     
     print(f"✅ Application Flask créée avec succès")
     print(f"🔗 Base de données: {DB_HOST}:{DB_PORT}/{DB_NAME}")
-    print(f"🔐 JWT configuré avec expiration: 24h")
+    print(f"🔐 JWT configuré avec expiration: {app.config['JWT_ACCESS_TOKEN_EXPIRES']} (refresh: {app.config['JWT_REFRESH_TOKEN_EXPIRES']})")
     print(f"🌐 CORS configuré par défaut (accepte tout)")
     print(f"📊 Routes stats ajoutées")
     
@@ -0,0 +1,34 @@
+# app/models/distribution.py
+from app import db
+
+class _DistributionBinMixin:
+    """Nombre de courses d'un jour tombant dans un intervalle (bin) d'histogramme d'une métrique"""
+    id = db.Column(db.Integer, primary_key=True)
+    day = db.Column(db.Date, nullable=False)
+    metric = db.Column(db.String(20), nullable=False)  # pace, distance, heart_rate
+    bin = db.Column(db.Integer, nullable=False)  # index de l'intervalle, voir DISTRIBUTION_METRICS
+    count = db.Column(db.Integer, nullable=False, default=0)
+
+class UserDistributionBin(_DistributionBinMixin, db.Model):
+    __tablename__ = 'user_distribution_bins'
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'day', 'metric', 'bin', name='uq_user_distribution_bins_key'),
+        db.Index('ix_user_distribution_bins_metric_day', 'metric', 'day'),
+    )
+
+    user_id = db.Column(db.Integer, nullable=False)
+
+    def __repr__(self):
+        return f'<UserDistributionBin {self.metric}[{self.bin}] {self.day} - User {self.user_id}>'
+
+class RouteDistributionBin(_DistributionBinMixin, db.Model):
+    __tablename__ = 'route_distribution_bins'
+    __table_args__ = (
+        db.UniqueConstraint('route_id', 'day', 'metric', 'bin', name='uq_route_distribution_bins_key'),
+        db.Index('ix_route_distribution_bins_metric_day', 'metric', 'day'),
+    )
+
+    route_id = db.Column(db.Integer, nullable=False)
+
+    def __repr__(self):
+        return f'<RouteDistributionBin {self.metric}[{self.bin}] {self.day} - Route {self.route_id}>'
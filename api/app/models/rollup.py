@@ -0,0 +1,41 @@
+# app/models/rollup.py
+from app import db
+
+class _DailyRollupMixin:
+    """Agrégats journaliers des courses (jour = date UTC de start_time)"""
+    id = db.Column(db.Integer, primary_key=True)
+    day = db.Column(db.Date, nullable=False)
+    runs_count = db.Column(db.Integer, nullable=False, default=0)
+    total_distance = db.Column(db.Float, nullable=False, default=0)  # en mètres
+    total_duration = db.Column(db.Float, nullable=False, default=0)  # en secondes
+    duration_count = db.Column(db.Integer, nullable=False, default=0)  # courses avec durée renseignée
+    avg_speed_sum = db.Column(db.Float, nullable=False, default=0)  # somme des vitesses moyennes (km/h)
+    avg_speed_count = db.Column(db.Integer, nullable=False, default=0)
+    max_speed = db.Column(db.Float)  # en km/h
+    max_duration = db.Column(db.Float)  # en secondes
+    min_duration = db.Column(db.Float)  # en secondes
+    total_calories = db.Column(db.Integer, nullable=False, default=0)
+
+class UserDailyStats(_DailyRollupMixin, db.Model):
+    __tablename__ = 'user_daily_stats'
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'day', name='uq_user_daily_stats_user_id_day'),
+        db.Index('ix_user_daily_stats_day', 'day'),
+    )
+
+    user_id = db.Column(db.Integer, nullable=False)
+
+    def __repr__(self):
+        return f'<UserDailyStats {self.day} - User {self.user_id}>'
+
+class RouteDailyStats(_DailyRollupMixin, db.Model):
+    __tablename__ = 'route_daily_stats'
+    __table_args__ = (
+        db.UniqueConstraint('route_id', 'day', name='uq_route_daily_stats_route_id_day'),
+        db.Index('ix_route_daily_stats_day', 'day'),
+    )
+
+    route_id = db.Column(db.Integer, nullable=False)
+
+    def __repr__(self):
+        return f'<RouteDailyStats {self.day} - Route {self.route_id}>'
@@ -9,6 +9,10 @@ logger = logging.getLogger(__name__)
 
 class Route(db.Model):
     __tablename__ = 'routes'
+    __table_args__ = (
+        # Pagination par curseur (created_at, id)
+        db.Index('ix_routes_created_at_id', 'created_at', 'id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(255), nullable=False)
@@ -0,0 +1,22 @@
+# app/models/route_best_effort.py
+from app import db
+from datetime import datetime
+
+class RouteBestEffort(db.Model):
+    """Meilleur temps d'un utilisateur sur un itinéraire (une ligne par couple itinéraire / utilisateur)"""
+    __tablename__ = 'route_best_efforts'
+    __table_args__ = (
+        db.UniqueConstraint('route_id', 'user_id', name='uq_route_best_efforts_route_id_user_id'),
+        db.Index('ix_route_best_efforts_route_id_duration', 'route_id', 'duration'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    route_id = db.Column(db.Integer, nullable=False)
+    user_id = db.Column(db.Integer, nullable=False)
+    run_id = db.Column(db.Integer, db.ForeignKey('runs.id', ondelete='CASCADE'), nullable=False)
+    duration = db.Column(db.Float, nullable=False)  # en secondes
+    achieved_at = db.Column(db.DateTime)  # start_time de la course
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<RouteBestEffort route {self.route_id} - User {self.user_id}: {self.duration}s>'
@@ -1,9 +1,19 @@
 # api/app/models/run.py
 from app import db
 from datetime import datetime
+from app.utils.gps import parse_gps_data, dump_gps_data
 
 class Run(db.Model):
     __tablename__ = 'runs'
+    __table_args__ = (
+        # Pagination par curseur (start_time, id), globale et par utilisateur
+        db.Index('ix_runs_start_time_id', 'start_time', 'id'),
+        db.Index('ix_runs_user_id_start_time_id', 'user_id', 'start_time', 'id'),
+        # Courses du jour par itinéraire (plage sur start_time)
+        db.Index('ix_runs_route_id_start_time', 'route_id', 'start_time'),
+        # Courses en cours (registre des coureurs actifs)
+        db.Index('ix_runs_status', 'status'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
@@ -19,13 +29,21 @@ class Run(db.Model):
     calories_burned = db.Column(db.Integer)
     elevation_gain = db.Column(db.Float)  # en mètres
     status = db.Column(db.String(20), default='finished')  # in_progress, finished, paused
-    gps_data = db.Column(db.Text)  # JSON string des coordonnées GPS
+    gps_data = db.Column(db.Text)  # Trace GPS : format compact (gpsz2:) ou JSON, voir get_gps_points
     current_position = db.Column(db.Text)  # Position actuelle pour courses en cours
     weather_conditions = db.Column(db.Text)  # Conditions météo
     notes = db.Column(db.Text)  # Notes de l'utilisateur
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
+    def get_gps_points(self):
+        """Points GPS décodés, quel que soit le format stocké"""
+        return parse_gps_data(self.gps_data)
+    
+    def set_gps_points(self, points):
+        """Enregistre les points GPS au format de stockage courant"""
+        self.gps_data = dump_gps_data(points) if points else None
+    
     def to_dict(self):
         return {
             'id': self.id,
@@ -0,0 +1,65 @@
+# app/models/run_metrics.py
+from app import db
+from datetime import datetime
+
+class RunMetrics(db.Model):
+    """Métriques dérivées de la trace GPS d'une course (calculées une fois, en fin de course)"""
+    __tablename__ = 'run_metrics'
+
+    id = db.Column(db.Integer, primary_key=True)
+    run_id = db.Column(db.Integer, db.ForeignKey('runs.id', ondelete='CASCADE'), nullable=False, unique=True)
+    version = db.Column(db.Integer, nullable=False, default=1)
+    point_count = db.Column(db.Integer, nullable=False, default=0)
+    distance = db.Column(db.Float, nullable=False, default=0)  # en mètres (haversine)
+    elapsed_time = db.Column(db.Float)  # en secondes
+    moving_time = db.Column(db.Float)  # en secondes
+    max_speed = db.Column(db.Float)  # en km/h
+    avg_moving_speed = db.Column(db.Float)  # en km/h
+    elevation_gain = db.Column(db.Float)  # en mètres
+    elevation_loss = db.Column(db.Float)  # en mètres
+    best_1k = db.Column(db.Float)  # en secondes
+    best_5k = db.Column(db.Float)  # en secondes
+    best_10k = db.Column(db.Float)  # en secondes
+    splits = db.Column(db.JSON)  # [{km, distance, duration, pace}]
+    pace_series = db.Column(db.JSON)  # [[distance_m, allure_s_par_km]]
+    computed_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    run = db.relationship('Run', backref=db.backref('metrics', uselist=False, lazy=True, cascade='all, delete-orphan'))
+
+    def update_from(self, metrics):
+        for field in ('point_count', 'distance', 'elapsed_time', 'moving_time', 'max_speed',
+                      'avg_moving_speed', 'elevation_gain', 'elevation_loss', 'splits', 'pace_series'):
+            setattr(self, field, metrics[field])
+        self.best_1k = metrics['best_efforts']['1k']
+        self.best_5k = metrics['best_efforts']['5k']
+        self.best_10k = metrics['best_efforts']['10k']
+
+    def to_summary(self):
+        return {
+            'distance': round(self.distance, 1),
+            'elapsed_time': self.elapsed_time,
+            'moving_time': self.moving_time,
+            'max_speed': round(self.max_speed, 2) if self.max_speed is not None else None,
+            'avg_moving_speed': round(self.avg_moving_speed, 2) if self.avg_moving_speed is not None else None,
+            'elevation_gain': round(self.elevation_gain, 1) if self.elevation_gain is not None else None,
+            'elevation_loss': round(self.elevation_loss, 1) if self.elevation_loss is not None else None,
+            'best_efforts': {
+                '1k': self.best_1k,
+                '5k': self.best_5k,
+                '10k': self.best_10k
+            }
+        }
+
+    def to_dict(self):
+        data = self.to_summary()
+        data.update({
+            'run_id': self.run_id,
+            'point_count': self.point_count,
+            'splits': self.splits or [],
+            'pace_series': self.pace_series or [],
+            'computed_at': self.computed_at.isoformat() if self.computed_at else None
+        })
+        return data
+
+    def __repr__(self):
+        return f'<RunMetrics run {self.run_id}>'
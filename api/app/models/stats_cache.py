@@ -4,6 +4,9 @@ from datetime import datetime
 
 class StatsCache(db.Model):
     __tablename__ = 'stats_cache'
+    __table_args__ = (
+        db.Index('idx_expires_at', 'expires_at'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     cache_key = db.Column(db.String(100), unique=True, nullable=False)
@@ -11,6 +14,7 @@ class StatsCache(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     expires_at = db.Column(db.DateTime, nullable=False)
+    tags = db.Column(db.String(255))  # tags d'invalidation, format ",runs,users,"
     
     def __repr__(self):
         return f'<StatsCache {self.cache_key}>'
\ No newline at end of file
@@ -0,0 +1,20 @@
+# app/models/token_blocklist.py
+from app import db
+from datetime import datetime
+
+class TokenBlocklist(db.Model):
+    """Token JWT révoqué (déconnexion, rotation du refresh token), conservé jusqu'à son expiration"""
+    __tablename__ = 'token_blocklist'
+    __table_args__ = (
+        db.Index('ix_token_blocklist_expires_at', 'expires_at'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    jti = db.Column(db.String(36), nullable=False, unique=True, index=True)
+    token_type = db.Column(db.String(10), nullable=False)  # access, refresh
+    user_id = db.Column(db.Integer, nullable=True)
+    revoked_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    expires_at = db.Column(db.DateTime, nullable=False)
+
+    def __repr__(self):
+        return f'<TokenBlocklist {self.token_type} {self.jti}>'
@@ -0,0 +1,35 @@
+# app/models/track_lod.py
+from app import db
+from datetime import datetime
+
+class RunTrackLod(db.Model):
+    """Trace GPS simplifiée d'une course, précalculée par niveau de détail"""
+    __tablename__ = 'run_track_lods'
+    __table_args__ = (
+        db.UniqueConstraint('run_id', 'max_points', name='uq_run_track_lods_run_id_max_points'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    run_id = db.Column(db.Integer, db.ForeignKey('runs.id', ondelete='CASCADE'), nullable=False, index=True)
+    max_points = db.Column(db.Integer, nullable=False)  # niveau de détail (nombre de points visé)
+    point_count = db.Column(db.Integer, nullable=False)
+    source_points = db.Column(db.Integer, nullable=False)  # points de la trace complète
+    tolerance = db.Column(db.Float, nullable=False, default=0)  # écart maximal en mètres
+    polyline = db.Column(db.Text, nullable=False)  # Google Encoded Polyline (précision 5)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    run = db.relationship('Run', backref=db.backref('track_lods', lazy=True, cascade='all, delete-orphan'))
+
+    def to_dict(self):
+        return {
+            'max_points': self.max_points,
+            'points': self.point_count,
+            'source_points': self.source_points,
+            'tolerance': round(self.tolerance, 2),
+            'encoding': 'polyline',
+            'precision': 5,
+            'polyline': self.polyline
+        }
+
+    def __repr__(self):
+        return f'<RunTrackLod run {self.run_id} - {self.point_count} pts>'
@@ -1,12 +1,101 @@
 # api/app/models/user.py - SUPPORT DUAL HASHAGE
 from app import db
+from app.services.image_store import picture_url
 from datetime import datetime
 from werkzeug.security import generate_password_hash, check_password_hash
 import bcrypt
 import hashlib
+import os
+
+# KDF des nouveaux mots de passe (et des anciens hash md5/sha256 migrés à la connexion)
+PASSWORD_HASH_METHOD = os.getenv('PASSWORD_HASH_METHOD', 'pbkdf2:sha256:600000')
+
+def detect_hash_type(hash_value):
+    """Détecte le type de hashage utilisé"""
+    if not hash_value:
+        return "none"
+    
+    # Werkzeug/Flask standard
+    if hash_value.startswith('pbkdf2:') or hash_value.startswith('scrypt:'):
+        return "werkzeug"
+    
+    # BCrypt
+    if hash_value.startswith('$2a$') or hash_value.startswith('$2b$') or hash_value.startswith('$2y$'):
+        return "bcrypt"
+    
+    # SHA256 simple (format custom)
+    if len(hash_value) == 64 and all(c in '0123456789abcdef' for c in hash_value):
+        return "sha256"
+    
+    # MD5 simple
+    if len(hash_value) == 32 and all(c in '0123456789abcdef' for c in hash_value):
+        return "md5"
+    
+    return "unknown"
+
+def check_password(password_hash, password, label=''):
+    """
+    🔧 VÉRIFICATION UNIVERSELLE - Support multi-hashage.
+    Ne dépend que de ses arguments : exécutable hors du thread de la requête (app/services/password_pool.py)
+    """
+    if not password_hash or not password:
+        return False
+    
+    hash_type = detect_hash_type(password_hash)
+    print(f"🔍 {label}: Type de hash détecté = {hash_type}")
+    
+    try:
+        # 1. Werkzeug/Flask (méthode standard)
+        if hash_type == "werkzeug":
+            result = check_password_hash(password_hash, password)
+            print(f"✅ Werkzeug check: {result}")
+            return result
+        
+        # 2. BCrypt
+        elif hash_type == "bcrypt":
+            try:
+                result = bcrypt.checkpw(password.encode('utf-8'), password_hash.encode('utf-8'))
+                print(f"✅ BCrypt check: {result}")
+                return result
+            except Exception as e:
+                print(f"⚠️ BCrypt error: {e}")
+                return False
+        
+        # 3. SHA256 simple
+        elif hash_type == "sha256":
+            sha256_hash = hashlib.sha256(password.encode('utf-8')).hexdigest()
+            result = sha256_hash == password_hash
+            print(f"✅ SHA256 check: {result}")
+            return result
+        
+        # 4. MD5 simple
+        elif hash_type == "md5":
+            md5_hash = hashlib.md5(password.encode('utf-8')).hexdigest()
+            result = md5_hash == password_hash
+            print(f"✅ MD5 check: {result}")
+            return result
+        
+        # 5. Tentative avec Werkzeug sur hash inconnu
+        else:
+            print(f"🔄 Hash inconnu, tentative Werkzeug...")
+            try:
+                result = check_password_hash(password_hash, password)
+                print(f"✅ Werkzeug fallback: {result}")
+                return result
+            except:
+                print(f"❌ Aucune méthode ne fonctionne")
+                return False
+                
+    except Exception as e:
+        print(f"💥 Erreur vérification pour {label}: {e}")
+        return False
 
 class User(db.Model):
     __tablename__ = 'users'
+    __table_args__ = (
+        # Pagination par curseur (created_at, id)
+        db.Index('ix_users_created_at_id', 'created_at', 'id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     username = db.Column(db.String(64), unique=True, nullable=False, index=True)
@@ -18,9 +107,11 @@ class User(db.Model):
     height = db.Column(db.Float, nullable=True)
     weight = db.Column(db.Float, nullable=True)
     profile_picture = db.Column(db.String(255), nullable=True)
+    pending_picture = db.Column(db.String(64), nullable=True, index=True)  # empreinte de l'image en cours de traitement
     is_admin = db.Column(db.Boolean, default=False)
     is_active = db.Column(db.Boolean, default=True)
     last_login = db.Column(db.DateTime, nullable=True)
+    auth_version = db.Column(db.Integer, nullable=False, default=0)  # incrémentée à chaque changement de rôle, statut ou mot de passe
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
@@ -28,30 +119,11 @@ class User(db.Model):
     
     def detect_hash_type(self, hash_value):
         """Détecte le type de hashage utilisé"""
-        if not hash_value:
-            return "none"
-        
-        # Werkzeug/Flask standard
-        if hash_value.startswith('pbkdf2:'):
-            return "werkzeug"
-        
-        # BCrypt
-        if hash_value.startswith('$2a$') or hash_value.startswith('$2b$') or hash_value.startswith('$2y$'):
-            return "bcrypt"
-        
-        # SHA256 simple (format custom)
-        if len(hash_value) == 64 and all(c in '0123456789abcdef' for c in hash_value):
-            return "sha256"
-        
-        # MD5 simple
-        if len(hash_value) == 32 and all(c in '0123456789abcdef' for c in hash_value):
-            return "md5"
-        
-        return "unknown"
+        return detect_hash_type(hash_value)
     
     def set_password(self, password):
-        """Utilise Werkzeug par défaut pour les nouveaux mots de passe"""
-        self.password_hash = generate_password_hash(password)
+        """Utilise Werkzeug (PASSWORD_HASH_METHOD) pour les nouveaux mots de passe"""
+        self.password_hash = generate_password_hash(password, method=PASSWORD_HASH_METHOD)
     
     @property
     def password(self):
@@ -62,58 +134,15 @@ class User(db.Model):
         self.set_password(password)
     
     def verify_password(self, password):
-        """🔧 VÉRIFICATION UNIVERSELLE - Support multi-hashage"""
-        if not self.password_hash or not password:
-            return False
-        
-        hash_type = self.detect_hash_type(self.password_hash)
-        print(f"🔍 {self.username}: Type de hash détecté = {hash_type}")
-        
-        try:
-            # 1. Werkzeug/Flask (méthode standard)
-            if hash_type == "werkzeug":
-                result = check_password_hash(self.password_hash, password)
-                print(f"✅ Werkzeug check: {result}")
-                return result
-            
-            # 2. BCrypt
-            elif hash_type == "bcrypt":
-                try:
-                    result = bcrypt.checkpw(password.encode('utf-8'), self.password_hash.encode('utf-8'))
-                    print(f"✅ BCrypt check: {result}")
-                    return result
-                except Exception as e:
-                    print(f"⚠️ BCrypt error: {e}")
-                    return False
-            
-            # 3. SHA256 simple
-            elif hash_type == "sha256":
-                sha256_hash = hashlib.sha256(password.encode('utf-8')).hexdigest()
-                result = sha256_hash == self.password_hash
-                print(f"✅ SHA256 check: {result}")
-                return result
-            
-            # 4. MD5 simple
-            elif hash_type == "md5":
-                md5_hash = hashlib.md5(password.encode('utf-8')).hexdigest()
-                result = md5_hash == self.password_hash
-                print(f"✅ MD5 check: {result}")
-                return result
-            
-            # 5. Tentative avec Werkzeug sur hash inconnu
-            else:
-                print(f"🔄 Hash inconnu, tentative Werkzeug...")
-                try:
-                    result = check_password_hash(self.password_hash, password)
-                    print(f"✅ Werkzeug fallback: {result}")
-                    return result
-                except:
-                    print(f"❌ Aucune méthode ne fonctionne")
-                    return False
-                    
-        except Exception as e:
-            print(f"💥 Erreur vérification pour {self.username}: {e}")
-            return False
+        """Vérification synchrone (scripts) ; les routes passent par app/services/password_pool.py"""
+        return check_password(self.password_hash, password, self.username)
+    
+    def password_needs_rehash(self):
+        """Hash hérité (md5, sha256) ou KDF Werkzeug différente de PASSWORD_HASH_METHOD"""
+        hash_type = detect_hash_type(self.password_hash)
+        if hash_type in ('md5', 'sha256'):
+            return True
+        return hash_type == 'werkzeug' and not self.password_hash.startswith(PASSWORD_HASH_METHOD + '$')
     
     def get_hash_info(self):
         """Retourne des infos sur le hash actuel"""
@@ -134,7 +163,7 @@ class User(db.Model):
             'date_of_birth': self.date_of_birth.strftime('%Y-%m-%d') if self.date_of_birth else None,
             'height': self.height,
             'weight': self.weight,
-            'profile_picture': self.profile_picture,
+            'profile_picture': picture_url(self.profile_picture),
             'is_admin': self.is_admin,
             'is_active': self.is_active,
             'last_login': self.last_login.isoformat() if self.last_login else None,
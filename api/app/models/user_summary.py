@@ -0,0 +1,80 @@
+# app/models/user_summary.py
+from app import db
+from datetime import datetime, timedelta
+
+class UserSummary(db.Model):
+    """
+    Résumé d'un utilisateur (totaux, records, plus longue course, série hebdomadaire, mois en cours),
+    une ligne par utilisateur, lue par clé primaire
+    """
+    __tablename__ = 'user_summaries'
+
+    user_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    runs_count = db.Column(db.Integer, nullable=False, default=0)
+    total_distance = db.Column(db.Float, nullable=False, default=0)  # en mètres
+    total_duration = db.Column(db.Float, nullable=False, default=0)  # en secondes
+    avg_speed_sum = db.Column(db.Float, nullable=False, default=0)  # somme des vitesses moyennes (km/h)
+    avg_speed_count = db.Column(db.Integer, nullable=False, default=0)
+    max_speed = db.Column(db.Float)  # en km/h
+    total_calories = db.Column(db.Integer, nullable=False, default=0)
+    # Plus longue course terminée
+    longest_run_id = db.Column(db.Integer)
+    longest_run_distance = db.Column(db.Float)  # en mètres
+    longest_run_duration = db.Column(db.Float)  # en secondes
+    longest_run_at = db.Column(db.DateTime)
+    # Records par distance : {'5k': {'duration', 'run_id', 'achieved_at', 'estimated'}}
+    personal_records = db.Column(db.JSON)
+    # Série de semaines ISO consécutives avec au moins une course, jusqu'à last_active_week (lundi)
+    last_active_week = db.Column(db.Date)
+    current_week_streak = db.Column(db.Integer, nullable=False, default=0)
+    longest_week_streak = db.Column(db.Integer, nullable=False, default=0)
+    # Mois de la dernière course et ses totaux
+    month_start = db.Column(db.Date)
+    month_runs = db.Column(db.Integer, nullable=False, default=0)
+    month_distance = db.Column(db.Float, nullable=False, default=0)  # en mètres
+    month_duration = db.Column(db.Float, nullable=False, default=0)  # en secondes
+    first_run_at = db.Column(db.DateTime)
+    last_run_at = db.Column(db.DateTime)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def to_dict(self, today=None):
+        """Résumé à la date du jour : série et mois en cours remis à zéro s'ils sont révolus"""
+        today = today or datetime.utcnow().date()
+        this_week = today - timedelta(days=today.weekday())
+        last_week = self.last_active_week
+        streak_alive = last_week is not None and last_week >= this_week - timedelta(days=7)
+        current_month = self.month_start is not None and self.month_start == today.replace(day=1)
+
+        return {
+            'user_id': self.user_id,
+            'total_runs': self.runs_count or 0,
+            'total_distance': self.total_distance or 0,
+            'total_duration': self.total_duration or 0,
+            'avg_speed': (self.avg_speed_sum / self.avg_speed_count) if self.avg_speed_count else 0,
+            'max_speed': self.max_speed or 0,
+            'total_calories': self.total_calories or 0,
+            'longest_run': {
+                'run_id': self.longest_run_id,
+                'distance': self.longest_run_distance,
+                'duration': self.longest_run_duration,
+                'date': self.longest_run_at.isoformat() if self.longest_run_at else None
+            } if self.longest_run_id else None,
+            'personal_records': self.personal_records or {},
+            'streak': {
+                'current_weeks': self.current_week_streak if streak_alive else 0,
+                'longest_weeks': self.longest_week_streak or 0,
+                'active_this_week': last_week == this_week,
+                'last_active_week': last_week.isoformat() if last_week else None
+            },
+            'current_month': {
+                'runs': self.month_runs if current_month else 0,
+                'distance': self.month_distance if current_month else 0,
+                'duration': self.month_duration if current_month else 0
+            },
+            'first_run_at': self.first_run_at.isoformat() if self.first_run_at else None,
+            'last_run_at': self.last_run_at.isoformat() if self.last_run_at else None,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None
+        }
+
+    def __repr__(self):
+        return f'<UserSummary User {self.user_id}: {self.runs_count} runs>'
@@ -1,10 +1,18 @@
 # app/routes/admin.py
-from flask import Blueprint, jsonify
+from flask import Blueprint, jsonify, g
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from app import db
 from app.models.user import User
 from app.models.run import Run
 from app.models.route import Route
+from app.services.stats_engine import compute_admin_stats
+from app.utils.auth import get_current_user, user_cache
+from app.services.password_pool import kdf_pool
+from app.services.login_activity import login_activity
+from app.services.token_revocation import revocation_store
+from app.services.image_pipeline import image_pipeline
+from app.services.cache import stats_cache
+from app.tasks.scheduler import get_scheduler, SCHEDULER_STATUS_KEY
 from sqlalchemy import func, text
 from datetime import datetime, timedelta
 import json
@@ -12,115 +20,38 @@ import os
 
 admin_bp = Blueprint('admin', __name__)
 
+ADMIN_STATS_KEY = 'admin_stats'
+
+# Durée de validité des stats admin : supérieure à l'intervalle du planificateur (CACHE_WARM_INTERVAL_SECONDS)
+# pour que les requêtes lisent toujours une valeur chaude
+ADMIN_STATS_TTL = float(os.getenv('ADMIN_STATS_CACHE_TTL', 180))
+
 def get_cached_stats():
-    """Récupère les stats depuis le cache ou les calcule si expirées"""
+    """Récupère les stats depuis le cache (mémoire puis table stats_cache) ou les calcule"""
     try:
-        print("🔍 [CACHE] Vérification du cache stats...")
-        
-        # Vérifier le cache
-        cache_result = db.session.execute(
-            text("SELECT cache_data, expires_at FROM stats_cache WHERE cache_key = 'admin_stats' AND expires_at > NOW()")
-        ).fetchone()
-        
-        if cache_result:
-            print(f"✅ [CACHE] Cache valide trouvé, expire à {cache_result[1]}")
-            return json.loads(cache_result[0])
-        
-        print("⚠️ [CACHE] Cache expiré ou inexistant - recalcul nécessaire")
-        return calculate_and_cache_stats()
-        
+        return stats_cache.get(ADMIN_STATS_KEY, calculate_stats_direct, ttl=ADMIN_STATS_TTL)
     except Exception as e:
         print(f"❌ [CACHE] Erreur cache stats: {e}")
         return calculate_stats_direct()
 
 def calculate_and_cache_stats():
     """Calcule les stats et les met en cache"""
-    try:
-        print("🔄 [CALCUL] Début du calcul des statistiques...")
-        start_time = datetime.utcnow()
-        
-        stats = calculate_stats_direct()
-        
-        # Durée cache depuis .env (défaut: 5.0 secondes)
-        cache_duration_seconds = float(os.getenv('STATS_CACHE_DURATION_SECONDS', 5.0))
-        expires_at = datetime.utcnow() + timedelta(seconds=cache_duration_seconds)
-        
-        print(f"💾 [CACHE] Mise en cache pour {cache_duration_seconds}s (expire: {expires_at})")
-        
-        # Upsert cache
-        db.session.execute(text("""
-            INSERT INTO stats_cache (cache_key, cache_data, expires_at) 
-            VALUES ('admin_stats', :data, :expires)
-            ON DUPLICATE KEY UPDATE 
-            cache_data = :data, expires_at = :expires, updated_at = NOW()
-        """), {
-            'data': json.dumps(stats),
-            'expires': expires_at
-        })
-        
-        db.session.commit()
-        
-        duration = (datetime.utcnow() - start_time).total_seconds()
-        print(f"✅ [CACHE] Stats calculées et mises en cache en {duration:.2f}s")
-        print(f"📊 [STATS] Résultats: {stats}")
-        
-        return stats
-        
-    except Exception as e:
-        print(f"❌ [CALCUL] Erreur calcul/cache: {e}")
-        db.session.rollback()
-        return calculate_stats_direct()
+    return stats_cache.refresh(ADMIN_STATS_KEY, calculate_stats_direct, ttl=ADMIN_STATS_TTL)
 
 def calculate_stats_direct():
     """Calcul direct des statistiques (fallback)"""
     print("⚡ [CALCUL DIRECT] Début des requêtes SQL...")
     
-    now = datetime.utcnow()
-    start_of_month = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-    thirty_days_ago = now - timedelta(days=30)
-
-    print(f"📅 [DATES] Mois actuel: {start_of_month}, 30j ago: {thirty_days_ago}")
-
-    # Requêtes optimisées avec une seule requête par métrique
-    queries = {
-        'total_users': "SELECT COUNT(*) FROM users",
-        'active_users': f"SELECT COUNT(DISTINCT user_id) FROM runs WHERE start_time >= '{thirty_days_ago}'",
-        'new_users_this_month': f"SELECT COUNT(*) FROM users WHERE created_at >= '{start_of_month}'",
-        'total_runs': "SELECT COUNT(*) FROM runs",
-        'runs_this_month': f"SELECT COUNT(*) FROM runs WHERE start_time >= '{start_of_month}'",
-        'total_distance': "SELECT COALESCE(SUM(distance), 0) FROM runs",
-        'distance_this_month': f"SELECT COALESCE(SUM(distance), 0) FROM runs WHERE start_time >= '{start_of_month}'",
-        'total_routes': "SELECT COUNT(*) FROM routes",
-        'active_routes': "SELECT COUNT(*) FROM routes WHERE status = 'active'",
-        'avg_speed': "SELECT AVG(avg_speed) FROM runs WHERE avg_speed IS NOT NULL AND avg_speed > 0"
-    }
-
-    stats = {}
-    for key, query in queries.items():
-        try:
-            print(f"🔍 [SQL] Exécution: {key}")
-            result = db.session.execute(text(query)).scalar()
-            print(f"📊 [RESULT] {key}: {result}")
-            
-            if key == 'avg_speed':
-                stats['average_pace'] = round(60 / float(result), 2) if result and result > 0 else 0
-                print(f"🏃 [PACE] Conversion vitesse {result} km/h -> {stats['average_pace']} min/km")
-            else:
-                # Conversion distance en km
-                if 'distance' in key:
-                    converted = round(float(result or 0) / 1000, 1)
-                    stats[key] = converted
-                    print(f"📏 [DISTANCE] Conversion {result}m -> {converted}km")
-                else:
-                    stats[key] = int(result or 0)
-                    
-        except Exception as e:
-            print(f"❌ [SQL ERROR] {key}: {e}")
-            stats[key] = 0
-
+    stats, timings = compute_admin_stats()
+    g.stats_timings = timings
+    
+    print(f"⏱️ [SQL] Durées (ms): {timings}")
     print(f"✅ [CALCUL DIRECT] Terminé: {len(stats)} métriques calculées")
     return stats
 
+# Clé gardée chaude par le planificateur (app/tasks)
+stats_cache.register(ADMIN_STATS_KEY, calculate_stats_direct, ttl=ADMIN_STATS_TTL)
+
 @admin_bp.route('/stats', methods=['GET'])
 @jwt_required()
 def get_stats():
@@ -129,7 +60,7 @@ def get_stats():
         print("🚀 [ENDPOINT] /api/admin/stats appelé")
         
         current_user_id = get_jwt_identity()
-        current_user = User.query.get(current_user_id)
+        current_user = get_current_user()
         
         print(f"👤 [AUTH] User ID: {current_user_id}, Admin: {current_user.is_admin if current_user else 'N/A'}")
         
@@ -147,7 +78,8 @@ def get_stats():
         return jsonify({
             'success': True,
             'data': stats_data,
-            'cached': True,
+            'cached': 'stats_timings' not in g,
+            'timings': g.get('stats_timings'),
             'timestamp': datetime.utcnow().isoformat()
         }), 200
 
@@ -166,17 +98,12 @@ def refresh_stats():
         print("🔄 [REFRESH] Endpoint /refresh appelé")
         
         current_user_id = get_jwt_identity()
-        current_user = User.query.get(current_user_id)
+        current_user = get_current_user()
         
         if not current_user or not current_user.is_admin:
             print("🚫 [REFRESH] Accès refusé")
             return jsonify({'success': False, 'message': 'Accès refusé'}), 403
 
-        print("🗑️ [REFRESH] Suppression du cache existant...")
-        result = db.session.execute(text("DELETE FROM stats_cache WHERE cache_key = 'admin_stats'"))
-        print(f"🗑️ [CACHE] {result.rowcount} entrées supprimées")
-        db.session.commit()
-        
         print("🔄 [REFRESH] Recalcul forcé...")
         stats_data = calculate_and_cache_stats()
         
@@ -185,6 +112,7 @@ def refresh_stats():
             'success': True,
             'data': stats_data,
             'message': 'Statistiques recalculées',
+            'timings': g.get('stats_timings'),
             'timestamp': datetime.utcnow().isoformat()
         }), 200
         
@@ -193,4 +121,117 @@ def refresh_stats():
         return jsonify({
             'success': False,
             'message': 'Erreur lors du recalcul'
-        }), 500
\ No newline at end of file
+        }), 500
+
+@admin_bp.route('/stats/cache', methods=['GET'])
+@jwt_required()
+def get_stats_cache_metrics():
+    """Compteurs du cache de statistiques (hits, miss, durée des recalculs)"""
+    try:
+        current_user_id = get_jwt_identity()
+        current_user = get_current_user()
+        
+        if not current_user or not current_user.is_admin:
+            return jsonify({'success': False, 'message': 'Accès refusé'}), 403
+        
+        return jsonify({
+            'success': True,
+            'data': stats_cache.stats(),
+            'memory': stats_cache.memory_stats(),
+            'users': user_cache.stats(),
+            'timestamp': datetime.utcnow().isoformat()
+        }), 200
+        
+    except Exception as e:
+        print(f"❌ [CACHE METRICS ERROR] {e}")
+        return jsonify({
+            'success': False,
+            'message': 'Erreur lors de la récupération des compteurs du cache'
+        }), 500
+
+@admin_bp.route('/scheduler', methods=['GET'])
+@jwt_required()
+def get_scheduler_status():
+    """État du planificateur : dernière exécution, durée et échecs de chaque tâche"""
+    try:
+        current_user_id = get_jwt_identity()
+        current_user = get_current_user()
+        
+        if not current_user or not current_user.is_admin:
+            return jsonify({'success': False, 'message': 'Accès refusé'}), 403
+        
+        # Planificateur actif dans ce process (SCHEDULER_MODE=thread, verrou détenu), sinon dernier
+        # état publié par le process qui exécute les tâches (autre worker ou python -m app.tasks)
+        scheduler = get_scheduler()
+        in_process = scheduler is not None and scheduler.running
+        status = scheduler.status() if in_process else stats_cache.peek(SCHEDULER_STATUS_KEY)
+        
+        return jsonify({
+            'success': True,
+            'data': {
+                'in_process': in_process,
+                'scheduler': status,
+                'registered_keys': stats_cache.registered()
+            },
+            'timestamp': datetime.utcnow().isoformat()
+        }), 200
+        
+    except Exception as e:
+        print(f"❌ [SCHEDULER STATUS ERROR] {e}")
+        return jsonify({
+            'success': False,
+            'message': "Erreur lors de la récupération de l'état du planificateur"
+        }), 500
+
+@admin_bp.route('/auth/metrics', methods=['GET'])
+@jwt_required()
+def get_auth_metrics():
+    """File du pool de hashage (attente, refus), écritures de connexion en attente et cache des comptes"""
+    try:
+        current_user = get_current_user()
+        
+        if not current_user or not current_user.is_admin:
+            return jsonify({'success': False, 'message': 'Accès refusé'}), 403
+        
+        return jsonify({
+            'success': True,
+            'data': {
+                'kdf_pool': kdf_pool.stats(),
+                'login_activity': login_activity.stats(),
+                'user_cache': user_cache.stats(),
+                'token_revocation': revocation_store.stats()
+            },
+            'timestamp': datetime.utcnow().isoformat()
+        }), 200
+        
+    except Exception as e:
+        print(f"❌ [AUTH METRICS ERROR] {e}")
+        return jsonify({
+            'success': False,
+            'message': "Erreur lors de la récupération des métriques d'authentification"
+        }), 500
+
+@admin_bp.route('/images/metrics', methods=['GET'])
+@jwt_required()
+def get_image_metrics():
+    """Pool de traitement des images (jobs en attente, durée moyenne, refus)"""
+    try:
+        current_user = get_current_user()
+        
+        if not current_user or not current_user.is_admin:
+            return jsonify({'success': False, 'message': 'Accès refusé'}), 403
+        
+        return jsonify({
+            'success': True,
+            'data': {
+                'image_pipeline': image_pipeline.stats()
+            },
+            'timestamp': datetime.utcnow().isoformat()
+        }), 200
+        
+    except Exception as e:
+        print(f"❌ [IMAGE METRICS ERROR] {e}")
+        return jsonify({
+            'success': False,
+            'message': "Erreur lors de la récupération des métriques d'images"
+        }), 500
@@ -1,13 +1,33 @@
 # api/app/routes/auth.py
 from flask import Blueprint, request, jsonify, current_app
-from flask_jwt_extended import create_access_token, jwt_required, get_jwt_identity
-from datetime import timedelta, datetime
+from flask_jwt_extended import jwt_required, get_jwt_identity, get_jwt, decode_token
+from datetime import datetime
 from app import db
 from app.models.user import User
+from app.services.cache import invalidate_tags
+from app.utils.auth import create_user_token, create_user_refresh_token
+from app.services.password_pool import KdfPoolBusy, hash_password, verify_password, schedule_rehash
+from app.services.login_activity import login_activity
+from app.services.token_revocation import revoke_token
+import os
 import re
 
 auth_bp = Blueprint('auth', __name__)
 
+# Délai suggéré au client quand le pool de hashage est saturé
+BUSY_RETRY_AFTER_SECONDS = 1
+
+# Anciens clients : /refresh accepté avec un access token (révoqué à l'usage). Désactivé par défaut
+ALLOW_ACCESS_TOKEN_REFRESH = os.getenv('JWT_ALLOW_ACCESS_TOKEN_REFRESH', '0') == '1'
+
+def _busy_response():
+    """503 avec Retry-After : trop de calculs de mot de passe en attente"""
+    return jsonify({
+        "status": "error",
+        "message": "Serveur d'authentification saturé, réessayez dans un instant",
+        "error_code": "AUTH_BUSY"
+    }), 503, {'Retry-After': str(BUSY_RETRY_AFTER_SECONDS)}
+
 @auth_bp.route('/login', methods=['POST'])
 def login():
     """Authentification de l'utilisateur"""
@@ -55,8 +75,8 @@ def login():
         
         print(f"✅ Utilisateur trouvé: {user.username} (ID: {user.id})")
         
-        # Vérifier le mot de passe avec la méthode du modèle
-        if not user.verify_password(password):
+        # Vérifier le mot de passe dans le pool de hashage (hors du thread de la requête)
+        if not verify_password(user, password):
             print(f"❌ Mot de passe incorrect pour: {user.username}")
             return jsonify({
                 "status": "error",
@@ -75,27 +95,35 @@ def login():
                 "errors": {"account": "Votre compte a été désactivé"}
             }), 403
         
-        # Mettre à jour la dernière connexion
-        user.last_login = datetime.utcnow()
-        db.session.commit()
+        # Hash hérité (md5, sha256...) : migré vers la KDF configurée en arrière-plan
+        if user.password_needs_rehash():
+            schedule_rehash(user, password)
         
-        # Créer le token JWT avec identity en string
-        access_token = create_access_token(
-            identity=str(user.id),
-            expires_delta=timedelta(hours=24)
-        )
+        # Dernière connexion écrite par lot, hors de la requête
+        login_time = datetime.utcnow()
+        login_activity.record_login(user.id, login_time)
+        
+        # Token JWT avec identity en string et claims du compte (is_admin, is_active, ver)
+        access_token = create_user_token(user)
         
         print(f"✅ Connexion réussie: {user.username}")
         
+        user_data = user.to_dict()
+        user_data['last_login'] = login_time.isoformat()
+        
         return jsonify({
             "status": "success",
             "message": "Connexion réussie",
             "data": {
                 "access_token": access_token,
-                "user": user.to_dict()
+                "refresh_token": create_user_refresh_token(user),
+                "user": user_data
             }
         }), 200
         
+    except KdfPoolBusy:
+        print("⏳ Login refusé : pool de hashage saturé")
+        return _busy_response()
     except Exception as e:
         db.session.rollback()
         print(f"❌ Erreur login: {e}")
@@ -208,17 +236,15 @@ def register():
             is_admin=False
         )
         
-        # UTILISER set_password() au lieu du setter password
-        user.set_password(data['password'])
+        # Hash calculé dans le pool (PASSWORD_HASH_METHOD)
+        user.password_hash = hash_password(data['password'])
         
         db.session.add(user)
         db.session.commit()
+        invalidate_tags('users')
         
-        # Créer le token d'accès avec identity en string
-        access_token = create_access_token(
-            identity=str(user.id),
-            expires_delta=timedelta(hours=24)
-        )
+        # Créer le token d'accès avec identity en string et claims du compte
+        access_token = create_user_token(user)
         
         print(f"✅ Inscription réussie: {user.username}")
         
@@ -227,10 +253,14 @@ def register():
             "message": "Inscription réussie",
             "data": {
                 "user": user.to_dict(),
-                "access_token": access_token
+                "access_token": access_token,
+                "refresh_token": create_user_refresh_token(user)
             }
         }), 201
         
+    except KdfPoolBusy:
+        db.session.rollback()
+        return _busy_response()
     except Exception as e:
         db.session.rollback()
         print(f"❌ Erreur inscription: {e}")
@@ -273,7 +303,7 @@ def change_password():
                 "message": "Tous les champs sont requis"
             }), 400
         
-        if not user.verify_password(current_password):
+        if not verify_password(user, current_password):
             return jsonify({
                 "status": "error",
                 "message": "Mot de passe actuel incorrect"
@@ -292,14 +322,21 @@ def change_password():
             }), 400
         
         # Changer le mot de passe
-        user.set_password(new_password)
+        user.password_hash = hash_password(new_password)
         db.session.commit()
         
+        # Les tokens émis avant le changement sont invalidés (auth_version) : nouveau token pour cette session
         return jsonify({
             "status": "success",
-            "message": "Mot de passe modifié avec succès"
+            "message": "Mot de passe modifié avec succès",
+            "data": {
+                "access_token": create_user_token(user)
+            }
         }), 200
         
+    except KdfPoolBusy:
+        db.session.rollback()
+        return _busy_response()
     except Exception as e:
         db.session.rollback()
         return jsonify({
@@ -309,10 +346,15 @@ def change_password():
         }), 500
 
 @auth_bp.route('/refresh', methods=['POST'])
-@jwt_required()
+@jwt_required(refresh=True, verify_type=not ALLOW_ACCESS_TOKEN_REFRESH)
 def refresh():
-    """Rafraîchit le token JWT"""
+    """
+    Rafraîchit le token JWT avec un refresh token : rotation (le token présenté est révoqué,
+    un nouveau couple access/refresh est émis). Un refresh token déjà utilisé est refusé (401).
+    Avec JWT_ALLOW_ACCESS_TOKEN_REFRESH=1, un access token est aussi accepté (révoqué, nouvel access token seul).
+    """
     try:
+        claims = get_jwt()
         current_user_id = int(get_jwt_identity())
         user = User.query.get(current_user_id)
         
@@ -322,21 +364,27 @@ def refresh():
                 "message": "Utilisateur non valide"
             }), 401
         
-        # Créer un nouveau token avec identity en string
-        new_token = create_access_token(
-            identity=str(user.id),
-            expires_delta=timedelta(hours=24)
-        )
+        # Un token ne sert qu'une fois : seule la requête qui insère la révocation obtient de nouveaux tokens
+        if not revoke_token(claims):
+            return jsonify({
+                "status": "error",
+                "message": "Token révoqué",
+                "error_code": "TOKEN_REVOKED"
+            }), 401
+        
+        # Créer un nouveau token avec les claims à jour
+        data = {"access_token": create_user_token(user)}
+        if claims.get('type') == 'refresh':
+            data["refresh_token"] = create_user_refresh_token(user)
         
         return jsonify({
             "status": "success",
             "message": "Token rafraîchi",
-            "data": {
-                "access_token": new_token
-            }
+            "data": data
         }), 200
         
     except Exception as e:
+        db.session.rollback()
         return jsonify({
             "status": "error",
             "message": "Erreur lors du rafraîchissement",
@@ -372,10 +420,14 @@ def promote_admin():
         user.updated_at = datetime.utcnow()
         db.session.commit()
         
+        # Nouveau token portant is_admin (l'ancien est invalidé par auth_version)
+        data = user.to_dict()
+        data['access_token'] = create_user_token(user)
+        
         return jsonify({
             "status": "success",
             "message": f"Utilisateur {user.username} promu administrateur",
-            "data": user.to_dict()
+            "data": data
         }), 200
         
     except Exception as e:
@@ -392,13 +444,18 @@ def logout():
     """Déconnexion de l'utilisateur"""
     try:
         current_user_id = int(get_jwt_identity())
-        user = User.query.get(current_user_id)
-        
-        if user:
-            print(f"🚪 Déconnexion de: {user.username}")
-            # Optionnel: mettre à jour last_logout ou invalidate token côté serveur
-            # user.last_logout = datetime.utcnow()
-            # db.session.commit()
+        print(f"🚪 Déconnexion de l'utilisateur {current_user_id}")
+        
+        # Révocation du token présenté et, s'il est fourni, du refresh token de la session
+        revoke_token(get_jwt())
+        refresh_token = (request.get_json(silent=True) or {}).get('refresh_token')
+        if refresh_token:
+            try:
+                refresh_claims = decode_token(refresh_token)
+                if refresh_claims.get('sub') == str(current_user_id):
+                    revoke_token(refresh_claims)
+            except Exception as e:
+                print(f"⚠️ Refresh token ignoré au logout: {e}")
         
         return jsonify({
             "status": "success",
@@ -406,6 +463,7 @@ def logout():
         }), 200
         
     except Exception as e:
+        db.session.rollback()
         print(f"❌ Erreur logout: {e}")
         return jsonify({
             "status": "success", 
@@ -5,11 +5,14 @@ from datetime import datetime, timedelta
 from sqlalchemy import func, desc
 from app.models.user import User
 from app.models.run import Run
-from app.models.stats_cache import StatsCache
+from app.services.cache import cached_endpoint
+from app.services.stats_rollups import user_rollup_totals
 from app import db
 
 dashboard_bp = Blueprint('dashboard', __name__)
 
+OVERVIEW_CACHE_TTL = 120  # secondes
+
 def serialize_datetime(dt):
     """Helper pour sérialiser les datetime"""
     if dt is None:
@@ -18,6 +21,7 @@ def serialize_datetime(dt):
 
 @dashboard_bp.route('/overview', methods=['GET'])
 @jwt_required()
+@cached_endpoint('dashboard_overview', ttl=OVERVIEW_CACHE_TTL, tags=('runs', 'users'))
 def get_dashboard_overview():
     """
     Endpoint principal pour récupérer toutes les données du dashboard
@@ -30,9 +34,8 @@ def get_dashboard_overview():
         # Date de début pour la période
         start_date = datetime.utcnow() - timedelta(days=days)
         
-        # Statistiques générales - Simplifiées pour éviter les erreurs
+        # Statistiques générales
         total_users = User.query.count()
-        total_runs = Run.query.count()
         
         # Stats de base sans colonnes potentiellement manquantes
         try:
@@ -42,25 +45,14 @@ def get_dashboard_overview():
             # Si last_login n'existe pas, on compte tous les utilisateurs actifs
             active_users = User.query.filter(User.is_active == True).count()
         
-        try:
-            recent_runs = Run.query.filter(Run.start_time >= start_date).count()
-        except:
-            # Si start_time pose problème, prendre juste un nombre de base
-            recent_runs = Run.query.limit(100).count()
+        # Courses : agrégats journaliers (période arrondie au jour)
+        totals = user_rollup_totals()
+        period_totals = user_rollup_totals(day_from=start_date.date())
         
-        # Statistiques de performance - simplifiées
-        try:
-            avg_distance = db.session.query(func.avg(Run.distance)).filter(
-                Run.start_time >= start_date
-            ).scalar() or 0
-            
-            total_distance = db.session.query(func.sum(Run.distance)).filter(
-                Run.start_time >= start_date
-            ).scalar() or 0
-        except:
-            # Fallback si problème avec les dates
-            avg_distance = db.session.query(func.avg(Run.distance)).scalar() or 0
-            total_distance = db.session.query(func.sum(Run.distance)).scalar() or 0
+        total_runs = totals['runs_count']
+        recent_runs = period_totals['runs_count']
+        avg_distance = period_totals['avg_distance']
+        total_distance = period_totals['total_distance']
         
         # Formatage des réponses - simplifié
         response_data = {
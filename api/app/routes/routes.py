@@ -7,6 +7,12 @@ from app.models.route import Route
 from app.models.run import Run
 from app.models.user import User
 from app.utils.decorators import admin_required
+from app.utils.pagination import keyset_paginate, is_cursor_request, InvalidCursor
+from app.services.live_runs import live_runs
+from app.models.rollup import RouteDailyStats
+from app.services.stats_rollups import route_runs_count, route_rollup_totals
+from app.services.cache import invalidate_tags, cached_endpoint
+from app.services.route_leaderboard import leaderboards, DEFAULT_LIMIT, MAX_LIMIT
 from sqlalchemy import func, desc, and_
 from datetime import datetime, timedelta
 import json
@@ -20,6 +26,12 @@ logger = logging.getLogger(__name__)
 
 routes_bp = Blueprint('routes', __name__)
 
+ROUTES_STATS_CACHE_TTL = 300  # secondes
+
+def count_runs_today_by_route(route_ids):
+    """Nombre de courses démarrées aujourd'hui pour chaque itinéraire (agrégats journaliers)"""
+    return route_runs_count(route_ids, datetime.now().date())
+
 @routes_bp.route('', methods=['GET'])
 @jwt_required()
 def get_all_routes():
@@ -48,35 +60,53 @@ def get_all_routes():
         if difficulty:
             query = query.filter(Route.difficulty == difficulty)
         
-        # Pagination
-        routes = query.order_by(desc(Route.created_at)).paginate(
-            page=page, 
-            per_page=limit, 
-            error_out=False
-        )
+        if is_cursor_request(request.args):
+            # Mode curseur : pagination par (created_at, id), COUNT uniquement sur demande
+            try:
+                route_items, pagination = keyset_paginate(
+                    query,
+                    Route.created_at,
+                    Route.id,
+                    cursor=request.args.get('cursor') or None,
+                    limit=limit,
+                    with_total=request.args.get('with_total', 'false').lower() == 'true'
+                )
+            except InvalidCursor as e:
+                return jsonify({
+                    "status": "error",
+                    "message": "Curseur de pagination invalide",
+                    "error": str(e)
+                }), 400
+        else:
+            # Pagination
+            routes = query.order_by(desc(Route.created_at)).paginate(
+                page=page, 
+                per_page=limit, 
+                error_out=False
+            )
+            route_items = routes.items
+            pagination = {
+                "page": page,
+                "pages": routes.pages,
+                "per_page": limit,
+                "total": routes.total
+            }
+        
+        # Statistiques temps réel de la page : coureurs actifs depuis le registre en mémoire,
+        # courses du jour en une seule requête groupée (plage de dates indexable)
+        route_ids = [route.id for route in route_items]
+        active_runners = live_runs.active_runners(route_ids)
+        runs_today = count_runs_today_by_route(route_ids)
         
         # Enrichir avec les statistiques
         enriched_routes = []
-        for route in routes.items:
+        for route in route_items:
             try:
                 route_dict = route.to_dict()
                 
-                # Ajouter les statistiques temps réel
-                active_runs = Run.query.filter_by(
-                    route_id=route.id, 
-                    status='in_progress'
-                ).count()
-                
-                runs_today = Run.query.filter(
-                    and_(
-                        Run.route_id == route.id,
-                        func.date(Run.start_time) == datetime.now().date()
-                    )
-                ).count()
-                
                 route_dict.update({
-                    'active_runners': active_runs,
-                    'total_runs_today': runs_today
+                    'active_runners': active_runners.get(route.id, 0),
+                    'total_runs_today': runs_today.get(route.id, 0)
                 })
                 
                 enriched_routes.append(route_dict)
@@ -90,12 +120,7 @@ def get_all_routes():
             "status": "success",
             "data": {
                 "routes": enriched_routes,
-                "pagination": {
-                    "page": page,
-                    "pages": routes.pages,
-                    "per_page": limit,
-                    "total": routes.total
-                }
+                "pagination": pagination
             }
         }), 200
         
@@ -117,18 +142,13 @@ def get_route(route_id):
         route_dict = route.to_dict()
         
         # Ajouter les statistiques détaillées
-        stats = db.session.query(
-            func.count(Run.id).label('total_runs'),
-            func.avg(Run.duration).label('avg_duration'),
-            func.min(Run.duration).label('best_time'),
-            func.max(Run.duration).label('worst_time')
-        ).filter(Run.route_id == route_id).first()
+        stats = route_rollup_totals(route_id)
         
         route_dict['stats'] = {
-            'total_runs': stats.total_runs or 0,
-            'avg_duration': float(stats.avg_duration or 0),
-            'best_time': float(stats.best_time or 0),
-            'worst_time': float(stats.worst_time or 0)
+            'total_runs': stats['runs_count'],
+            'avg_duration': stats['avg_duration'],
+            'best_time': stats['min_duration'],
+            'worst_time': stats['max_duration']
         }
         
         return jsonify({
@@ -145,6 +165,61 @@ def get_route(route_id):
             "traceback": traceback.format_exc()
         }), 500
 
+@routes_bp.route('/<int:route_id>/leaderboard', methods=['GET'])
+@jwt_required()
+def get_route_leaderboard(route_id):
+    """
+    Classement d'un itinéraire : meilleur temps par utilisateur (top N), et rang d'un utilisateur
+    avec ?rank_of=<user_id> ou ?rank_of=me
+    """
+    try:
+        route = Route.query.get(route_id)
+        if not route:
+            return jsonify({
+                "status": "error",
+                "message": "Itinéraire non trouvé"
+            }), 404
+        
+        limit = min(max(request.args.get('limit', DEFAULT_LIMIT, type=int), 1), MAX_LIMIT)
+        rank_of = request.args.get('rank_of')
+        if rank_of == 'me':
+            rank_of = int(get_jwt_identity())
+        elif rank_of is not None:
+            try:
+                rank_of = int(rank_of)
+            except ValueError:
+                return jsonify({
+                    "status": "error",
+                    "message": "rank_of doit être un identifiant utilisateur ou 'me'"
+                }), 400
+        
+        data = leaderboards.leaderboard(route_id, limit=limit, rank_of=rank_of)
+        
+        # Noms des coureurs affichés : une requête sur les clés primaires
+        entries = data['leaderboard'] + ([data['rank_of']] if data['rank_of'] else [])
+        user_ids = {entry['user_id'] for entry in entries}
+        users = {
+            user.id: user for user in User.query.filter(User.id.in_(user_ids)).all()
+        } if user_ids else {}
+        for entry in entries:
+            user = users.get(entry['user_id'])
+            entry['username'] = user.username if user else None
+            entry['first_name'] = (user.first_name or '') if user else ''
+            entry['last_name'] = (user.last_name or '') if user else ''
+        
+        data['route_name'] = route.name
+        return jsonify({
+            "status": "success",
+            "data": data
+        }), 200
+        
+    except Exception as e:
+        logger.error(f"Erreur get_route_leaderboard: {e}")
+        return jsonify({
+            "status": "error",
+            "message": str(e)
+        }), 500
+
 @routes_bp.route('', methods=['POST'])
 @jwt_required()
 @admin_required
@@ -216,6 +291,7 @@ def create_route():
         
         db.session.add(route)
         db.session.commit()
+        invalidate_tags('routes')
         
         return jsonify({
             "status": "success",
@@ -287,6 +363,7 @@ def update_route(route_id):
             route.waypoints = json.dumps(data['waypoints']) if data['waypoints'] else None
         
         db.session.commit()
+        invalidate_tags('routes')
         
         return jsonify({
             "status": "success",
@@ -318,6 +395,7 @@ def delete_route(route_id):
             # Marquer comme inactif au lieu de supprimer
             route.status = 'inactive'
             db.session.commit()
+            invalidate_tags('routes')
             
             return jsonify({
                 "status": "success",
@@ -327,6 +405,7 @@ def delete_route(route_id):
             # Suppression réelle
             db.session.delete(route)
             db.session.commit()
+            invalidate_tags('routes')
             
             return jsonify({
                 "status": "success",
@@ -346,46 +425,13 @@ def delete_route(route_id):
 @routes_bp.route('/active-runs', methods=['GET'])
 @jwt_required()
 def get_active_runs():
-    """Récupère les courses actives"""
+    """Récupère les courses actives (servies depuis le registre en mémoire)"""
     try:
-        # Récupérer les runs avec status 'active' ou 'in_progress'
-        active_runs = Run.query.filter(
-            Run.status.in_(['active', 'in_progress'])
-        ).order_by(desc(Run.start_time)).all()
+        route_id = request.args.get('route_id', type=int)
         
-        runs_data = []
-        for run in active_runs:
-            try:
-                run_dict = run.to_dict()
-                
-                # Ajouter infos utilisateur de façon sécurisée
-                if run.user_id:
-                    user = User.query.get(run.user_id)
-                    if user:
-                        run_dict['user'] = {
-                            'id': user.id,
-                            'username': user.username,
-                            'first_name': user.first_name or '',
-                            'last_name': user.last_name or ''
-                        }
-                
-                # Ajouter infos route de façon sécurisée
-                if run.route_id:
-                    route = Route.query.get(run.route_id)
-                    if route:
-                        run_dict['route'] = {
-                            'id': route.id,
-                            'name': route.name or 'Route sans nom',
-                            'distance': route.distance or 0,
-                            'difficulty': route.difficulty or 'Facile'
-                        }
-                
-                runs_data.append(run_dict)
-                
-            except Exception as run_error:
-                logger.error(f"Erreur traitement run {run.id}: {run_error}")
-                logger.error(f"Traceback run: {traceback.format_exc()}")
-                continue
+        # Résumés utilisateur/itinéraire et dernière position déjà en mémoire :
+        # aucune requête SQL hors resynchronisation périodique
+        runs_data = live_runs.active_runs(route_id=route_id)
         
         return jsonify({
             "status": "success",
@@ -403,6 +449,7 @@ def get_active_runs():
 
 @routes_bp.route('/stats', methods=['GET'])
 @jwt_required()
+@cached_endpoint('routes_stats', ttl=ROUTES_STATS_CACHE_TTL, tags=('routes', 'runs'))
 def get_routes_stats():
     """Récupère les statistiques des itinéraires"""
     try:
@@ -413,8 +460,8 @@ def get_routes_stats():
         # Routes les plus populaires
         popular_routes = db.session.query(
             Route,
-            func.count(Run.id).label('run_count')
-        ).outerjoin(Run).group_by(Route.id).order_by(
+            func.coalesce(func.sum(RouteDailyStats.runs_count), 0).label('run_count')
+        ).outerjoin(RouteDailyStats, RouteDailyStats.route_id == Route.id).group_by(Route.id).order_by(
             desc('run_count')
         ).limit(5).all()
         
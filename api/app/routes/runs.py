@@ -1,18 +1,50 @@
 # api/app/routes/runs.py - CODE COMPLET CORRIGÉ
-from flask import Blueprint, request, jsonify, make_response
+from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from app import db
 from app.models.run import Run
 from app.models.user import User
 from app.models.route import Route
 from app.utils.decorators import admin_required
+from app.utils.auth import get_current_user
+from app.services.run_listing import build_run_listing_query, filter_runs_query
+from app.services.live_runs import live_runs, LIVE_STATUSES, LIVE_STATUS
+from app.services.gps_ingestion import gps_ingestion, TrackAccumulator
+from app.services.track_lod import get_run_track, track_thumbnails, track_points
+from app.services.run_analysis import get_run_metrics, metrics_summaries
+from app.services.run_service import finalize_run
+from app.services.stats_rollups import user_rollup_totals, month_start
+from app.services.cache import invalidate_tags
+from app.utils.gps import normalize_point, parse_gps_data
+from app.utils.gps_codec import polyline_payload, is_compact, CHUNK_SEPARATOR
+from app.utils.pagination import keyset_paginate, is_cursor_request, InvalidCursor
+from app.services.export_service import (
+    stream_query, stream_csv_response, stream_columnar_response,
+    columnar_format_available, iter_row_batches, to_column_arrays
+)
 from sqlalchemy import func, and_, desc, or_
 from datetime import datetime, timedelta
-import csv
-import io
 
 runs_bp = Blueprint('runs', __name__)
 
+# Formats de trace GPS proposés par l'API (?gps= / ?format=)
+GPS_RESPONSE_FORMATS = ('full', 'compact')
+
+def gps_response_payload(points, gps_format):
+    """Trace GPS au format demandé : liste complète ou polyline encodée + décalages temporels"""
+    if gps_format == 'compact':
+        return polyline_payload(points)
+    return {'coordinates': points}
+
+def parse_gps_points(raw):
+    """Points GPS normalisés d'un gps_data reçu (liste, {coordinates} ou chaîne JSON)"""
+    points = []
+    for point in parse_gps_data(raw):
+        normalized = normalize_point(point)
+        if normalized:
+            points.append(normalized)
+    return points
+
 # 🔧 NOUVEAU: Fonction helper pour normaliser les données de run
 def normalize_run_data(run_dict):
     """Normalise les données de run pour assurer la compatibilité frontend"""
@@ -57,13 +89,48 @@ def normalize_run_data(run_dict):
     
     return run_dict
 
+# Colonnes lues en base pour les exports colonnaires (unités de stockage)
+RUN_EXPORT_SOURCE_SCHEMA = [
+    ('id', 'int'), ('user_id', 'int'), ('username', 'string'),
+    ('route_id', 'int'), ('route_name', 'string'),
+    ('start_time', 'timestamp'), ('end_time', 'timestamp'),
+    ('distance', 'float'), ('duration', 'float'),
+    ('avg_speed', 'float'), ('max_speed', 'float'),
+    ('avg_heart_rate', 'int'), ('max_heart_rate', 'int'),
+    ('calories_burned', 'int'), ('elevation_gain', 'float'),
+    ('status', 'string')
+]
+
+# Colonnes exportées (unités d'affichage)
+RUN_EXPORT_SCHEMA = [
+    ('id', 'int'), ('user_id', 'int'), ('username', 'string'),
+    ('route_id', 'int'), ('route_name', 'string'),
+    ('start_time', 'timestamp'), ('end_time', 'timestamp'),
+    ('distance_km', 'float'), ('duration_min', 'float'),
+    ('avg_speed_kmh', 'float'), ('max_speed_kmh', 'float'),
+    ('avg_heart_rate', 'int'), ('max_heart_rate', 'int'),
+    ('calories_burned', 'int'), ('elevation_gain_m', 'float'),
+    ('status', 'string')
+]
+
+def iter_run_column_batches(query):
+    """Lots de colonnes typées avec conversion d'unités vectorisée (m -> km, s -> min)"""
+    for batch in iter_row_batches(query):
+        columns = to_column_arrays(batch, RUN_EXPORT_SOURCE_SCHEMA)
+        columns['distance_km'] = columns.pop('distance') / 1000.0
+        columns['duration_min'] = columns.pop('duration') / 60.0
+        columns['avg_speed_kmh'] = columns.pop('avg_speed')
+        columns['max_speed_kmh'] = columns.pop('max_speed')
+        columns['elevation_gain_m'] = columns.pop('elevation_gain')
+        yield columns
+
 @runs_bp.route('', methods=['GET'])
 @jwt_required()
 def get_all_runs():
     """Récupère toutes les courses avec filtres et pagination"""
     try:
         current_user_id = int(get_jwt_identity())
-        current_user = User.query.get(current_user_id)
+        current_user = get_current_user()
         
         page = request.args.get('page', 1, type=int)
         limit = request.args.get('limit', 10, type=int)
@@ -72,49 +139,69 @@ def get_all_runs():
         status = request.args.get('status', type=str)
         date_from = request.args.get('date_from', type=str)
         date_to = request.args.get('date_to', type=str)
+        include_track = request.args.get('include_track', 'false').lower() == 'true'
+        include_metrics = request.args.get('include_metrics', 'false').lower() == 'true'
+        
+        # Listing en une seule requête (utilisateur et itinéraire joints, sans gps_data)
+        query = filter_runs_query(
+            build_run_listing_query(),
+            current_user_id,
+            current_user.is_admin,
+            user_id=user_id,
+            route_id=route_id,
+            status=status,
+            date_from=date_from,
+            date_to=date_to
+        )
         
-        query = Run.query
-        
-        # Si pas admin, ne peut voir que ses propres courses
-        if not current_user.is_admin:
-            query = query.filter(Run.user_id == current_user_id)
-        elif user_id:
-            query = query.filter(Run.user_id == user_id)
-        
-        # Filtres
-        if route_id:
-            query = query.filter(Run.route_id == route_id)
-            
-        if status:
-            query = query.filter(Run.status == status)
-            
-        if date_from:
-            try:
-                date_from_obj = datetime.fromisoformat(date_from)
-                query = query.filter(Run.start_time >= date_from_obj)
-            except ValueError:
-                pass
-                
-        if date_to:
+        if is_cursor_request(request.args):
+            # Mode curseur : pagination par (start_time, id), COUNT uniquement sur demande
             try:
-                date_to_obj = datetime.fromisoformat(date_to)
-                query = query.filter(Run.start_time <= date_to_obj)
-            except ValueError:
-                pass
-        
-        # Pagination
-        runs = query.order_by(desc(Run.start_time)).paginate(
-            page=page,
-            per_page=limit,
-            error_out=False
-        )
+                run_items, pagination = keyset_paginate(
+                    query,
+                    Run.start_time,
+                    Run.id,
+                    cursor=request.args.get('cursor') or None,
+                    limit=limit,
+                    with_total=request.args.get('with_total', 'false').lower() == 'true'
+                )
+            except InvalidCursor as e:
+                return jsonify({
+                    "status": "error",
+                    "message": "Curseur de pagination invalide",
+                    "error": str(e)
+                }), 400
+        else:
+            # Pagination
+            runs = query.order_by(desc(Run.start_time)).paginate(
+                page=page,
+                per_page=limit,
+                error_out=False
+            )
+            run_items = runs.items
+            pagination = {
+                "page": page,
+                "pages": runs.pages,
+                "per_page": limit,
+                "total": runs.total
+            }
         
-        # Enrichir avec les données utilisateur et route
+        # Vignettes de trace (plus petit niveau de détail) en une requête
+        thumbnails = track_thumbnails([run.id for run in run_items]) if include_track else {}
+        summaries = metrics_summaries([run.id for run in run_items]) if include_metrics else {}
+        
+        # Enrichir avec les données utilisateur et route (déjà chargées par la jointure)
         enriched_runs = []
-        for run in runs.items:
+        for run in run_items:
             run_dict = run.to_dict()
             run_dict = normalize_run_data(run_dict)
             
+            if include_track:
+                run_dict['track'] = thumbnails.get(run.id)
+            
+            if include_metrics:
+                run_dict['metrics'] = summaries.get(run.id)
+            
             # Ajouter les infos utilisateur
             if run.user:
                 run_dict['user'] = {
@@ -137,12 +224,7 @@ def get_all_runs():
             "status": "success",
             "data": {
                 "runs": enriched_runs,
-                "pagination": {
-                    "page": page,
-                    "pages": runs.pages,
-                    "per_page": limit,
-                    "total": runs.total
-                }
+                "pagination": pagination
             }
         }), 200
         
@@ -159,7 +241,14 @@ def get_run(run_id):
     """Récupère une course spécifique avec normalisation"""
     try:
         current_user_id = int(get_jwt_identity())
-        current_user = User.query.get(current_user_id)
+        current_user = get_current_user()
+        
+        gps_format = request.args.get('gps')
+        if gps_format and gps_format not in GPS_RESPONSE_FORMATS:
+            return jsonify({
+                "status": "error",
+                "message": f"Format GPS non supporté (valeurs possibles : {', '.join(GPS_RESPONSE_FORMATS)})"
+            }), 400
         
         run = Run.query.get_or_404(run_id)
         
@@ -172,6 +261,14 @@ def get_run(run_id):
         
         run_dict = run.to_dict()
         
+        # Métriques dérivées de la trace (calculées en fin de course)
+        metrics = get_run_metrics(run)
+        run_dict['metrics'] = metrics.to_dict() if metrics else None
+        
+        # Trace GPS uniquement sur demande (?gps=full ou ?gps=compact)
+        if gps_format:
+            run_dict['gps_data'] = gps_response_payload(run.get_gps_points(), gps_format)
+        
         # Ajouter les données enrichies
         if run.user:
             run_dict['user'] = run.user.to_dict()
@@ -238,8 +335,15 @@ def create_run():
             end_time=datetime.fromisoformat(data['end_time']) if data.get('end_time') else None
         )
         
+        if data.get('gps_data'):
+            run.set_gps_points(parse_gps_points(data['gps_data']))
+        
         db.session.add(run)
         db.session.commit()
+        live_runs.sync_run(run)
+        if run.gps_data and run.status not in LIVE_STATUSES:
+            finalize_run(run)
+        invalidate_tags('runs')
         
         # 🔧 CORRECTION: Normaliser les données avant de les retourner
         run_dict = run.to_dict()
@@ -262,13 +366,369 @@ def create_run():
             "error": str(e)
         }), 500
 
+@runs_bp.route('/start', methods=['POST'])
+@jwt_required()
+def start_run():
+    """Démarre une course suivie en direct"""
+    try:
+        current_user_id = int(get_jwt_identity())
+        data = request.get_json(silent=True) or {}
+        
+        run = Run(
+            user_id=current_user_id,
+            route_id=data.get('route_id'),
+            distance=0,
+            status='in_progress',
+            weather_conditions=data.get('weather_conditions'),
+            notes=data.get('notes'),
+            start_time=datetime.fromisoformat(data['start_time']) if data.get('start_time') else datetime.utcnow()
+        )
+        
+        db.session.add(run)
+        db.session.commit()
+        invalidate_tags('runs')
+        
+        gps_ingestion.start_run(run.id)
+        live_runs.sync_run(run)
+        
+        # Position de départ éventuelle
+        initial_point = normalize_point(data.get('location') or data.get('position'))
+        if initial_point:
+            gps_ingestion.append(run.id, [initial_point])
+            live_runs.update_position(run.id, initial_point)
+        
+        print(f"🏁 Course {run.id} démarrée pour user {current_user_id}")
+        
+        return jsonify({
+            "status": "success",
+            "message": "Course démarrée",
+            "data": normalize_run_data(run.to_dict())
+        }), 201
+        
+    except Exception as e:
+        db.session.rollback()
+        print(f"❌ Erreur démarrage course: {e}")
+        return jsonify({
+            "status": "error",
+            "message": "Erreur lors du démarrage de la course",
+            "error": str(e)
+        }), 500
+
+@runs_bp.route('/<int:run_id>/locations', methods=['POST'])
+@jwt_required()
+def add_run_locations(run_id):
+    """Ajoute une ou plusieurs positions GPS à une course en cours (écriture par lots)"""
+    try:
+        current_user_id = int(get_jwt_identity())
+        data = request.get_json(silent=True)
+        
+        if not data:
+            return jsonify({
+                "status": "error",
+                "message": "Aucune donnée fournie"
+            }), 400
+        
+        # Un point, une liste de points, ou {locations: [...]}
+        if isinstance(data, list):
+            raw_points = data
+        else:
+            raw_points = data.get('locations') or data.get('coordinates') or [data]
+        
+        points = [point for point in map(normalize_point, raw_points) if point]
+        if not points:
+            return jsonify({
+                "status": "error",
+                "message": "Aucune position valide"
+            }), 400
+        
+        # Propriétaire lu dans le registre des courses en cours (pas de requête par position)
+        entry = live_runs.get(run_id)
+        if entry:
+            owner_id = entry['user_id']
+        else:
+            row = db.session.query(Run.user_id, Run.status).filter(Run.id == run_id).first()
+            if not row:
+                return jsonify({
+                    "status": "error",
+                    "message": "Course non trouvée"
+                }), 404
+            if row.status not in LIVE_STATUSES:
+                return jsonify({
+                    "status": "error",
+                    "message": "La course n'est pas en cours"
+                }), 409
+            owner_id = row.user_id
+        
+        if owner_id != current_user_id:
+            return jsonify({
+                "status": "error",
+                "message": "Accès non autorisé"
+            }), 403
+        
+        result = gps_ingestion.append(run_id, points)
+        live_runs.update_position(run_id, points[-1], distance=result['distance'])
+        
+        return jsonify({
+            "status": "success",
+            "message": "Positions enregistrées",
+            "data": result
+        }), 200
+        
+    except Exception as e:
+        db.session.rollback()
+        print(f"❌ Erreur positions course {run_id}: {e}")
+        return jsonify({
+            "status": "error",
+            "message": "Erreur lors de l'enregistrement des positions",
+            "error": str(e)
+        }), 500
+
+@runs_bp.route('/<int:run_id>/locations', methods=['GET'])
+@jwt_required()
+def get_run_locations(run_id):
+    """Récupère la trace GPS d'une course (points en attente inclus)"""
+    try:
+        current_user_id = int(get_jwt_identity())
+        current_user = get_current_user()
+        
+        gps_format = request.args.get('format', 'full')
+        if gps_format not in GPS_RESPONSE_FORMATS:
+            return jsonify({
+                "status": "error",
+                "message": f"Format GPS non supporté (valeurs possibles : {', '.join(GPS_RESPONSE_FORMATS)})"
+            }), 400
+        
+        owner_id = db.session.query(Run.user_id).filter(Run.id == run_id).scalar()
+        if owner_id is None:
+            return jsonify({
+                "status": "error",
+                "message": "Course non trouvée"
+            }), 404
+        
+        if not current_user.is_admin and owner_id != current_user_id:
+            return jsonify({
+                "status": "error",
+                "message": "Accès non autorisé"
+            }), 403
+        
+        gps_ingestion.flush(run_id)
+        gps_data = db.session.query(Run.gps_data).filter(Run.id == run_id).scalar()
+        points = parse_gps_data(gps_data)
+        
+        return jsonify({
+            "status": "success",
+            "data": points if gps_format == 'full' else gps_response_payload(points, gps_format)
+        }), 200
+        
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({
+            "status": "error",
+            "message": "Erreur lors de la récupération des positions",
+            "error": str(e)
+        }), 500
+
+@runs_bp.route('/<int:run_id>/track', methods=['GET'])
+@jwt_required()
+def get_run_track_lod(run_id):
+    """Trace simplifiée d'une course (?tolerance= en mètres ou ?max_points=)"""
+    try:
+        current_user_id = int(get_jwt_identity())
+        current_user = get_current_user()
+        
+        tolerance = request.args.get('tolerance', type=float)
+        max_points = request.args.get('max_points', type=int)
+        track_format = request.args.get('format', 'polyline')
+        
+        if tolerance is not None and tolerance < 0:
+            return jsonify({
+                "status": "error",
+                "message": "Tolérance invalide"
+            }), 400
+        
+        if max_points is not None and max_points < 2:
+            return jsonify({
+                "status": "error",
+                "message": "max_points doit être au moins 2"
+            }), 400
+        
+        if track_format not in ('polyline', 'full'):
+            return jsonify({
+                "status": "error",
+                "message": "Format non supporté (valeurs possibles : polyline, full)"
+            }), 400
+        
+        run = Run.query.get(run_id)
+        if not run:
+            return jsonify({
+                "status": "error",
+                "message": "Course non trouvée"
+            }), 404
+        
+        if not current_user.is_admin and run.user_id != current_user_id:
+            return jsonify({
+                "status": "error",
+                "message": "Accès non autorisé"
+            }), 403
+        
+        track = get_run_track(run, tolerance=tolerance, max_points=max_points)
+        if track is None:
+            return jsonify({
+                "status": "error",
+                "message": "Aucune trace GPS pour cette course"
+            }), 404
+        
+        if track_format == 'full':
+            track['coordinates'] = track_points(track)
+            del track['polyline']
+            track['encoding'] = 'coordinates'
+        
+        return jsonify({
+            "status": "success",
+            "data": track
+        }), 200
+        
+    except Exception as e:
+        return jsonify({
+            "status": "error",
+            "message": "Erreur lors de la récupération de la trace",
+            "error": str(e)
+        }), 500
+
+@runs_bp.route('/<int:run_id>/metrics', methods=['GET'])
+@jwt_required()
+def get_run_metrics_detail(run_id):
+    """Métriques dérivées d'une course : temps au km, allure, dénivelé, meilleurs efforts"""
+    try:
+        current_user_id = int(get_jwt_identity())
+        current_user = get_current_user()
+        
+        run = Run.query.get(run_id)
+        if not run:
+            return jsonify({
+                "status": "error",
+                "message": "Course non trouvée"
+            }), 404
+        
+        if not current_user.is_admin and run.user_id != current_user_id:
+            return jsonify({
+                "status": "error",
+                "message": "Accès non autorisé"
+            }), 403
+        
+        metrics = get_run_metrics(run)
+        if metrics is None:
+            return jsonify({
+                "status": "error",
+                "message": "Aucune métrique disponible pour cette course"
+            }), 404
+        
+        return jsonify({
+            "status": "success",
+            "data": metrics.to_dict()
+        }), 200
+        
+    except Exception as e:
+        return jsonify({
+            "status": "error",
+            "message": "Erreur lors de la récupération des métriques",
+            "error": str(e)
+        }), 500
+
+@runs_bp.route('/<int:run_id>/stop', methods=['POST'])
+@jwt_required()
+def stop_run(run_id):
+    """Termine une course en direct et calcule distance et vitesses depuis la trace"""
+    try:
+        current_user_id = int(get_jwt_identity())
+        current_user = get_current_user()
+        
+        run = Run.query.get_or_404(run_id)
+        
+        # Vérifier les permissions
+        if not current_user.is_admin and run.user_id != current_user_id:
+            return jsonify({
+                "status": "error",
+                "message": "Accès non autorisé"
+            }), 403
+        
+        if run.status not in LIVE_STATUSES:
+            return jsonify({
+                "status": "error",
+                "message": "La course n'est pas en cours"
+            }), 409
+        
+        data = request.get_json(silent=True) or {}
+        
+        # Statistiques incrémentales du tampon seulement si la trace stockée est le seul morceau
+        # écrit par ce process ; sinon (morceaux d'autres workers, trace JSON) recalcul sur la trace
+        accumulator = gps_ingestion.finish(run_id)
+        stored = run.gps_data or ''
+        if (accumulator is None or not accumulator.point_count
+                or not is_compact(stored) or CHUNK_SEPARATOR in stored):
+            points = run.get_gps_points()
+            accumulator = TrackAccumulator.from_points(points)
+            # Morceaux ajoutés pendant la course réécrits en une seule trace compacte
+            run.set_gps_points(points)
+        
+        run.end_time = datetime.fromisoformat(data['end_time']) if data.get('end_time') else datetime.utcnow()
+        
+        if accumulator.point_count >= 2:
+            run.distance = round(accumulator.distance_m, 1)
+        elif data.get('distance'):
+            run.distance = float(data['distance'])
+        
+        if data.get('duration'):
+            run.duration = int(data['duration'])
+        else:
+            run.duration = int((run.end_time - run.start_time).total_seconds())
+        
+        if run.distance and run.duration:
+            run.avg_speed = round((run.distance / 1000) / (run.duration / 3600), 2)
+        
+        if accumulator.max_speed_kmh:
+            run.max_speed = round(accumulator.max_speed_kmh, 2)
+        
+        # Données complémentaires envoyées par le client
+        for field in ['avg_heart_rate', 'max_heart_rate', 'elevation_gain', 'notes', 'weather_conditions']:
+            if field in data:
+                setattr(run, field, data[field])
+        
+        calories = data.get('calories') or data.get('calories_burned')
+        if calories:
+            run.calories_burned = calories
+        
+        run.status = 'finished'
+        run.updated_at = datetime.utcnow()
+        db.session.commit()
+        live_runs.run_stopped(run_id)
+        finalize_run(run)
+        invalidate_tags('runs')
+        
+        print(f"🏁 Course {run_id} terminée: {run.distance}m en {run.duration}s")
+        
+        return jsonify({
+            "status": "success",
+            "message": "Course terminée",
+            "data": normalize_run_data(run.to_dict())
+        }), 200
+        
+    except Exception as e:
+        db.session.rollback()
+        print(f"❌ Erreur arrêt course {run_id}: {e}")
+        return jsonify({
+            "status": "error",
+            "message": "Erreur lors de l'arrêt de la course",
+            "error": str(e)
+        }), 500
+
 @runs_bp.route('/<int:run_id>', methods=['PUT'])
 @jwt_required()
 def update_run(run_id):
     """Met à jour une course"""
     try:
         current_user_id = int(get_jwt_identity())
-        current_user = User.query.get(current_user_id)
+        current_user = get_current_user()
         
         run = Run.query.get_or_404(run_id)
         
@@ -316,6 +776,8 @@ def update_run(run_id):
         
         run.updated_at = datetime.utcnow()
         db.session.commit()
+        live_runs.sync_run(run)
+        invalidate_tags('runs')
         
         # Normaliser les données de retour
         run_dict = run.to_dict()
@@ -341,7 +803,7 @@ def delete_run(run_id):
     """Supprime une course"""
     try:
         current_user_id = int(get_jwt_identity())
-        current_user = User.query.get(current_user_id)
+        current_user = get_current_user()
         
         run = Run.query.get_or_404(run_id)
         
@@ -354,6 +816,9 @@ def delete_run(run_id):
         
         db.session.delete(run)
         db.session.commit()
+        invalidate_tags('runs')
+        live_runs.run_stopped(run_id)
+        gps_ingestion.discard(run_id)
         
         return jsonify({
             "status": "success",
@@ -402,6 +867,10 @@ def bulk_delete_runs():
                 errors.append(f"Course {run.id}: {str(e)}")
         
         db.session.commit()
+        invalidate_tags('runs')
+        
+        for run_id in run_ids:
+            live_runs.run_stopped(run_id)
         
         message = f"{deleted_count} course(s) supprimée(s)"
         if errors:
@@ -427,83 +896,121 @@ def bulk_delete_runs():
 @runs_bp.route('/export', methods=['GET'])
 @jwt_required()
 def export_runs():
-    """Exporte les courses en CSV"""
+    """Exporte les courses en CSV, NDJSON, Arrow ou Parquet (réponse streamée, mémoire constante)"""
     try:
         current_user_id = int(get_jwt_identity())
-        current_user = User.query.get(current_user_id)
+        current_user = get_current_user()
         
         # Paramètres d'export
         user_id = request.args.get('user_id', type=int)
         date_from = request.args.get('date_from', type=str)
         date_to = request.args.get('date_to', type=str)
-        
-        query = Run.query
+        export_format = request.args.get('format', 'csv', type=str).lower()
+        
+        if export_format != 'csv':
+            if not columnar_format_available(export_format):
+                return jsonify({
+                    "status": "error",
+                    "message": f"Format d'export non disponible: {export_format}",
+                    "formats": ['csv', 'ndjson', 'arrow', 'parquet']
+                }), 400
+            
+            # Colonnes brutes typées, converties par lots
+            query = db.session.query(
+                Run.id,
+                Run.user_id,
+                User.username,
+                Run.route_id,
+                Route.name.label('route_name'),
+                Run.start_time,
+                Run.end_time,
+                Run.distance,
+                Run.duration,
+                Run.avg_speed,
+                Run.max_speed,
+                Run.avg_heart_rate,
+                Run.max_heart_rate,
+                Run.calories_burned,
+                Run.elevation_gain,
+                Run.status
+            ).outerjoin(User, Run.user_id == User.id).outerjoin(Route, Run.route_id == Route.id)
+            
+            query = filter_runs_query(
+                query,
+                current_user_id,
+                current_user.is_admin,
+                user_id=user_id,
+                date_from=date_from,
+                date_to=date_to
+            ).order_by(desc(Run.start_time))
+            
+            return stream_columnar_response(
+                iter_run_column_batches(query),
+                RUN_EXPORT_SCHEMA,
+                export_format,
+                'courses'
+            )
+        
+        # Noms d'utilisateur et d'itinéraire joints en SQL, uniquement les colonnes exportées
+        query = db.session.query(
+            Run.id,
+            User.username,
+            Route.name.label('route_name'),
+            Run.start_time,
+            Run.distance,
+            Run.duration,
+            Run.avg_speed,
+            Run.max_speed,
+            Run.avg_heart_rate,
+            Run.max_heart_rate,
+            Run.calories_burned,
+            Run.elevation_gain,
+            Run.status,
+            Run.notes
+        ).outerjoin(User, Run.user_id == User.id).outerjoin(Route, Run.route_id == Route.id)
         
         # Si pas admin, ne peut exporter que ses propres courses
-        if not current_user.is_admin:
-            query = query.filter(Run.user_id == current_user_id)
-        elif user_id:
-            query = query.filter(Run.user_id == user_id)
-        
-        # Filtres de date
-        if date_from:
-            try:
-                date_from_obj = datetime.fromisoformat(date_from)
-                query = query.filter(Run.start_time >= date_from_obj)
-            except ValueError:
-                pass
-                
-        if date_to:
-            try:
-                date_to_obj = datetime.fromisoformat(date_to)
-                query = query.filter(Run.start_time <= date_to_obj)
-            except ValueError:
-                pass
+        query = filter_runs_query(
+            query,
+            current_user_id,
+            current_user.is_admin,
+            user_id=user_id,
+            date_from=date_from,
+            date_to=date_to
+        )
         
-        runs = query.order_by(desc(Run.start_time)).all()
+        query = query.order_by(desc(Run.start_time))
         
-        # Générer le CSV
-        output = io.StringIO()
-        writer = csv.writer(output)
+        def generate_rows():
+            for run in stream_query(query):
+                duration_min = round(run.duration / 60, 1) if run.duration else ''
+                
+                yield [
+                    run.id,
+                    run.username or 'Inconnu',
+                    run.route_name or 'Libre',
+                    run.start_time.strftime('%Y-%m-%d %H:%M'),
+                    run.distance / 1000 if run.distance else 0,
+                    duration_min,
+                    run.avg_speed or '',
+                    run.max_speed or '',
+                    run.avg_heart_rate or '',
+                    run.max_heart_rate or '',
+                    run.calories_burned or '',
+                    run.elevation_gain or '',
+                    run.status,
+                    run.notes or ''
+                ]
         
         # En-têtes
-        writer.writerow([
+        header = [
             'ID', 'Utilisateur', 'Itinéraire', 'Date', 'Distance (km)',
             'Durée (min)', 'Vitesse moy. (km/h)', 'Vitesse max (km/h)',
             'FC moy. (bpm)', 'FC max (bpm)', 'Calories', 'Dénivelé (m)',
             'Statut', 'Notes'
-        ])
+        ]
         
-        # Données
-        for run in runs:
-            user_name = run.user.username if run.user else 'Inconnu'
-            route_name = run.route.name if run.route else 'Libre'
-            duration_min = round(run.duration / 60, 1) if run.duration else ''
-            
-            writer.writerow([
-                run.id,
-                user_name,
-                route_name,
-                run.start_time.strftime('%Y-%m-%d %H:%M'),
-                run.distance / 1000 if run.distance else 0,
-                duration_min,
-                run.avg_speed or '',
-                run.max_speed or '',
-                run.avg_heart_rate or '',
-                run.max_heart_rate or '',
-                run.calories_burned or '',
-                run.elevation_gain or '',
-                run.status,
-                run.notes or ''
-            ])
-        
-        output.seek(0)
-        
-        response = make_response(output.getvalue())
-        response.headers['Content-Type'] = 'text/csv; charset=utf-8'
-        response.headers['Content-Disposition'] = f'attachment; filename=courses_{datetime.now().strftime("%Y%m%d_%H%M")}.csv'
-        
-        return response
+        return stream_csv_response(header, generate_rows(), 'courses')
         
     except Exception as e:
         return jsonify({
@@ -518,25 +1025,23 @@ def get_runs_summary():
     """Récupère un résumé des statistiques des courses"""
     try:
         current_user_id = int(get_jwt_identity())
-        current_user = User.query.get(current_user_id)
-        
-        # Si admin, stats globales, sinon stats personnelles
-        if current_user.is_admin:
-            query = Run.query
-        else:
-            query = Run.query.filter(Run.user_id == current_user_id)
-        
-        # Statistiques générales
-        total_runs = query.count()
-        total_distance = query.with_entities(func.sum(Run.distance)).scalar() or 0
-        avg_distance = query.with_entities(func.avg(Run.distance)).scalar() or 0
-        
-        # Courses ce mois
-        current_month = datetime.now().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-        runs_this_month = query.filter(Run.start_time >= current_month).count()
-        
-        # Courses en cours
-        active_runs = query.filter(Run.status == 'in_progress').count()
+        current_user = get_current_user()
+        
+        # Si admin, stats globales, sinon stats personnelles (agrégats journaliers)
+        user_id = None if current_user.is_admin else current_user_id
+        totals = user_rollup_totals(user_id=user_id)
+        month_totals = user_rollup_totals(user_id=user_id, day_from=month_start())
+        
+        total_runs = totals['runs_count']
+        total_distance = totals['total_distance']
+        avg_distance = totals['avg_distance']
+        runs_this_month = month_totals['runs_count']
+        
+        # Courses en cours (registre en mémoire)
+        active_runs = sum(
+            1 for entry in live_runs.active_runs()
+            if entry['status'] == LIVE_STATUS and (user_id is None or entry['user_id'] == user_id)
+        )
         
         return jsonify({
             "status": "success",
@@ -1,39 +1,36 @@
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from app.models.stats import get_user_stats
-from app.models.run import Run
-from app import db
-from sqlalchemy import func
+from app.utils.auth import get_current_user
+from app.services.stats_rollups import user_rollup_daily, user_rollup_totals
+from app.services.stats_series import build_series, default_range, SeriesError, BUCKETS
+from app.services.stats_distribution import distribution, DISTRIBUTION_METRICS
 from datetime import datetime, timedelta
 
 stats_bp = Blueprint('stats', __name__)
 
 @stats_bp.route('/weekly', methods=['GET'])
+@jwt_required()
 def get_weekly_stats():
     try:
         today = datetime.utcnow()
         start_of_week = today - timedelta(days=today.weekday())
         start_of_week = start_of_week.replace(hour=0, minute=0, second=0, microsecond=0)
         
+        # Une requête sur les agrégats journaliers pour les 7 jours de la semaine
+        daily = user_rollup_daily(day_from=start_of_week.date(), day_to=(start_of_week + timedelta(days=6)).date())
+        
         days = []
         for i in range(7):
             day = start_of_week + timedelta(days=i)
-            next_day = day + timedelta(days=1)
-            
-            day_runs = Run.query.filter(
-                Run.start_time >= day,
-                Run.start_time < next_day
-            ).all()
-            
-            day_distance = sum(float(run.distance) for run in day_runs if run.distance) if day_runs else 0
-            day_duration = sum(run.duration for run in day_runs if run.duration) if day_runs else 0
+            totals = daily.get(day.date())
             
             days.append({
                 'date': day.strftime('%Y-%m-%d'),
                 'day_name': day.strftime('%A'),
-                'runs_count': len(day_runs),
-                'distance': day_distance,
-                'duration': day_duration
+                'runs_count': totals['runs_count'] if totals else 0,
+                'distance': totals['total_distance'] if totals else 0,
+                'duration': int(totals['total_duration']) if totals else 0
             })
         
         return jsonify({
@@ -47,6 +44,7 @@ def get_weekly_stats():
         }), 500
 
 @stats_bp.route('/monthly', methods=['GET'])
+@jwt_required()
 def get_monthly_stats():
     try:
         year = request.args.get('year', datetime.utcnow().year, type=int)
@@ -58,24 +56,19 @@ def get_monthly_stats():
         else:
             last_day = datetime(year, month + 1, 1)
         
-        month_runs = Run.query.filter(
-            Run.start_time >= first_day,
-            Run.start_time < last_day
-        ).all()
-        
-        total_distance = sum(float(run.distance) for run in month_runs if run.distance) if month_runs else 0
-        total_duration = sum(run.duration for run in month_runs if run.duration) if month_runs else 0
-        avg_speed = sum(float(run.avg_speed) for run in month_runs if run.avg_speed) / len(month_runs) if month_runs else 0
+        # Totaux du mois depuis les agrégats journaliers (jours inclus)
+        totals = user_rollup_totals(day_from=first_day.date(), day_to=(last_day - timedelta(days=1)).date())
         
         return jsonify({
             'status': 'success',
             'month': {
                 'year': year,
                 'month': month,
-                'runs_count': len(month_runs),
-                'total_distance': total_distance,
-                'total_duration': total_duration,
-                'avg_speed': avg_speed
+                'runs_count': totals['runs_count'],
+                'total_distance': totals['total_distance'] if totals['runs_count'] else 0,
+                'total_duration': int(totals['total_duration']) if totals['runs_count'] else 0,
+                # Moyenne sur les seules courses ayant une vitesse renseignée
+                'avg_speed': totals['avg_speed']
             }
         }), 200
     except Exception as e:
@@ -89,4 +82,115 @@ def get_monthly_stats():
 def get_stats():
     current_user_id = get_jwt_identity()
     stats = get_user_stats(current_user_id)
-    return jsonify(stats), 200
\ No newline at end of file
+    return jsonify(stats), 200
+
+# Durée pendant laquelle le navigateur peut réutiliser une réponse sans revalidation
+SERIES_MAX_AGE_SECONDS = 60
+
+def _parse_day(value, name):
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').date()
+    except ValueError:
+        raise SeriesError(f"{name} doit être au format AAAA-MM-JJ")
+
+def _resolve_scope():
+    """
+    (user_id, route_id, erreur) de la requête : un admin peut demander la vue globale ou filtrer
+    par user_id / route_id, les autres utilisateurs n'accèdent qu'à leurs propres données.
+    """
+    current_user_id = int(get_jwt_identity())
+    current_user = get_current_user()
+    if not current_user:
+        return None, None, (jsonify({'status': 'error', 'message': 'Utilisateur non trouvé'}), 404)
+    
+    user_id = request.args.get('user_id', type=int)
+    route_id = request.args.get('route_id', type=int)
+    if not current_user.is_admin:
+        if (user_id is not None and user_id != current_user_id) or route_id is not None:
+            return None, None, (jsonify({'status': 'error', 'message': 'Accès administrateur requis'}), 403)
+        user_id = current_user_id
+    return user_id, route_id, None
+
+def _conditional_response(data):
+    """Réponse avec ETag : 304 si If-None-Match correspond"""
+    response = jsonify({
+        'status': 'success',
+        'data': data
+    })
+    response.cache_control.private = True
+    response.cache_control.max_age = SERIES_MAX_AGE_SECONDS
+    response.add_etag()
+    return response.make_conditional(request)
+
+@stats_bp.route('/series', methods=['GET'])
+@jwt_required()
+def get_stats_series():
+    """
+    Série temporelle d'une métrique par jour, semaine ou mois, buckets vides inclus.
+    Admin : globale par défaut, ou filtrée par user_id / route_id. Sinon : celle de l'utilisateur connecté.
+    Réponse conditionnelle (ETag / If-None-Match).
+    """
+    try:
+        user_id, route_id, error = _resolve_scope()
+        if error:
+            return error
+        
+        metric = request.args.get('metric', 'distance')
+        bucket = request.args.get('bucket', 'day')
+        if bucket not in BUCKETS:
+            raise SeriesError(f"bucket doit valoir {', '.join(BUCKETS)}")
+        
+        day_from, day_to = default_range(bucket, datetime.utcnow().date())
+        if request.args.get('to'):
+            day_to = _parse_day(request.args['to'], 'to')
+        if request.args.get('from'):
+            day_from = _parse_day(request.args['from'], 'from')
+        
+        return _conditional_response(
+            build_series(metric, bucket, day_from, day_to, user_id=user_id, route_id=route_id)
+        )
+        
+    except SeriesError as e:
+        return jsonify({
+            'status': 'error',
+            'message': str(e)
+        }), 400
+    except Exception as e:
+        return jsonify({
+            'status': 'error',
+            'message': f'Erreur: {str(e)}'
+        }), 500
+
+@stats_bp.route('/distribution', methods=['GET'])
+@jwt_required()
+def get_stats_distribution():
+    """
+    Distribution d'une métrique (pace, distance, heart_rate) : percentiles p50/p90/p99 et histogramme,
+    lus dans les histogrammes journaliers (sans parcourir la table runs). Période complète par défaut.
+    """
+    try:
+        user_id, route_id, error = _resolve_scope()
+        if error:
+            return error
+        
+        metric = request.args.get('metric', 'pace')
+        if metric not in DISTRIBUTION_METRICS:
+            raise SeriesError(f"metric doit valoir {', '.join(DISTRIBUTION_METRICS)}")
+        
+        day_from = _parse_day(request.args['from'], 'from') if request.args.get('from') else None
+        day_to = _parse_day(request.args['to'], 'to') if request.args.get('to') else None
+        
+        data = distribution(metric, day_from, day_to, user_id=user_id, route_id=route_id)
+        data.update({'user_id': user_id, 'route_id': route_id})
+        return _conditional_response(data)
+        
+    except SeriesError as e:
+        return jsonify({
+            'status': 'error',
+            'message': str(e)
+        }), 400
+    except Exception as e:
+        return jsonify({
+            'status': 'error',
+            'message': f'Erreur: {str(e)}'
+        }), 500
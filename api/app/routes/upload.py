@@ -1,118 +1,146 @@
-# api/app/routes/upload.py - Version DB avec compression
-from flask import Blueprint, request, jsonify
+# api/app/routes/upload.py - Images de profil stockées par empreinte (app/services/image_store.py)
+import os
+import re
+from flask import Blueprint, request, jsonify, send_file
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from PIL import Image
-import base64
-import io
-import uuid
+from werkzeug.exceptions import RequestEntityTooLarge
 from app import db
 from app.models.user import User
+from app.services.image_store import (
+    IMAGE_SIZES, IMAGE_FORMATS, MIMETYPES, ImageRejected, allowed_file, image_exists, image_path,
+    image_url, is_image_hash, probe_image, source_path, spool_upload, upload_root
+)
+from app.services.image_pipeline import image_pipeline, ImagePipelineBusy
 
 upload_bp = Blueprint('upload', __name__)
 
-# Configuration
-ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'webp'}
-MAX_FILE_SIZE = 5 * 1024 * 1024  # 5MB
-COMPRESSED_SIZE = (300, 300)  # Taille après compression
+# Une image ne change jamais pour une URL donnée (le nom est l'empreinte du contenu)
+IMAGE_MAX_AGE = 365 * 24 * 3600
+IMAGE_NAME_RE = re.compile(r'^([0-9a-f]{64})(?:_(%s))?\.(%s)$' % ('|'.join(IMAGE_SIZES), '|'.join(IMAGE_FORMATS)))
+# Délai conseillé avant de redemander une image ou un job en cours de traitement
+PROCESSING_RETRY_AFTER_SECONDS = 1
 
-def allowed_file(filename):
-    return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
+def accept_profile_image(user):
+    """
+    Reçoit l'image envoyée (champ 'image') : copie par blocs sur disque, contrôle de l'en-tête,
+    puis traitement dans le pool de process si l'image n'est pas déjà connue (l'utilisateur
+    l'attend alors dans pending_picture, enregistré avant le lancement du job).
+    Retourne (hash, job ou None si l'image est prête, None) ou (None, None, réponse d'erreur).
+    """
+    try:
+        files = request.files
+    except RequestEntityTooLarge:
+        # Corps au-delà de MAX_CONTENT_LENGTH : refusé avant d'être lu
+        return None, None, (jsonify({
+            "status": "error",
+            "message": "Fichier trop volumineux (max 5MB)"
+        }), 413)
+
+    if 'image' not in files:
+        return None, None, (jsonify({
+            "status": "error",
+            "message": "Aucun fichier fourni"
+        }), 400)
+
+    file = files['image']
+
+    if file.filename == '':
+        return None, None, (jsonify({
+            "status": "error",
+            "message": "Nom de fichier vide"
+        }), 400)
+
+    # Vérifier l'extension
+    if not allowed_file(file.filename):
+        return None, None, (jsonify({
+            "status": "error",
+            "message": "Format non supporté. Utilisez: PNG, JPG, JPEG, GIF, WEBP"
+        }), 400)
 
-def compress_and_encode_image(file):
-    """Compresse l'image et la convertit en base64"""
     try:
-        # Ouvrir l'image
-        image = Image.open(file)
-        
-        # Convertir en RGB si nécessaire
-        if image.mode in ('RGBA', 'LA', 'P'):
-            image = image.convert('RGB')
-        
-        # Redimensionner
-        image.thumbnail(COMPRESSED_SIZE, Image.Resampling.LANCZOS)
-        
-        # Sauvegarder en mémoire
-        buffer = io.BytesIO()
-        image.save(buffer, format='JPEG', quality=85, optimize=True)
-        buffer.seek(0)
-        
-        # Encoder en base64
-        image_data = base64.b64encode(buffer.getvalue()).decode('utf-8')
-        
-        return f"data:image/jpeg;base64,{image_data}"
-        
-    except Exception as e:
-        print(f"Erreur compression image: {e}")
-        return None
+        # Taille vérifiée au fil de la copie, format et dimensions lus dans l'en-tête
+        image_hash, path = spool_upload(file.stream)
+        if image_exists(image_hash):
+            os.remove(path)
+            return image_hash, None, None
+        try:
+            probe_image(path)
+        except ImageRejected:
+            if image_pipeline.job(image_hash) is None:
+                os.remove(path)
+            raise
+    except ImageRejected as e:
+        return None, None, (jsonify({
+            "status": "error",
+            "message": str(e)
+        }), 400)
+
+    # Remplace une attente précédente : seul le dernier envoi est attribué à la fin de son job
+    user.pending_picture = image_hash
+    db.session.commit()
+    try:
+        job = image_pipeline.submit(upload_root(), image_hash, user.id)
+    except ImagePipelineBusy:
+        user.pending_picture = None
+        db.session.commit()
+        return None, None, (jsonify({
+            "status": "error",
+            "message": "Traitement des images saturé, réessayez dans un instant",
+            "error_code": "IMAGES_BUSY"
+        }), 503, {'Retry-After': str(PROCESSING_RETRY_AFTER_SECONDS * 5)})
+    return image_hash, job, None
+
+def image_payload(image_hash):
+    return {
+        "profile_picture": image_url(image_hash),
+        "image_id": image_hash,
+        "sizes": {size: image_url(image_hash, size) for size in IMAGE_SIZES},
+        "formats": {
+            fmt: {size: image_url(image_hash, size, fmt) for size in IMAGE_SIZES} for fmt in IMAGE_FORMATS
+        }
+    }
+
+def processing_payload(image_hash, job):
+    """Réponse 202 : l'image sera attribuée à l'utilisateur à la fin du job"""
+    return dict(job, status_url=request.host_url.rstrip('/') + f'/api/uploads/jobs/{image_hash}', image=image_payload(image_hash))
 
 @upload_bp.route('/profile-image', methods=['POST'])
 @jwt_required()
 def upload_profile_image():
-    """Upload d'image de profil - stockage en DB"""
+    """Upload d'image de profil - 200 si l'image est déjà connue, sinon 202 et traitement en arrière-plan"""
     try:
         current_user_id = get_jwt_identity()
         user = User.query.get(current_user_id)
-        
+
         if not user:
             return jsonify({
                 "status": "error",
                 "message": "Utilisateur non trouvé"
             }), 404
-        
-        if 'image' not in request.files:
-            return jsonify({
-                "status": "error",
-                "message": "Aucun fichier fourni"
-            }), 400
-        
-        file = request.files['image']
-        
-        if file.filename == '':
-            return jsonify({
-                "status": "error",
-                "message": "Nom de fichier vide"
-            }), 400
-        
-        # Vérifier la taille
-        if len(file.read()) > MAX_FILE_SIZE:
-            return jsonify({
-                "status": "error",
-                "message": "Fichier trop volumineux (max 5MB)"
-            }), 400
-        
-        file.seek(0)  # Reset après lecture taille
-        
-        # Vérifier l'extension
-        if not allowed_file(file.filename):
-            return jsonify({
-                "status": "error",
-                "message": "Format non supporté. Utilisez: PNG, JPG, JPEG, GIF, WEBP"
-            }), 400
-        
-        # Compresser et encoder l'image
-        compressed_image = compress_and_encode_image(file)
-        
-        if not compressed_image:
+
+        image_hash, job, error = accept_profile_image(user)
+        if error:
+            return error
+
+        if job is not None:
             return jsonify({
-                "status": "error",
-                "message": "Erreur lors du traitement de l'image"
-            }), 500
-        
-        # Mettre à jour la DB avec l'image base64
-        user.profile_picture = compressed_image
+                "status": "success",
+                "message": "Image en cours de traitement",
+                "data": processing_payload(image_hash, job)
+            }), 202
+
+        user.profile_picture = image_hash
+        user.pending_picture = None
         user.updated_at = db.func.now()
-        
+
         db.session.commit()
-        
+
         return jsonify({
             "status": "success",
             "message": "Image uploadée avec succès",
-            "data": {
-                "profile_picture": compressed_image,  # Image complète
-                "size": len(compressed_image)
-            }
+            "data": image_payload(image_hash)
         }), 200
-        
+
     except Exception as e:
         db.session.rollback()
         return jsonify({
@@ -124,31 +152,94 @@ def upload_profile_image():
 @upload_bp.route('/profile-image', methods=['DELETE'])
 @jwt_required()
 def delete_profile_image():
-    """Supprimer l'image de profil"""
+    """Supprimer l'image de profil (les fichiers orphelins sont purgés par scripts/migrate_profile_pictures.py --purge)"""
     try:
         current_user_id = get_jwt_identity()
         user = User.query.get(current_user_id)
-        
-        if not user or not user.profile_picture:
+
+        if not user or not (user.profile_picture or user.pending_picture):
             return jsonify({
                 "status": "error",
                 "message": "Aucune image à supprimer"
             }), 404
-        
-        # Nettoyer la DB
+
+        # Nettoyer la DB (sans attente, un job en cours ne remet pas l'image)
         user.profile_picture = None
+        user.pending_picture = None
         user.updated_at = db.func.now()
         db.session.commit()
-        
+
         return jsonify({
             "status": "success",
             "message": "Image supprimée avec succès"
         }), 200
-        
+
     except Exception as e:
         db.session.rollback()
         return jsonify({
             "status": "error",
             "message": "Erreur lors de la suppression",
             "error": str(e)
-        }), 500
\ No newline at end of file
+        }), 500
+
+@upload_bp.route('/jobs/<job_id>', methods=['GET'])
+@jwt_required()
+def get_image_job(job_id):
+    """
+    État du traitement d'une image (job_id = empreinte) : processing, done ou failed.
+    Un job lancé par un autre process est déduit des fichiers (source en attente ou image écrite).
+    """
+    if not is_image_hash(job_id):
+        return jsonify({
+            "status": "error",
+            "message": "Job non trouvé"
+        }), 404
+
+    job = image_pipeline.job(job_id)
+    if job is None or job['status'] == 'processing':
+        if image_exists(job_id):
+            job = dict(job or {'job_id': job_id, 'error': None, 'submitted_at': None}, status='done', finished_at=None)
+        elif job is None and os.path.exists(source_path(job_id)):
+            job = {'job_id': job_id, 'status': 'processing', 'error': None, 'submitted_at': None, 'finished_at': None}
+    if job is None:
+        return jsonify({
+            "status": "error",
+            "message": "Job non trouvé"
+        }), 404
+
+    data = dict(job, image=image_payload(job_id) if job['status'] == 'done' else None)
+    headers = {'Retry-After': str(PROCESSING_RETRY_AFTER_SECONDS)} if job['status'] == 'processing' else {}
+    return jsonify({
+        "status": "success",
+        "data": data
+    }), 200, headers
+
+@upload_bp.route('/<filename>', methods=['GET'])
+def get_image(filename):
+    """
+    Image par empreinte (<hash>.jpg, <hash>_sm.webp, <hash>_md.avif...), publique et mise en cache sans limite :
+    ETag = nom du fichier, 304 si le client l'a déjà.
+    """
+    match = IMAGE_NAME_RE.match(filename)
+    if not match:
+        return jsonify({
+            "status": "error",
+            "message": "Image non trouvée"
+        }), 404
+
+    image_hash, size, fmt = match.group(1), match.group(2) or 'lg', match.group(3)
+    path = image_path(image_hash, size, fmt)
+    if not os.path.exists(path):
+        # Encore en traitement : pas de mise en cache de la 404
+        headers = {'Cache-Control': 'no-store'}
+        if os.path.exists(source_path(image_hash)):
+            headers['Retry-After'] = str(PROCESSING_RETRY_AFTER_SECONDS)
+        return jsonify({
+            "status": "error",
+            "message": "Image non trouvée"
+        }), 404, headers
+
+    response = send_file(path, mimetype=MIMETYPES[fmt], etag=filename, max_age=IMAGE_MAX_AGE, conditional=True)
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    return response
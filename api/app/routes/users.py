@@ -1,43 +1,23 @@
 # api/app/routes/users.py - Routes complètes pour la gestion des utilisateurs
-from flask import Blueprint, request, jsonify, make_response
+from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from werkzeug.security import generate_password_hash
 from app import db
 from app.models.user import User
 from app.models.run import Run
 from app.utils.decorators import admin_required
+from app.utils.pagination import keyset_paginate, is_cursor_request, InvalidCursor
+from app.services.export_service import stream_query, stream_csv_response
+from app.services.stats_rollups import user_rollup_totals
+from app.services.stats_series import bucket_totals
+from app.services.password_pool import hash_password
+from app.services.cache import stats_cache, invalidate_tags
+from app.routes.upload import accept_profile_image, image_payload, processing_payload
 from sqlalchemy import func, and_, desc, or_
 from datetime import datetime, timedelta
-from PIL import Image
 import re
-import csv
-import io
-import base64
 
 
-# Configuration
-ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'webp'}
-MAX_FILE_SIZE = 5 * 1024 * 1024  # 5MB
-COMPRESSED_SIZE = (300, 300)
-
-def allowed_file(filename):
-    return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
-
-def compress_and_encode_image(file):
-    """Compresse l'image et la convertit en base64"""
-    try:
-        image = Image.open(file)
-        if image.mode in ('RGBA', 'LA', 'P'):
-            image = image.convert('RGB')
-        image.thumbnail(COMPRESSED_SIZE, Image.Resampling.LANCZOS)
-        buffer = io.BytesIO()
-        image.save(buffer, format='JPEG', quality=85, optimize=True)
-        buffer.seek(0)
-        image_data = base64.b64encode(buffer.getvalue()).decode('utf-8')
-        return f"data:image/jpeg;base64,{image_data}"
-    except Exception as e:
-        print(f"Erreur compression image: {e}")
-        return None
+USER_STATS_CACHE_TTL = 300  # secondes
 
 
 
@@ -175,22 +155,49 @@ def get_all_users():
             elif role == 'user':
                 query = query.filter(User.is_admin == False)
         
-        # Tri
-        if sort_order == 'desc':
-            query = query.order_by(desc(getattr(User, sort_by)))
+        if is_cursor_request(request.args):
+            # Mode curseur : tri imposé par (created_at, id), COUNT uniquement sur demande
+            sort_by = 'created_at'
+            try:
+                user_items, pagination = keyset_paginate(
+                    query,
+                    User.created_at,
+                    User.id,
+                    cursor=request.args.get('cursor') or None,
+                    limit=limit,
+                    descending=sort_order == 'desc',
+                    with_total=request.args.get('with_total', 'false').lower() == 'true'
+                )
+            except InvalidCursor as e:
+                return jsonify({
+                    "status": "error",
+                    "message": "Curseur de pagination invalide",
+                    "error": str(e)
+                }), 400
         else:
-            query = query.order_by(getattr(User, sort_by))
-        
-        # Pagination
-        users = query.paginate(
-            page=page, 
-            per_page=limit, 
-            error_out=False
-        )
+            # Tri
+            if sort_order == 'desc':
+                query = query.order_by(desc(getattr(User, sort_by)))
+            else:
+                query = query.order_by(getattr(User, sort_by))
+            
+            # Pagination
+            users = query.paginate(
+                page=page, 
+                per_page=limit, 
+                error_out=False
+            )
+            user_items = users.items
+            pagination = {
+                "page": page,
+                "pages": users.pages,
+                "per_page": limit,
+                "total": users.total
+            }
         
         # Enrichir les données utilisateur avec les statistiques
         enriched_users = []
-        for user in users.items:
+        for user in user_items:
             user_dict = user.to_dict()
             
             # Ajouter les statistiques de course
@@ -212,12 +219,7 @@ def get_all_users():
             "status": "success",
             "data": {
                 "users": enriched_users,
-                "pagination": {
-                    "page": page,
-                    "pages": users.pages,
-                    "per_page": limit,
-                    "total": users.total
-                },
+                "pagination": pagination,
                 "filters": {
                     "search": search,
                     "status": status,
@@ -307,7 +309,7 @@ def create_user():
         user = User(
             username=data['username'].strip(),
             email=data['email'].strip().lower(),
-            password_hash=generate_password_hash(data['password']),
+            password_hash=hash_password(data['password']),
             first_name=data.get('first_name', '').strip(),
             last_name=data.get('last_name', '').strip(),
             date_of_birth=data.get('date_of_birth'),
@@ -319,6 +321,7 @@ def create_user():
         
         db.session.add(user)
         db.session.commit()
+        invalidate_tags('users')
         
         return jsonify({
             "status": "success",
@@ -334,6 +337,40 @@ def create_user():
             "error": str(e)
         }), 500
 
+def build_user_detailed_stats(user_id):
+    """Statistiques détaillées d'un utilisateur (agrégats journaliers)"""
+    run_stats = user_rollup_totals(user_id=user_id)
+    
+    # Courses récentes
+    recent_runs = Run.query.filter_by(user_id=user_id).order_by(
+        desc(Run.start_time)
+    ).limit(5).all()
+    
+    # Statistiques par mois (derniers 6 mois), regroupées depuis les agrégats journaliers
+    today = datetime.now().date()
+    monthly_stats = bucket_totals('month', today - timedelta(days=180), today, user_id=user_id)
+    
+    return {
+        'general': {
+            'total_runs': run_stats['runs_count'],
+            'total_distance': run_stats['total_distance'],
+            'avg_duration': run_stats['avg_duration'],
+            'best_time': run_stats['min_duration'],
+            'worst_time': run_stats['max_duration'],
+            'avg_speed': run_stats['avg_speed']
+        },
+        'recent_runs': [run.to_dict() for run in recent_runs],
+        'monthly': [
+            {
+                'year': month.year,
+                'month': month.month,
+                'runs_count': stat['runs_count'],
+                'distance': stat['total_distance'],
+                'avg_duration': stat['total_duration'] / stat['duration_count'] if stat['duration_count'] else 0
+            } for month, stat in monthly_stats.items() if stat['runs_count']
+        ]
+    }
+
 @users_bp.route('/<int:user_id>', methods=['GET'])
 @jwt_required()
 @admin_required
@@ -343,59 +380,14 @@ def get_user(user_id):
         user = User.query.get_or_404(user_id)
         user_dict = user.to_dict()
         
-        # Statistiques détaillées
-        run_stats = db.session.query(
-            func.count(Run.id).label('total_runs'),
-            func.sum(Run.distance).label('total_distance'),
-            func.avg(Run.duration).label('avg_duration'),
-            func.min(Run.duration).label('best_time'),
-            func.max(Run.duration).label('worst_time'),
-            func.avg(Run.avg_speed).label('avg_speed')
-        ).filter(Run.user_id == user_id).first()
-        
-        # Courses récentes
-        recent_runs = Run.query.filter_by(user_id=user_id).order_by(
-            desc(Run.start_time)
-        ).limit(5).all()
-        
-        # Statistiques par mois (derniers 6 mois)
-        six_months_ago = datetime.now() - timedelta(days=180)
-        monthly_stats = db.session.query(
-            func.year(Run.start_time).label('year'),
-            func.month(Run.start_time).label('month'),
-            func.count(Run.id).label('runs_count'),
-            func.sum(Run.distance).label('distance'),
-            func.avg(Run.duration).label('avg_duration')
-        ).filter(
-            and_(
-                Run.user_id == user_id,
-                Run.start_time >= six_months_ago
-            )
-        ).group_by(
-            func.year(Run.start_time),
-            func.month(Run.start_time)
-        ).all()
-        
-        user_dict['detailed_stats'] = {
-            'general': {
-                'total_runs': run_stats.total_runs or 0,
-                'total_distance': float(run_stats.total_distance or 0),
-                'avg_duration': float(run_stats.avg_duration or 0),
-                'best_time': float(run_stats.best_time or 0),
-                'worst_time': float(run_stats.worst_time or 0),
-                'avg_speed': float(run_stats.avg_speed or 0)
-            },
-            'recent_runs': [run.to_dict() for run in recent_runs],
-            'monthly': [
-                {
-                    'year': stat.year,
-                    'month': stat.month,
-                    'runs_count': stat.runs_count,
-                    'distance': float(stat.distance or 0),
-                    'avg_duration': float(stat.avg_duration or 0)
-                } for stat in monthly_stats
-            ]
-        }
+        # Statistiques détaillées, en cache jusqu'à la prochaine écriture de course ou d'utilisateur,
+        # gardées chaudes par le planificateur pour les derniers utilisateurs consultés
+        key = f'user_stats:{user_id}'
+        compute = lambda: build_user_detailed_stats(user_id)
+        user_dict['detailed_stats'] = stats_cache.get(
+            key, compute, ttl=USER_STATS_CACHE_TTL, tags=('runs', 'users'), background=False
+        )
+        stats_cache.register(key, compute, ttl=USER_STATS_CACHE_TTL, tags=('runs', 'users'), on_read=True)
         
         return jsonify({
             "status": "success",
@@ -490,10 +482,11 @@ def update_user(user_id):
         
         # Mise à jour du mot de passe si fourni
         if data.get('password'):
-            user.password_hash = generate_password_hash(data['password'])
+            user.password_hash = hash_password(data['password'])
         
         user.updated_at = datetime.utcnow()
         db.session.commit()
+        invalidate_tags('users')
         
         return jsonify({
             "status": "success",
@@ -557,6 +550,7 @@ def delete_user(user_id):
             user.username = f"deleted_{user_id}_{user.username}"
             user.updated_at = datetime.utcnow()
             db.session.commit()
+            invalidate_tags('users')
             
             return jsonify({
                 "status": "success",
@@ -566,6 +560,7 @@ def delete_user(user_id):
             # Suppression définitive si aucune course
             db.session.delete(user)
             db.session.commit()
+            invalidate_tags('users')
             
             return jsonify({
                 "status": "success",
@@ -584,39 +579,40 @@ def delete_user(user_id):
 @jwt_required()
 @admin_required
 def export_users():
-    """Exporte la liste des utilisateurs en CSV"""
+    """Exporte la liste des utilisateurs en CSV (réponse streamée, mémoire constante)"""
     try:
-        users = User.query.all()
-        
-        output = io.StringIO()
-        writer = csv.writer(output)
+        # Uniquement les colonnes exportées (pas de photo de profil ni de hash)
+        query = db.session.query(
+            User.id,
+            User.username,
+            User.email,
+            User.first_name,
+            User.last_name,
+            User.is_admin,
+            User.is_active,
+            User.created_at
+        ).order_by(User.id)
+        
+        def generate_rows():
+            for user in stream_query(query):
+                yield [
+                    user.id,
+                    user.username,
+                    user.email,
+                    user.first_name or '',
+                    user.last_name or '',
+                    'Oui' if user.is_admin else 'Non',
+                    'Oui' if user.is_active else 'Non',
+                    user.created_at.strftime('%Y-%m-%d %H:%M') if user.created_at else ''
+                ]
         
         # En-têtes
-        writer.writerow([
+        header = [
             'ID', 'Nom d\'utilisateur', 'Email', 'Prénom', 'Nom', 
             'Admin', 'Actif', 'Créé le'
-        ])
-        
-        # Données
-        for user in users:
-            writer.writerow([
-                user.id,
-                user.username,
-                user.email,
-                user.first_name or '',
-                user.last_name or '',
-                'Oui' if user.is_admin else 'Non',
-                'Oui' if user.is_active else 'Non',
-                user.created_at.strftime('%Y-%m-%d %H:%M')
-            ])
+        ]
         
-        output.seek(0)
-        
-        response = make_response(output.getvalue())
-        response.headers['Content-Type'] = 'text/csv; charset=utf-8'
-        response.headers['Content-Disposition'] = f'attachment; filename=users_{datetime.now().strftime("%Y%m%d_%H%M")}.csv'
-        
-        return response
+        return stream_csv_response(header, generate_rows(), 'users')
         
     except Exception as e:
         return jsonify({
@@ -636,33 +632,26 @@ def upload_user_profile_image(user_id):
         if not user:
             return jsonify({"status": "error", "message": "Utilisateur non trouvé"}), 404
         
-        if 'image' not in request.files:
-            return jsonify({"status": "error", "message": "Aucun fichier fourni"}), 400
-        
-        file = request.files['image']
-        if file.filename == '':
-            return jsonify({"status": "error", "message": "Nom de fichier vide"}), 400
-        
-        file_content = file.read()
-        if len(file_content) > MAX_FILE_SIZE:
-            return jsonify({"status": "error", "message": "Fichier trop volumineux (max 5MB)"}), 400
+        image_hash, job, error = accept_profile_image(user)
+        if error:
+            return error
         
-        file.seek(0)
-        if not allowed_file(file.filename):
-            return jsonify({"status": "error", "message": "Format non supporté. Utilisez: PNG, JPG, JPEG, GIF, WEBP"}), 400
-        
-        compressed_image = compress_and_encode_image(file)
-        if not compressed_image:
-            return jsonify({"status": "error", "message": "Erreur lors du traitement de l'image"}), 500
+        if job is not None:
+            return jsonify({
+                "status": "success",
+                "message": "Image en cours de traitement",
+                "data": dict(processing_payload(image_hash, job), user_id=user_id)
+            }), 202
         
-        user.profile_picture = compressed_image
+        user.profile_picture = image_hash
+        user.pending_picture = None
         user.updated_at = datetime.utcnow()
         db.session.commit()
         
         return jsonify({
             "status": "success",
             "message": "Image uploadée avec succès",
-            "data": {"profile_picture": compressed_image, "size": len(compressed_image), "user_id": user_id}
+            "data": dict(image_payload(image_hash), user_id=user_id)
         }), 200
         
     except Exception as e:
@@ -679,10 +668,11 @@ def delete_user_profile_image(user_id):
         if not user:
             return jsonify({"status": "error", "message": "Utilisateur non trouvé"}), 404
         
-        if not user.profile_picture:
+        if not (user.profile_picture or user.pending_picture):
             return jsonify({"status": "error", "message": "Aucune image à supprimer"}), 404
         
         user.profile_picture = None
+        user.pending_picture = None
         user.updated_at = datetime.utcnow()
         db.session.commit()
         
@@ -0,0 +1,509 @@
+# app/services/cache.py
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from functools import wraps
+from flask import current_app, jsonify, make_response, request
+from flask_jwt_extended import get_jwt_identity
+from sqlalchemy.exc import IntegrityError
+from app import db
+from app.models.stats_cache import StatsCache
+
+# Durée de fraîcheur par défaut (secondes) et fenêtre pendant laquelle une valeur périmée reste servie
+DEFAULT_TTL_SECONDS = float(os.getenv('STATS_CACHE_DURATION_SECONDS', 5.0))
+DEFAULT_STALE_SECONDS = float(os.getenv('STATS_CACHE_STALE_SECONDS', 60.0))
+
+# Niveau mémoire : nombre maximal d'entrées (LRU) et durée maximale avant relecture de la table,
+# pour qu'une invalidation faite par un autre process soit vue rapidement
+L1_MAX_ENTRIES = int(os.getenv('CACHE_L1_MAX_ENTRIES', 1024))
+L1_MAX_AGE_SECONDS = float(os.getenv('CACHE_L1_MAX_AGE_SECONDS', 5.0))
+
+# Attente maximale d'un calcul en cours par un autre thread
+SINGLE_FLIGHT_TIMEOUT_SECONDS = 30.0
+
+# Tags d'invalidation déclenchés par les endpoints d'écriture
+CACHE_TAGS = ('runs', 'users', 'routes')
+
+# Taille maximale de cache_key (colonne String(100))
+MAX_KEY_LENGTH = 100
+
+# Suppression des lignes expirées par lots
+PURGE_BATCH_SIZE = 1000
+
+# Clés déclarées à la lecture (user_stats:<id>...) gardées chaudes : les plus récemment lues
+WARM_MAX_KEYS = int(os.getenv('CACHE_WARM_MAX_KEYS', 256))
+
+class _Entry:
+    __slots__ = ('value', 'fresh_until', 'stale_until', 'tags')
+
+    def __init__(self, value, fresh_until, stale_until, tags=frozenset()):
+        self.value = value
+        self.fresh_until = fresh_until
+        self.stale_until = stale_until
+        self.tags = tags
+
+def _new_counters():
+    return {
+        'l1_hits': 0,
+        'l2_hits': 0,
+        'stale_hits': 0,
+        'misses': 0,
+        'recomputes': 0,
+        'errors': 0,
+        'last_recompute_ms': None,
+        'total_recompute_ms': 0.0,
+        'last_recompute_at': None
+    }
+
+def _namespace(key):
+    """Compteurs regroupés par préfixe de clé (user_stats:12 -> user_stats)"""
+    return key.split(':', 1)[0]
+
+def _encode_tags(tags):
+    # Format ",runs,users," : un tag se recherche avec LIKE '%,runs,%'
+    return f",{','.join(sorted(tags))}," if tags else None
+
+def _decode_tags(raw):
+    return frozenset(tag for tag in (raw or '').split(',') if tag)
+
+class TwoTierCache:
+    """
+    Cache à deux niveaux : LRU en mémoire (L1) devant la table stats_cache (L2).
+    - un seul calcul à la fois par clé (les autres requêtes attendent ou reçoivent la valeur périmée) ;
+    - une valeur périmée reste servie pendant stale_ttl le temps d'un recalcul ;
+    - TTL et tags d'invalidation par clé ;
+    - compteurs de hits / miss / durée de recalcul par préfixe de clé.
+    """
+
+    def __init__(self, ttl=DEFAULT_TTL_SECONDS, stale_ttl=DEFAULT_STALE_SECONDS,
+                 max_entries=L1_MAX_ENTRIES, l1_max_age=L1_MAX_AGE_SECONDS):
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.max_entries = max_entries
+        self.l1_max_age = l1_max_age
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._inflight = {}
+        self._counters = {}
+        self._evictions = 0
+        self._invalidations = 0
+        self._registered = {}
+        self._registered_on_read = OrderedDict()
+
+    # --- API ---
+
+    def get(self, key, compute, ttl=None, stale_ttl=None, tags=(), background=True):
+        """
+        Valeur de la clé, calculée par compute() si absente ou trop ancienne.
+        background=False : le recalcul d'une valeur périmée se fait dans la requête qui la
+        découvre (les autres reçoivent la valeur périmée), pour les calculs liés à la requête.
+        """
+        ttl = self.ttl if ttl is None else ttl
+        stale_ttl = self.stale_ttl if stale_ttl is None else stale_ttl
+        tags = frozenset(tags)
+
+        entry = self._get_entry(key)
+        if entry is not None and time.monotonic() < entry.fresh_until:
+            self._count(key, 'l1_hits')
+            return entry.value
+
+        # L1 absent ou trop ancien : la table fait foi (elle reflète les invalidations des autres process)
+        entry, fresh = self._load_l2(key, ttl, stale_ttl)
+        if entry is not None:
+            self._set_entry(key, entry)
+            if fresh:
+                self._count(key, 'l2_hits')
+                return entry.value
+
+        if entry is not None and time.monotonic() < entry.stale_until:
+            self._count(key, 'stale_hits')
+            if background:
+                self._refresh_in_background(key, compute, ttl, stale_ttl, tags)
+                return entry.value
+            return self._refresh_inline(key, compute, ttl, stale_ttl, tags, entry.value)
+
+        self._count(key, 'misses')
+        return self._compute_single_flight(key, compute, ttl, stale_ttl, tags)
+
+    def refresh(self, key, compute, ttl=None, stale_ttl=None, tags=()):
+        """Recalcule la clé immédiatement et met à jour les deux niveaux"""
+        ttl = self.ttl if ttl is None else ttl
+        stale_ttl = self.stale_ttl if stale_ttl is None else stale_ttl
+        return self._recompute(key, compute, ttl, stale_ttl, frozenset(tags))
+
+    def put(self, key, value, ttl=None, tags=()):
+        """Écrit une valeur déjà calculée dans les deux niveaux"""
+        ttl = self.ttl if ttl is None else ttl
+        tags = frozenset(tags)
+        self._set_entry(key, self._new_entry(value, ttl, self.stale_ttl, tags))
+        self._store_l2(key, value, ttl, tags)
+
+    def peek(self, key):
+        """Dernière valeur de la table, même expirée (None si absente)"""
+        try:
+            row = StatsCache.query.filter_by(cache_key=key).first()
+        except Exception as e:
+            db.session.rollback()
+            print(f"⚠️ [CACHE] Lecture {key} impossible: {e}")
+            return None
+        return row.cache_data if row is not None else None
+
+    def register(self, key, compute, ttl=None, stale_ttl=None, tags=(), on_read=False):
+        """
+        Déclare une clé à garder chaude : recalculée périodiquement par le planificateur (app/tasks).
+        on_read=True : clé déclarée à chaque lecture, seules les WARM_MAX_KEYS plus récentes sont gardées.
+        """
+        registration = (compute, ttl, stale_ttl, tuple(tags))
+        with self._lock:
+            if not on_read:
+                self._registered[key] = registration
+                return
+            self._registered_on_read[key] = registration
+            self._registered_on_read.move_to_end(key)
+            while len(self._registered_on_read) > WARM_MAX_KEYS:
+                self._registered_on_read.popitem(last=False)
+
+    def _registrations(self):
+        with self._lock:
+            return {**self._registered_on_read, **self._registered}
+
+    def registered(self):
+        return {key: {'ttl': self.ttl if ttl is None else ttl} for key, (_, ttl, _, _) in self._registrations().items()}
+
+    def refresh_registered(self):
+        """Recalcule toutes les clés déclarées ; lève une erreur après coup si l'une a échoué"""
+        refreshed, failed = [], {}
+        for key, (compute, ttl, stale_ttl, tags) in self._registrations().items():
+            try:
+                self.refresh(key, compute, ttl=ttl, stale_ttl=stale_ttl, tags=tags)
+                refreshed.append(key)
+            except Exception as e:
+                db.session.rollback()
+                failed[key] = str(e)
+                # Clé déclarée à la lecture (utilisateur supprimé...) : plus gardée chaude
+                with self._lock:
+                    self._registered_on_read.pop(key, None)
+        if failed:
+            raise RuntimeError(f"Recalcul impossible: {failed}")
+        return refreshed
+
+    def invalidate(self, key):
+        """Supprime la clé des deux niveaux"""
+        with self._lock:
+            self._entries.pop(key, None)
+        try:
+            StatsCache.query.filter_by(cache_key=key).delete(synchronize_session=False)
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            print(f"⚠️ [CACHE] Erreur suppression {key}: {e}")
+
+    def invalidate_tags(self, *tags):
+        """Supprime des deux niveaux toutes les clés portant l'un des tags"""
+        tags = frozenset(tags)
+        if not tags:
+            return 0
+        with self._lock:
+            keys = [key for key, entry in self._entries.items() if entry.tags & tags]
+            for key in keys:
+                del self._entries[key]
+            self._invalidations += 1
+
+        deleted = 0
+        try:
+            condition = db.or_(*[StatsCache.tags.like(f'%,{tag},%') for tag in sorted(tags)])
+            deleted = StatsCache.query.filter(condition).delete(synchronize_session=False)
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            print(f"⚠️ [CACHE] Erreur invalidation {sorted(tags)}: {e}")
+        print(f"🧹 [CACHE] Tags {sorted(tags)} invalidés ({len(keys)} en mémoire, {deleted} en base)")
+        return deleted
+
+    def purge_expired(self, grace_seconds=None, batch_size=PURGE_BATCH_SIZE):
+        """
+        Supprime les lignes expirées depuis plus de grace_seconds (par défaut stale_ttl,
+        pour garder les valeurs encore servables). Parcourt l'index idx_expires_at par lots.
+        """
+        grace_seconds = self.stale_ttl if grace_seconds is None else grace_seconds
+        cutoff = datetime.utcnow() - timedelta(seconds=grace_seconds)
+
+        now = time.monotonic()
+        with self._lock:
+            for key in [key for key, entry in self._entries.items() if entry.stale_until <= now]:
+                del self._entries[key]
+
+        purged = 0
+        while True:
+            ids = [row_id for (row_id,) in db.session.query(StatsCache.id).filter(
+                StatsCache.expires_at < cutoff
+            ).order_by(StatsCache.expires_at).limit(batch_size).all()]
+            if not ids:
+                break
+            StatsCache.query.filter(StatsCache.id.in_(ids)).delete(synchronize_session=False)
+            db.session.commit()
+            purged += len(ids)
+            if len(ids) < batch_size:
+                break
+        return purged
+
+    def stats(self):
+        """Compteurs par préfixe de clé pour la supervision"""
+        with self._lock:
+            snapshot = {}
+            for key, counters in self._counters.items():
+                data = dict(counters)
+                data['avg_recompute_ms'] = (
+                    round(counters['total_recompute_ms'] / counters['recomputes'], 2)
+                    if counters['recomputes'] else None
+                )
+                del data['total_recompute_ms']
+                lookups = counters['l1_hits'] + counters['l2_hits'] + counters['stale_hits'] + counters['misses']
+                data['hit_ratio'] = round((lookups - counters['misses']) / lookups, 3) if lookups else None
+                snapshot[key] = data
+            return snapshot
+
+    def memory_stats(self):
+        """Occupation du niveau mémoire"""
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'evictions': self._evictions,
+                'tag_invalidations': self._invalidations
+            }
+
+    # --- Interne ---
+
+    def _count(self, key, counter, amount=1):
+        with self._lock:
+            self._counters.setdefault(_namespace(key), _new_counters())[counter] += amount
+
+    def _get_entry(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def _set_entry(self, key, entry):
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._evictions += 1
+
+    def _new_entry(self, value, ttl, stale_ttl, tags):
+        now = time.monotonic()
+        return _Entry(value, now + min(ttl, self.l1_max_age), now + ttl + stale_ttl, tags)
+
+    def _load_l2(self, key, ttl, stale_ttl):
+        """(entrée, fraîche) depuis la table, (None, False) si absente"""
+        try:
+            row = StatsCache.query.filter_by(cache_key=key).first()
+        except Exception as e:
+            db.session.rollback()
+            print(f"⚠️ [CACHE] Lecture {key} impossible: {e}")
+            return None, False
+        if row is None:
+            return None, False
+        now = time.monotonic()
+        remaining = (row.expires_at - datetime.utcnow()).total_seconds()
+        fresh_for = min(max(remaining, 0), ttl, self.l1_max_age)
+        entry = _Entry(row.cache_data, now + fresh_for, now + max(remaining, 0) + stale_ttl,
+                       _decode_tags(row.tags))
+        return entry, remaining > 0
+
+    def _store_l2(self, key, value, ttl, tags):
+        expires_at = datetime.utcnow() + timedelta(seconds=ttl)
+        encoded_tags = _encode_tags(tags)
+        try:
+            row = StatsCache.query.filter_by(cache_key=key).first()
+            if row is None:
+                db.session.add(StatsCache(cache_key=key, cache_data=value, expires_at=expires_at,
+                                          tags=encoded_tags))
+            else:
+                row.cache_data = value
+                row.expires_at = expires_at
+                row.tags = encoded_tags
+            db.session.commit()
+        except IntegrityError:
+            # Ligne créée entre-temps par un autre process : mise à jour
+            db.session.rollback()
+            StatsCache.query.filter_by(cache_key=key).update(
+                {'cache_data': value, 'expires_at': expires_at, 'tags': encoded_tags},
+                synchronize_session=False
+            )
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            print(f"⚠️ [CACHE] Écriture {key} impossible: {e}")
+
+    def _recompute(self, key, compute, ttl, stale_ttl, tags):
+        started = time.perf_counter()
+        try:
+            value = compute()
+        except Exception:
+            self._count(key, 'errors')
+            raise
+        elapsed_ms = round((time.perf_counter() - started) * 1000, 2)
+
+        self._set_entry(key, self._new_entry(value, ttl, stale_ttl, tags))
+        self._store_l2(key, value, ttl, tags)
+
+        with self._lock:
+            counters = self._counters.setdefault(_namespace(key), _new_counters())
+            counters['recomputes'] += 1
+            counters['last_recompute_ms'] = elapsed_ms
+            counters['total_recompute_ms'] += elapsed_ms
+            counters['last_recompute_at'] = datetime.utcnow().isoformat()
+        print(f"🔄 [CACHE] {key} recalculé en {elapsed_ms} ms")
+        return value
+
+    def _compute_single_flight(self, key, compute, ttl, stale_ttl, tags):
+        with self._lock:
+            event = self._inflight.get(key)
+            leader = event is None
+            if leader:
+                event = self._inflight[key] = threading.Event()
+
+        if not leader:
+            # Calcul déjà en cours : attendre son résultat
+            event.wait(SINGLE_FLIGHT_TIMEOUT_SECONDS)
+            entry = self._get_entry(key)
+            if entry is not None:
+                return entry.value
+            return self._recompute(key, compute, ttl, stale_ttl, tags)
+
+        try:
+            return self._recompute(key, compute, ttl, stale_ttl, tags)
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+            event.set()
+
+    def _refresh_inline(self, key, compute, ttl, stale_ttl, tags, stale_value):
+        with self._lock:
+            if key in self._inflight:
+                return stale_value
+            event = self._inflight[key] = threading.Event()
+        try:
+            return self._recompute(key, compute, ttl, stale_ttl, tags)
+        except Exception as e:
+            print(f"❌ [CACHE] Erreur recalcul {key}: {e}")
+            return stale_value
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+            event.set()
+
+    def _refresh_in_background(self, key, compute, ttl, stale_ttl, tags):
+        with self._lock:
+            if key in self._inflight:
+                return
+            event = self._inflight[key] = threading.Event()
+
+        app = current_app._get_current_object()
+        thread = threading.Thread(
+            target=self._background_refresh,
+            args=(app, key, compute, ttl, stale_ttl, tags, event),
+            daemon=True
+        )
+        thread.start()
+
+    def _background_refresh(self, app, key, compute, ttl, stale_ttl, tags, event):
+        try:
+            with app.app_context():
+                # Un autre process a peut-être déjà rafraîchi la table
+                entry, fresh = self._load_l2(key, ttl, stale_ttl)
+                if entry is not None and fresh:
+                    self._set_entry(key, entry)
+                    return
+                self._recompute(key, compute, ttl, stale_ttl, tags)
+        except Exception as e:
+            print(f"❌ [CACHE] Erreur recalcul {key}: {e}")
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+            event.set()
+
+stats_cache = TwoTierCache()
+
+def invalidate_tags(*tags):
+    """À appeler après le commit d'un endpoint d'écriture"""
+    try:
+        return stats_cache.invalidate_tags(*tags)
+    except Exception as e:
+        print(f"⚠️ [CACHE] Invalidation impossible: {e}")
+        return 0
+
+# --- Endpoints en cache ---
+
+class _UncachedResponse(Exception):
+    """Réponse d'erreur : renvoyée telle quelle, jamais mise en cache"""
+
+    def __init__(self, response):
+        super().__init__(response.status_code)
+        self.response = response
+
+def build_cache_key(namespace, *parts):
+    """Clé namespace:partie1:partie2…, hachée si elle dépasse la taille de la colonne"""
+    key = ':'.join([namespace] + [str(part) for part in parts])
+    if len(key) <= MAX_KEY_LENGTH:
+        return key
+    digest = hashlib.sha1(key.encode('utf-8')).hexdigest()
+    return f"{namespace[:MAX_KEY_LENGTH - len(digest) - 1]}:{digest}"
+
+def _request_key_parts(view_kwargs, per_user):
+    parts = [f"{name}={view_kwargs[name]}" for name in sorted(view_kwargs)]
+    parts.extend(f"{name}={value}" for name, value in sorted(request.args.items(multi=True)))
+    if per_user:
+        parts.insert(0, f"user={get_jwt_identity()}")
+    return parts
+
+def cached_endpoint(namespace, ttl=None, stale_ttl=None, tags=(), per_user=False, warm=True):
+    """
+    Met en cache la réponse JSON d'un endpoint GET.
+    La clé comprend les paramètres d'URL et la query string (et l'utilisateur si per_user),
+    seules les réponses 200 sont conservées. À placer sous @jwt_required().
+    warm : la variante sans paramètre est déclarée au planificateur (endpoints sans paramètre d'URL
+    ni per_user), les autres variantes le sont à leur première lecture.
+    """
+    def decorator(view):
+        def warm_compute(query_string=None):
+            # Appel de la vue hors requête HTTP (planificateur) avec la même query string
+            with current_app.test_request_context(query_string=query_string):
+                response = make_response(view())
+            if response.status_code != 200 or not response.is_json:
+                raise RuntimeError(f"{namespace}: réponse {response.status_code}")
+            return response.get_json()
+
+        if warm and not per_user:
+            stats_cache.register(build_cache_key(namespace), warm_compute, ttl=ttl, stale_ttl=stale_ttl, tags=tags)
+
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            key = build_cache_key(namespace, *_request_key_parts(kwargs, per_user))
+
+            def compute():
+                response = make_response(view(*args, **kwargs))
+                if response.status_code != 200 or not response.is_json:
+                    raise _UncachedResponse(response)
+                return response.get_json()
+
+            try:
+                data = stats_cache.get(key, compute, ttl=ttl, stale_ttl=stale_ttl, tags=tags,
+                                       background=False)
+            except _UncachedResponse as e:
+                return e.response
+            if warm and not per_user and not kwargs and request.args:
+                query_string = request.query_string.decode('utf-8')
+                stats_cache.register(key, lambda: warm_compute(query_string), ttl=ttl,
+                                     stale_ttl=stale_ttl, tags=tags, on_read=True)
+            return jsonify(data), 200
+        return wrapper
+    return decorator
@@ -0,0 +1,198 @@
+# app/services/export_service.py
+from flask import Response, stream_with_context
+from datetime import datetime
+import numpy as np
+import csv
+import io
+import json
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # pyarrow est optionnel : seuls les formats arrow/parquet en dépendent
+    pa = None
+    pq = None
+
+# Nombre de lignes lues par aller-retour sur le curseur serveur
+EXPORT_BATCH_SIZE = 1000
+# Taille approximative des blocs envoyés au client
+CSV_CHUNK_SIZE = 64 * 1024
+
+def stream_query(query, batch_size=EXPORT_BATCH_SIZE):
+    """Parcourt une requête par lots via un curseur serveur (mémoire constante)"""
+    return query.yield_per(batch_size)
+
+def iter_csv(header, rows):
+    """Génère le CSV par blocs à partir d'un itérable de lignes"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(header)
+
+    for row in rows:
+        writer.writerow(row)
+        if buffer.tell() >= CSV_CHUNK_SIZE:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate(0)
+
+    yield buffer.getvalue()
+
+def stream_csv_response(header, rows, filename_prefix):
+    """Réponse HTTP streamée : les lignes sont écrites au fil de la lecture en base"""
+    response = Response(
+        stream_with_context(iter_csv(header, rows)),
+        mimetype='text/csv'
+    )
+    response.headers['Content-Type'] = 'text/csv; charset=utf-8'
+    response.headers['Content-Disposition'] = f'attachment; filename={filename_prefix}_{datetime.now().strftime("%Y%m%d_%H%M")}.csv'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+# --- Exports colonnaires (NDJSON, Arrow, Parquet) ---
+
+COLUMNAR_FORMATS = {
+    'ndjson': ('application/x-ndjson', 'ndjson'),
+    'arrow': ('application/vnd.apache.arrow.stream', 'arrows'),
+    'parquet': ('application/vnd.apache.parquet', 'parquet'),
+}
+
+def columnar_format_available(export_format):
+    """Indique si le format demandé peut être produit avec les dépendances installées"""
+    if export_format == 'ndjson':
+        return True
+    return export_format in COLUMNAR_FORMATS and pa is not None
+
+def iter_row_batches(query, batch_size=EXPORT_BATCH_SIZE):
+    """Regroupe les lignes lues par curseur serveur en lots de batch_size"""
+    batch = []
+    for row in stream_query(query, batch_size):
+        batch.append(row)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def to_column_arrays(batch, schema):
+    """
+    Transpose un lot de lignes en colonnes NumPy typées.
+    schema : liste de (nom, type) avec type parmi int, float, string, timestamp
+    Les valeurs manquantes deviennent NaN (int/float), NaT (timestamp) ou None (string).
+    """
+    columns = {}
+    values_by_column = list(zip(*batch)) if batch else [() for _ in schema]
+    for (name, kind), values in zip(schema, values_by_column):
+        if kind in ('int', 'float'):
+            columns[name] = np.array(values, dtype=np.float64)
+        elif kind == 'timestamp':
+            columns[name] = np.array(values, dtype='datetime64[ms]')
+        else:
+            columns[name] = np.array(values, dtype=object)
+    return columns
+
+def _json_column(kind, array):
+    """Convertit une colonne NumPy en valeurs JSON natives (null pour les manquants)"""
+    if kind == 'int':
+        missing = np.isnan(array)
+        return [None if m else v for v, m in zip(np.where(missing, 0, array).astype(np.int64).tolist(), missing.tolist())]
+    if kind == 'float':
+        missing = np.isnan(array)
+        return [None if m else v for v, m in zip(array.tolist(), missing.tolist())]
+    if kind == 'timestamp':
+        missing = np.isnat(array)
+        return [None if m else v for v, m in zip(np.datetime_as_string(array, unit='ms').tolist(), missing.tolist())]
+    return array.tolist()
+
+def iter_ndjson(column_batches, schema):
+    """Une ligne JSON par enregistrement, produite lot par lot"""
+    names = [name for name, _ in schema]
+    for columns in column_batches:
+        values = [_json_column(kind, columns[name]) for name, kind in schema]
+        lines = [json.dumps(dict(zip(names, row)), ensure_ascii=False) for row in zip(*values)]
+        if lines:
+            yield '\n'.join(lines) + '\n'
+
+def _arrow_schema(schema):
+    types = {
+        'int': pa.int64(),
+        'float': pa.float64(),
+        'string': pa.string(),
+        'timestamp': pa.timestamp('ms'),
+    }
+    return pa.schema([(name, types[kind]) for name, kind in schema])
+
+def _arrow_batch(columns, schema, arrow_schema):
+    arrays = []
+    for name, kind in schema:
+        array = columns[name]
+        if kind == 'int':
+            missing = np.isnan(array)
+            arrays.append(pa.array(np.where(missing, 0, array).astype(np.int64), mask=missing))
+        elif kind == 'float':
+            arrays.append(pa.array(array, mask=np.isnan(array)))
+        elif kind == 'timestamp':
+            arrays.append(pa.array(array, mask=np.isnat(array), type=pa.timestamp('ms')))
+        else:
+            arrays.append(pa.array(array.tolist(), type=pa.string()))
+    return pa.RecordBatch.from_arrays(arrays, schema=arrow_schema)
+
+class _StreamSink(io.RawIOBase):
+    """Fichier en écriture seule dont on vide le contenu au fil de l'eau"""
+
+    def __init__(self):
+        super().__init__()
+        self._chunks = []
+        self._position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        data = bytes(data)
+        self._chunks.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+def iter_arrow_stream(column_batches, schema):
+    """Flux IPC Arrow : un RecordBatch par lot lu en base"""
+    arrow_schema = _arrow_schema(schema)
+    sink = _StreamSink()
+    with pa.ipc.new_stream(sink, arrow_schema) as writer:
+        for columns in column_batches:
+            writer.write_batch(_arrow_batch(columns, schema, arrow_schema))
+            yield sink.drain()
+    yield sink.drain()
+
+def iter_parquet(column_batches, schema):
+    """Fichier Parquet compressé : un row group par lot lu en base"""
+    arrow_schema = _arrow_schema(schema)
+    sink = _StreamSink()
+    with pq.ParquetWriter(sink, arrow_schema, compression='zstd') as writer:
+        for columns in column_batches:
+            writer.write_batch(_arrow_batch(columns, schema, arrow_schema))
+            yield sink.drain()
+    yield sink.drain()
+
+def stream_columnar_response(column_batches, schema, export_format, filename_prefix):
+    """Réponse HTTP streamée au format ndjson, arrow ou parquet"""
+    writers = {
+        'ndjson': iter_ndjson,
+        'arrow': iter_arrow_stream,
+        'parquet': iter_parquet,
+    }
+    mimetype, extension = COLUMNAR_FORMATS[export_format]
+    response = Response(
+        stream_with_context(writers[export_format](column_batches, schema)),
+        mimetype=mimetype
+    )
+    response.headers['Content-Disposition'] = f'attachment; filename={filename_prefix}_{datetime.now().strftime("%Y%m%d_%H%M")}.{extension}'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
@@ -0,0 +1,325 @@
+# app/services/gps_ingestion.py
+import atexit
+import json
+import os
+import threading
+import time
+from sqlalchemy import case, or_
+from app import db
+from app.models.run import Run
+from app.services.cache import invalidate_tags
+from app.services.live_runs import LIVE_STATUSES
+from app.utils.gps import haversine_m, parse_gps_data, dump_gps_data
+from app.utils.gps_codec import COMPACT_PREFIX, CHUNK_SEPARATOR, encode_track
+
+# Seuils de vidage du tampon : nombre de points ou ancienneté du premier point en attente
+FLUSH_MAX_POINTS = int(os.getenv('GPS_FLUSH_MAX_POINTS', 50))
+FLUSH_MAX_SECONDS = float(os.getenv('GPS_FLUSH_MAX_SECONDS', 15))
+# Passage du thread de vidage (tampons échus, courses arrêtées par un autre process)
+GPS_FLUSH_INTERVAL_SECONDS = float(os.getenv('GPS_FLUSH_INTERVAL_SECONDS', 1))
+
+# Courses dont les positions sont encore attendues ; au-delà, le tampon est vidé puis oublié
+ACTIVE_STATUSES = LIVE_STATUSES + ('paused',)
+
+# Au-delà, un segment est considéré comme un saut GPS et ignoré pour la vitesse max
+MAX_PLAUSIBLE_SPEED_KMH = 45.0
+
+class TrackAccumulator:
+    """Statistiques d'une trace mises à jour point par point (distance, vitesse max)"""
+
+    def __init__(self):
+        self.distance_m = 0.0
+        self.max_speed_kmh = 0.0
+        self.point_count = 0
+        self.last_point = None
+
+    def add(self, point):
+        previous = self.last_point
+        self.last_point = point
+        self.point_count += 1
+
+        reported = point.get('speed')
+        if reported and 0 < reported * 3.6 <= MAX_PLAUSIBLE_SPEED_KMH:
+            self.max_speed_kmh = max(self.max_speed_kmh, reported * 3.6)
+
+        if previous is None:
+            return
+
+        segment = haversine_m(previous['latitude'], previous['longitude'],
+                              point['latitude'], point['longitude'])
+        self.distance_m += segment
+
+        if previous.get('timestamp') and point.get('timestamp'):
+            elapsed = (point['timestamp'] - previous['timestamp']) / 1000.0
+            if elapsed > 0:
+                speed_kmh = segment / elapsed * 3.6
+                if speed_kmh <= MAX_PLAUSIBLE_SPEED_KMH:
+                    self.max_speed_kmh = max(self.max_speed_kmh, speed_kmh)
+
+    @classmethod
+    def from_points(cls, points):
+        accumulator = cls()
+        for point in points:
+            accumulator.add(point)
+        return accumulator
+
+class _RunBuffer:
+    def __init__(self, complete):
+        self.pending = []
+        self.first_pending_at = None
+        self.accumulator = TrackAccumulator()
+        # True si toute la trace est passée par ce process (statistiques exactes)
+        self.complete = complete
+        # Un seul vidage à la fois par course : les morceaux sont ajoutés dans l'ordre des points
+        self.flush_lock = threading.Lock()
+
+    def is_due(self, now):
+        return bool(self.pending) and (
+            len(self.pending) >= FLUSH_MAX_POINTS or now - self.first_pending_at >= FLUSH_MAX_SECONDS
+        )
+
+class GpsIngestionPipeline:
+    """
+    Tampon d'écriture des positions GPS des courses en cours.
+    Les points sont accumulés en mémoire et écrits en base par lots (seuil de taille ou de temps)
+    au lieu d'un UPDATE par position ; distance et vitesse max sont tenues à jour au fil de l'eau.
+    Chaque lot est ajouté en fin de gps_data (morceau compact) sans relire la trace stockée.
+    Un thread d'arrière-plan vide les tampons échus et ceux des courses arrêtées par un autre process.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._buffers = {}
+        self._app = None
+        self._thread = None
+
+    def init_app(self, app):
+        with self._lock:
+            if self._app is None:
+                self._app = app
+
+    def start_run(self, run_id):
+        with self._lock:
+            self._buffers[run_id] = _RunBuffer(complete=True)
+        self._ensure_thread()
+
+    def append(self, run_id, points):
+        """Ajoute des points au tampon d'une course et la vide si elle est arrivée à échéance"""
+        now = time.monotonic()
+        with self._lock:
+            buffer = self._buffers.get(run_id)
+            if buffer is None:
+                # Course démarrée par un autre process : statistiques à recalculer à l'arrêt
+                buffer = self._buffers[run_id] = _RunBuffer(complete=False)
+            if points and buffer.first_pending_at is None:
+                buffer.first_pending_at = now
+            buffer.pending.extend(points)
+            for point in points:
+                buffer.accumulator.add(point)
+            due = buffer.is_due(now)
+            accumulator = buffer.accumulator
+        self._ensure_thread()
+
+        # Seule la course de la requête est vidée ici ; les autres le sont par le thread d'arrière-plan
+        flushed = 0
+        if due:
+            try:
+                flushed = self.flush(run_id)
+            except Exception as e:
+                # Points remis en attente : nouvel essai au prochain passage du thread
+                print(f"⚠️ [GPS] Écriture des positions de la course {run_id} reportée: {e}")
+
+        return {
+            'accepted': len(points),
+            'flushed': flushed,
+            'distance': round(accumulator.distance_m, 1)
+        }
+
+    def flush(self, run_id):
+        """Écrit les points en attente d'une course (ajout d'un morceau en fin de trace)"""
+        with self._lock:
+            buffer = self._buffers.get(run_id)
+        if buffer is None:
+            return 0
+
+        with buffer.flush_lock:
+            with self._lock:
+                if not buffer.pending:
+                    return 0
+                points = buffer.pending
+                buffer.pending = []
+                buffer.first_pending_at = None
+
+            try:
+                status = db.session.query(Run.status).filter(Run.id == run_id).scalar()
+                if status is None:
+                    # Course supprimée entre-temps
+                    db.session.rollback()
+                    self.discard(run_id)
+                    return 0
+                append_gps_points(run_id, points)
+                db.session.commit()
+            except Exception:
+                db.session.rollback()
+                # Remettre les points en tête du tampon pour la prochaine tentative
+                with self._lock:
+                    buffer.pending = points + buffer.pending
+                    buffer.first_pending_at = buffer.first_pending_at or time.monotonic()
+                raise
+
+        if status not in ACTIVE_STATUSES:
+            # Points reçus par ce process avant l'arrêt fait ailleurs : statistiques de la course refaites
+            self.discard(run_id)
+            refresh_finished_run(run_id)
+        return len(points)
+
+    def finish(self, run_id):
+        """
+        Vide le tampon d'une course terminée et retourne ses statistiques.
+        Retourne None si la trace n'est pas entièrement passée par ce process.
+        """
+        self.flush(run_id)
+        with self._lock:
+            buffer = self._buffers.pop(run_id, None)
+        if buffer is None or not buffer.complete:
+            return None
+        return buffer.accumulator
+
+    def discard(self, run_id):
+        with self._lock:
+            self._buffers.pop(run_id, None)
+
+    # --- Vidage en arrière-plan ---
+
+    def _ensure_thread(self):
+        with self._lock:
+            if self._app is None or (self._thread is not None and self._thread.is_alive()):
+                return
+            self._thread = threading.Thread(target=self._run, name='gps-ingestion', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            time.sleep(GPS_FLUSH_INTERVAL_SECONDS)
+            try:
+                with self._app.app_context():
+                    try:
+                        self.flush_background()
+                    finally:
+                        db.session.remove()
+            except Exception as e:
+                print(f"❌ [GPS] Vidage des positions en échec: {e}")
+
+    def flush_background(self):
+        """
+        Vide les tampons échus, puis ceux des courses arrêtées (ou supprimées) par un autre process,
+        qui sont ensuite oubliés. Une course en échec n'empêche pas les suivantes.
+        """
+        now = time.monotonic()
+        with self._lock:
+            run_ids = list(self._buffers)
+            due = [run_id for run_id, buffer in self._buffers.items() if buffer.is_due(now)]
+        if not run_ids:
+            return 0
+
+        statuses = dict(db.session.query(Run.id, Run.status).filter(Run.id.in_(run_ids)).all())
+        db.session.rollback()
+        stopped = [run_id for run_id in run_ids if statuses.get(run_id) not in ACTIVE_STATUSES]
+
+        flushed = 0
+        for run_id in dict.fromkeys(due + stopped):
+            try:
+                flushed += self.flush(run_id)
+            except Exception as e:
+                print(f"⚠️ [GPS] Écriture des positions de la course {run_id} reportée: {e}")
+        for run_id in stopped:
+            with self._lock:
+                buffer = self._buffers.get(run_id)
+                if buffer is not None and not buffer.pending:
+                    self._buffers.pop(run_id, None)
+        return flushed
+
+    def flush_all(self):
+        """Vide tous les tampons (arrêt du process)"""
+        with self._lock:
+            run_ids = list(self._buffers)
+        flushed = 0
+        for run_id in run_ids:
+            try:
+                flushed += self.flush(run_id)
+            except Exception as e:
+                print(f"⚠️ [GPS] Positions de la course {run_id} non écrites: {e}")
+        return flushed
+
+gps_ingestion = GpsIngestionPipeline()
+
+def append_gps_points(run_id, points):
+    """
+    Ajoute des points en fin de Run.gps_data dans la transaction courante.
+    Trace compacte (ou vide) : concaténation d'un morceau côté base, sans relire la trace.
+    Trace JSON ou format hérité : relecture et réécriture complètes (cas rare).
+    """
+    try:
+        chunk = encode_track(points)
+    except (KeyError, TypeError, ValueError):
+        chunk = None
+
+    if chunk is not None:
+        updated = db.session.query(Run).filter(
+            Run.id == run_id,
+            or_(Run.gps_data.is_(None), Run.gps_data == '', Run.gps_data.like(COMPACT_PREFIX + '%'))
+        ).update({
+            Run.gps_data: case(
+                (or_(Run.gps_data.is_(None), Run.gps_data == ''), chunk),
+                else_=Run.gps_data.concat(CHUNK_SEPARATOR + chunk[len(COMPACT_PREFIX):])
+            ),
+            Run.current_position: json.dumps(points[-1])
+        }, synchronize_session=False)
+        if updated:
+            return
+
+    stored = db.session.query(Run.gps_data).filter(Run.id == run_id).with_for_update().scalar()
+    track = parse_gps_data(stored)
+    track.extend(points)
+    db.session.query(Run).filter(Run.id == run_id).update({
+        Run.gps_data: dump_gps_data(track),
+        Run.current_position: json.dumps(points[-1])
+    }, synchronize_session=False)
+
+def refresh_finished_run(run_id):
+    """Distance, vitesses et traitements de fin de course refaits sur la trace complète (points arrivés après l'arrêt)"""
+    from app.services.run_service import finalize_run
+
+    run = db.session.get(Run, run_id)
+    if run is None:
+        return
+    points = run.get_gps_points()
+    accumulator = TrackAccumulator.from_points(points)
+    if accumulator.point_count >= 2:
+        run.distance = round(accumulator.distance_m, 1)
+    if run.distance and run.duration:
+        run.avg_speed = round((run.distance / 1000) / (run.duration / 3600), 2)
+    if accumulator.max_speed_kmh:
+        run.max_speed = round(accumulator.max_speed_kmh, 2)
+    # Trace réécrite en un seul morceau
+    run.set_gps_points(points)
+    db.session.commit()
+    finalize_run(run)
+    invalidate_tags('runs')
+    print(f"🛰️ [GPS] Course {run_id} recalculée avec des positions arrivées après l'arrêt")
+
+def _flush_at_exit():
+    app = gps_ingestion._app
+    if app is None:
+        return
+    try:
+        with app.app_context():
+            gps_ingestion.flush_all()
+    except Exception as e:
+        print(f"⚠️ [GPS] Positions non écrites à l'arrêt: {e}")
+
+def init_gps_ingestion(app):
+    """Rattache le tampon à l'application (thread de vidage) et le vide à l'arrêt du process"""
+    if gps_ingestion._app is None:
+        atexit.register(_flush_at_exit)
+    gps_ingestion.init_app(app)
@@ -0,0 +1,192 @@
+# app/services/image_pipeline.py
+import multiprocessing
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime
+from sqlalchemy import update
+from app import db
+from app.models.user import User
+from app.services.image_store import render_image, source_path
+
+# Process de redimensionnement / encodage (travail CPU hors des workers HTTP et hors GIL)
+IMAGE_WORKERS = int(os.getenv('IMAGE_WORKERS', min(2, os.cpu_count() or 1)))
+# Images en attente au-delà desquelles les envois sont refusés (503)
+IMAGE_QUEUE_SIZE = int(os.getenv('IMAGE_QUEUE_SIZE', 16))
+# Jobs terminés gardés pour l'endpoint de statut
+IMAGE_JOBS_MAX = int(os.getenv('IMAGE_JOBS_MAX', 1000))
+
+USERS = User.__table__
+
+class ImagePipelineBusy(RuntimeError):
+    """File de traitement des images pleine"""
+
+class ImagePipeline:
+    """
+    Traitement des images envoyées dans un pool de process : un job par empreinte (deux envois
+    identiques partagent le même job). À la fin du job, l'image de profil est attribuée aux
+    utilisateurs dont users.pending_picture désigne encore cette empreinte : un envoi plus récent
+    ou une suppression, dans n'importe quel process, remplace ou efface cette attente.
+    """
+
+    def __init__(self, workers=IMAGE_WORKERS, queue_size=IMAGE_QUEUE_SIZE):
+        self.workers = workers
+        self.capacity = workers + queue_size
+        self._executor = None
+        self._lock = threading.Lock()
+        self._jobs = OrderedDict()
+        self._pending = 0
+        self._app = None
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.job_ms_total = 0.0
+
+    def init_app(self, app):
+        with self._lock:
+            if self._app is None:
+                self._app = app
+
+    def _get_executor(self):
+        if self._executor is None:
+            # spawn : pas de fork d'un process qui a des threads (serveur, tâches d'arrière-plan)
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers, mp_context=multiprocessing.get_context('spawn')
+            )
+        return self._executor
+
+    def submit(self, root, image_hash, user_id=None):
+        """
+        Planifie le traitement du fichier source image_hash pour l'utilisateur (pending_picture
+        déjà enregistré). Retourne l'état du job ; ImagePipelineBusy si la file est pleine.
+        """
+        with self._lock:
+            job = self._jobs.get(image_hash)
+            if job is not None and job['status'] == 'processing':
+                if user_id is not None:
+                    job['user_ids'].add(user_id)
+                return self._public(image_hash, job)
+            if self._pending >= self.capacity:
+                self.rejected += 1
+                raise ImagePipelineBusy("File de traitement des images saturée")
+
+            job = {
+                'status': 'processing',
+                'user_ids': {user_id} if user_id is not None else set(),
+                'submitted_at': datetime.utcnow(),
+                'finished_at': None,
+                'error': None
+            }
+            started = time.perf_counter()
+            try:
+                future = self._get_executor().submit(render_image, root, image_hash)
+            except BrokenProcessPool:
+                # Process de traitement tué (mémoire) : nouveau pool
+                self._executor = None
+                future = self._get_executor().submit(render_image, root, image_hash)
+            self._jobs[image_hash] = job
+            self._jobs.move_to_end(image_hash)
+            self._pending += 1
+            self.submitted += 1
+            self._trim()
+
+        future.add_done_callback(lambda done: self._finish(root, image_hash, done, started))
+        return self._public(image_hash, job)
+
+    def _finish(self, root, image_hash, future, started):
+        error = future.exception()
+        with self._lock:
+            job = self._jobs.get(image_hash)
+            user_ids = set(job['user_ids']) if job else set()
+            self._pending -= 1
+            self.job_ms_total += (time.perf_counter() - started) * 1000
+            if error is None:
+                self.completed += 1
+            else:
+                self.failed += 1
+                if isinstance(error, BrokenProcessPool):
+                    self._executor = None
+            if job is not None:
+                job['status'] = 'done' if error is None else 'failed'
+                job['error'] = str(error) if error is not None else None
+                job['finished_at'] = datetime.utcnow()
+                job['user_ids'] = set()
+
+        if error is not None:
+            print(f"❌ [IMAGES] Traitement de {image_hash[:12]} en échec: {error}")
+            src = source_path(image_hash, root)
+            if os.path.exists(src):
+                os.remove(src)
+        if self._app is not None:
+            self._assign_pictures(image_hash, user_ids if error is not None else None)
+
+    def _assign_pictures(self, image_hash, failed_user_ids=None):
+        """
+        Fin d'un job (UPDATE hors ORM, depuis le thread du pool) : image de profil des utilisateurs
+        qui attendent encore cette empreinte, ou, en cas d'échec, fin de l'attente des utilisateurs
+        de ce job (ceux d'un autre process gardent la leur, son job peut réussir).
+        """
+        waiting = USERS.c.pending_picture == image_hash
+        if failed_user_ids is None:
+            statement = update(USERS).where(waiting).values(
+                profile_picture=image_hash, pending_picture=None, updated_at=datetime.utcnow()
+            )
+        elif failed_user_ids:
+            statement = update(USERS).where(waiting, USERS.c.id.in_(failed_user_ids)).values(pending_picture=None)
+        else:
+            return
+        with self._app.app_context():
+            try:
+                db.session.execute(statement)
+                db.session.commit()
+            except Exception as e:
+                db.session.rollback()
+                print(f"❌ [IMAGES] Image de profil {image_hash[:12]} non enregistrée: {e}")
+            finally:
+                db.session.remove()
+
+    def _trim(self):
+        while len(self._jobs) > IMAGE_JOBS_MAX:
+            oldest = next((key for key, job in self._jobs.items() if job['status'] != 'processing'), None)
+            if oldest is None:
+                break
+            del self._jobs[oldest]
+
+    def _public(self, image_hash, job):
+        return {
+            'job_id': image_hash,
+            'status': job['status'],
+            'error': job['error'],
+            'submitted_at': job['submitted_at'].isoformat() if job['submitted_at'] else None,
+            'finished_at': job['finished_at'].isoformat() if job['finished_at'] else None
+        }
+
+    def job(self, image_hash):
+        """État d'un job connu de ce process, ou None"""
+        with self._lock:
+            job = self._jobs.get(image_hash)
+            return self._public(image_hash, job) if job else None
+
+    def stats(self):
+        with self._lock:
+            return {
+                'workers': self.workers,
+                'capacity': self.capacity,
+                'pending': self._pending,
+                'submitted': self.submitted,
+                'completed': self.completed,
+                'failed': self.failed,
+                'rejected': self.rejected,
+                'avg_job_ms': round(self.job_ms_total / (self.completed + self.failed), 2)
+                    if self.completed + self.failed else 0
+            }
+
+image_pipeline = ImagePipeline()
+
+def init_image_pipeline(app):
+    """Rattache le pool à l'application (mise à jour des utilisateurs à la fin des jobs)"""
+    image_pipeline.init_app(app)
@@ -0,0 +1,223 @@
+# app/services/image_store.py
+import hashlib
+import io
+import os
+import re
+import tempfile
+import time
+from flask import current_app, has_request_context, request
+from PIL import Image
+
+# Fichiers acceptés
+ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'webp'}
+ACCEPTED_FORMATS = {'PNG', 'JPEG', 'GIF', 'WEBP'}
+MAX_FILE_SIZE = 5 * 1024 * 1024  # 5MB
+# Dimensions refusées avant tout décodage (lecture de l'en-tête seulement)
+MAX_IMAGE_DIMENSION = int(os.getenv('MAX_IMAGE_DIMENSION', 8000))
+MAX_IMAGE_PIXELS = int(os.getenv('MAX_IMAGE_PIXELS', 40_000_000))
+SPOOL_CHUNK_SIZE = 64 * 1024
+
+# Tailles précalculées (côté max en pixels) ; 'lg' est servie par défaut
+IMAGE_SIZES = {'sm': 64, 'md': 150, 'lg': 300}
+DEFAULT_SIZE = 'lg'
+
+# Formats générés : extension -> (format Pillow, options d'encodage) ; JPEG toujours, WebP/AVIF si Pillow les gère
+ENCODERS = {
+    'jpg': ('JPEG', {'quality': 85, 'optimize': True}),
+    'webp': ('WEBP', {'quality': 80, 'method': 4}),
+    'avif': ('AVIF', {'quality': 60, 'speed': 8}),
+}
+DEFAULT_FORMAT = 'jpg'
+
+def _supported_formats():
+    Image.init()
+    wanted = [ext.strip() for ext in os.getenv('IMAGE_FORMATS', 'jpg,webp,avif').split(',') if ext.strip()]
+    formats = [ext for ext in wanted if ext in ENCODERS and ENCODERS[ext][0] in Image.SAVE]
+    return tuple([DEFAULT_FORMAT] + [ext for ext in formats if ext != DEFAULT_FORMAT])
+
+IMAGE_FORMATS = _supported_formats()
+
+MIMETYPES = {'jpg': 'image/jpeg', 'webp': 'image/webp', 'avif': 'image/avif'}
+
+# Identifiant d'image : sha256 du fichier source (64 caractères hexadécimaux)
+IMAGE_HASH_RE = re.compile(r'^[0-9a-f]{64}$')
+
+class ImageRejected(ValueError):
+    """Fichier refusé (taille, format, dimensions) ; le message est renvoyé au client"""
+
+def allowed_file(filename):
+    return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
+
+def upload_root():
+    return current_app.config.get('UPLOAD_FOLDER') or os.path.join(os.getcwd(), 'uploads')
+
+def _images_dir(root):
+    return os.path.join(root, 'images')
+
+def _spool_dir(root):
+    return os.path.join(root, 'tmp')
+
+def is_image_hash(value):
+    return bool(value) and bool(IMAGE_HASH_RE.match(value))
+
+def _image_path(root, image_hash, size, fmt):
+    return os.path.join(_images_dir(root), image_hash[:2], f'{image_hash}_{size}.{fmt}')
+
+def image_path(image_hash, size=DEFAULT_SIZE, fmt=DEFAULT_FORMAT):
+    """Chemin d'une taille : images/ab/<hash>_<taille>.<format> (répertoires de 256 entrées au plus)"""
+    return _image_path(upload_root(), image_hash, size, fmt)
+
+def source_path(image_hash, root=None):
+    """Fichier envoyé en attente de traitement"""
+    return os.path.join(_spool_dir(root or upload_root()), f'{image_hash}.src')
+
+def image_exists(image_hash):
+    # Le JPEG 'lg' est écrit en dernier : sa présence signifie que toutes les variantes le sont
+    return os.path.exists(image_path(image_hash))
+
+def image_url(image_hash, size=None, fmt=DEFAULT_FORMAT):
+    """URL publique d'une image (absolue dans une requête : les clients n'ont pas la même origine que l'API)"""
+    name = image_hash if size in (None, DEFAULT_SIZE) else f'{image_hash}_{size}'
+    path = f'/api/uploads/{name}.{fmt}'
+    return request.host_url.rstrip('/') + path if has_request_context() else path
+
+def picture_url(value, size=None):
+    """URL d'une image de profil stockée (hash) ; les anciennes valeurs data:image/... sont renvoyées telles quelles"""
+    if not value:
+        return None
+    return image_url(value, size) if is_image_hash(value) else value
+
+def _write_atomic(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as tmp:
+            tmp.write(data)
+        os.replace(tmp_path, path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+def spool_upload(stream, max_size=MAX_FILE_SIZE):
+    """
+    Copie le fichier envoyé par blocs dans UPLOAD_FOLDER/tmp en calculant son empreinte ;
+    ImageRejected dès que max_size est dépassé (rien n'est gardé en mémoire).
+    Retourne (hash, chemin du fichier source).
+    """
+    spool_dir = _spool_dir(upload_root())
+    os.makedirs(spool_dir, exist_ok=True)
+    digest = hashlib.sha256()
+    size = 0
+    fd, tmp_path = tempfile.mkstemp(dir=spool_dir, suffix='.part')
+    try:
+        with os.fdopen(fd, 'wb') as tmp:
+            while True:
+                chunk = stream.read(SPOOL_CHUNK_SIZE)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > max_size:
+                    raise ImageRejected(f"Fichier trop volumineux (max {max_size // (1024 * 1024)}MB)")
+                digest.update(chunk)
+                tmp.write(chunk)
+        image_hash = digest.hexdigest()
+        path = source_path(image_hash)
+        os.replace(tmp_path, path)
+        return image_hash, path
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+def probe_image(path):
+    """Format et dimensions lus dans l'en-tête (sans décoder les pixels) ; ImageRejected si refusés"""
+    try:
+        with Image.open(path) as image:
+            fmt, (width, height) = image.format, image.size
+    except Exception:
+        raise ImageRejected("Image illisible")
+    if fmt not in ACCEPTED_FORMATS:
+        raise ImageRejected("Format non supporté. Utilisez: PNG, JPG, JPEG, GIF, WEBP")
+    if max(width, height) > MAX_IMAGE_DIMENSION or width * height > MAX_IMAGE_PIXELS:
+        raise ImageRejected(f"Image trop grande (max {MAX_IMAGE_DIMENSION} px de côté)")
+    return fmt, width, height
+
+def render_image(root, image_hash):
+    """
+    Génère toutes les tailles et tous les formats d'une image depuis son fichier source, puis supprime celui-ci.
+    Sans contexte Flask : exécuté dans les process de traitement (app/services/image_pipeline.py).
+    """
+    src = source_path(image_hash, root)
+    largest = max(IMAGE_SIZES.values())
+    with Image.open(src) as image:
+        # JPEG : décodage directement à l'échelle 1/2, 1/4 ou 1/8 la plus proche de la taille visée
+        image.draft('RGB', (largest * 2, largest * 2))
+        image.load()
+        if image.mode != 'RGB':
+            image = image.convert('RGB')
+
+        outputs = []
+        current = image
+        # Du plus grand au plus petit : chaque taille est réduite depuis la précédente
+        for size, max_side in sorted(IMAGE_SIZES.items(), key=lambda item: -item[1]):
+            current = current.copy()
+            current.thumbnail((max_side, max_side), Image.Resampling.LANCZOS)
+            for fmt in IMAGE_FORMATS:
+                pil_format, options = ENCODERS[fmt]
+                buffer = io.BytesIO()
+                current.save(buffer, format=pil_format, **options)
+                outputs.append((_image_path(root, image_hash, size, fmt), buffer.getvalue()))
+
+    marker = _image_path(root, image_hash, DEFAULT_SIZE, DEFAULT_FORMAT)
+    outputs.sort(key=lambda output: output[0] == marker)
+    for path, content in outputs:
+        _write_atomic(path, content)
+    if os.path.exists(src):
+        os.remove(src)
+    return image_hash
+
+def store_image(data):
+    """
+    Enregistre une image (octets) et génère ses variantes dans le process courant (scripts de migration).
+    Retourne le hash ; ImageRejected si le fichier n'est pas une image acceptée.
+    """
+    image_hash, path = spool_upload(io.BytesIO(data), max_size=max(len(data), 1))
+    if image_exists(image_hash):
+        os.remove(path)
+        return image_hash
+    try:
+        probe_image(path)
+    except ImageRejected:
+        os.remove(path)
+        raise
+    return render_image(upload_root(), image_hash)
+
+def purge_orphan_images(referenced_hashes, min_age_seconds=3600):
+    """
+    Supprime les images qu'aucun utilisateur ne référence plus ; retourne le nombre d'images supprimées.
+    Les fichiers récents sont gardés (image enregistrée mais utilisateur pas encore mis à jour).
+    """
+    root = _images_dir(upload_root())
+    cutoff = time.time() - min_age_seconds
+    # Fichiers sources abandonnés (process arrêté pendant le traitement)
+    spool_dir = _spool_dir(upload_root())
+    if os.path.isdir(spool_dir):
+        for name in os.listdir(spool_dir):
+            path = os.path.join(spool_dir, name)
+            if os.path.getmtime(path) < cutoff:
+                os.remove(path)
+    if not os.path.isdir(root):
+        return 0
+    removed = set()
+    for prefix in os.listdir(root):
+        directory = os.path.join(root, prefix)
+        if not os.path.isdir(directory):
+            continue
+        for name in os.listdir(directory):
+            image_hash = name.split('_', 1)[0]
+            path = os.path.join(directory, name)
+            if is_image_hash(image_hash) and image_hash not in referenced_hashes and os.path.getmtime(path) < cutoff:
+                os.remove(path)
+                removed.add(image_hash)
+    return len(removed)
@@ -0,0 +1,237 @@
+# app/services/live_runs.py
+import json
+import os
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+from app import db
+from app.models.run import Run
+from app.models.user import User
+from app.models.route import Route
+
+# Statuts d'une course en cours (carte admin)
+LIVE_STATUSES = ('active', 'in_progress')
+
+# Statut compté comme "coureur en cours" sur un itinéraire
+LIVE_STATUS = 'in_progress'
+
+# Resynchronisation périodique avec la base (plusieurs workers / process)
+RESYNC_SECONDS = float(os.getenv('LIVE_RUNS_RESYNC_SECONDS', 60))
+
+def _parse_position(value):
+    if not value:
+        return None
+    if isinstance(value, dict):
+        return value
+    try:
+        return json.loads(value)
+    except (json.JSONDecodeError, TypeError):
+        return None
+
+def _build_entry(run_id, user_id, route_id, status, start_time, distance, duration,
+                 avg_speed, current_position, user=None, route=None):
+    """Résumé d'une course en cours tel que servi par /api/routes/active-runs"""
+    entry = {
+        'id': run_id,
+        'user_id': user_id,
+        'route_id': route_id,
+        'status': status,
+        'start_time': start_time.isoformat() if start_time else None,
+        'distance': distance,
+        'duration': duration,
+        'avg_speed': avg_speed,
+        'current_position': _parse_position(current_position),
+        'last_update': None
+    }
+    if user:
+        entry['user'] = user
+    if route:
+        entry['route'] = route
+    return entry
+
+def _user_summary(user_id, username, first_name, last_name):
+    if user_id is None:
+        return None
+    return {
+        'id': user_id,
+        'username': username,
+        'first_name': first_name or '',
+        'last_name': last_name or ''
+    }
+
+def _route_summary(route_id, name, distance, difficulty):
+    if route_id is None:
+        return None
+    return {
+        'id': route_id,
+        'name': name or 'Route sans nom',
+        'distance': distance or 0,
+        'difficulty': difficulty or 'Facile'
+    }
+
+class LiveRunsRegistry:
+    """
+    Registre en mémoire des courses en cours.
+    Chargé une fois depuis la base (une requête jointe) puis tenu à jour par les événements
+    de démarrage, d'arrêt et de position : la carte admin et les compteurs par itinéraire
+    sont servis sans requête SQL.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # Un seul thread relit la base ; les autres continuent avec le registre courant
+        self._refresh_lock = threading.Lock()
+        self._entries = {}
+        self._active_by_route = Counter()
+        self._loaded_at = None
+        # Démarrages (entrée) et arrêts (None) reçus pendant une relecture, rejoués avant l'échange
+        self._changes = None
+
+    def _query_entries(self):
+        rows = db.session.query(
+            Run.id, Run.user_id, Run.route_id, Run.status, Run.start_time,
+            Run.distance, Run.duration, Run.avg_speed, Run.current_position,
+            User.username, User.first_name, User.last_name,
+            Route.name, Route.distance, Route.difficulty
+        ).outerjoin(User, Run.user_id == User.id).outerjoin(
+            Route, Run.route_id == Route.id
+        ).filter(Run.status.in_(LIVE_STATUSES)).all()
+
+        return {
+            row[0]: _build_entry(
+                *row[:9],
+                user=_user_summary(row[1], row[9], row[10], row[11]),
+                route=_route_summary(row[2], row[12], row[13], row[14])
+            )
+            for row in rows
+        }
+
+    def _ensure_loaded(self):
+        if self._loaded_at is not None and time.monotonic() - self._loaded_at < RESYNC_SECONDS:
+            return
+        # Premier chargement : attendre ; resynchronisation : ne pas bloquer si un autre thread s'en charge
+        if not self._refresh_lock.acquire(blocking=self._loaded_at is None):
+            return
+        try:
+            if self._loaded_at is not None and time.monotonic() - self._loaded_at < RESYNC_SECONDS:
+                return
+            with self._lock:
+                self._changes = {}
+            try:
+                entries = self._query_entries()
+            except Exception:
+                with self._lock:
+                    self._changes = None
+                raise
+
+            with self._lock:
+                # Événements arrivés pendant la requête : la ligne lue est peut-être antérieure au commit
+                for run_id, entry in self._changes.items():
+                    if entry is None:
+                        entries.pop(run_id, None)
+                    else:
+                        entries[run_id] = entry
+                self._changes = None
+                # Conserver les positions plus récentes reçues entre-temps
+                for run_id, entry in entries.items():
+                    previous = self._entries.get(run_id)
+                    if previous and previous.get('last_update'):
+                        entry['current_position'] = previous['current_position']
+                        entry['last_update'] = previous['last_update']
+                self._entries = entries
+                self._active_by_route = Counter(
+                    entry['route_id'] for entry in entries.values()
+                    if entry['route_id'] and entry['status'] == LIVE_STATUS
+                )
+                self._loaded_at = time.monotonic()
+        finally:
+            self._refresh_lock.release()
+
+    def run_started(self, run):
+        """Enregistre (ou met à jour) une course en cours à partir du modèle"""
+        entry = _build_entry(
+            run.id, run.user_id, run.route_id, run.status, run.start_time,
+            run.distance, run.duration, run.avg_speed, run.current_position,
+            user=_user_summary(run.user.id, run.user.username, run.user.first_name, run.user.last_name) if run.user else None,
+            route=_route_summary(run.route.id, run.route.name, run.route.distance, run.route.difficulty) if run.route else None
+        )
+        with self._lock:
+            previous = self._entries.get(run.id)
+            if previous and previous.get('last_update'):
+                entry['current_position'] = previous['current_position']
+                entry['last_update'] = previous['last_update']
+            self._remove(run.id)
+            self._entries[run.id] = entry
+            if entry['route_id'] and entry['status'] == LIVE_STATUS:
+                self._active_by_route[entry['route_id']] += 1
+            if self._changes is not None:
+                self._changes[run.id] = entry
+
+    def run_stopped(self, run_id):
+        with self._lock:
+            self._remove(run_id)
+            if self._changes is not None:
+                self._changes[run_id] = None
+
+    def sync_run(self, run):
+        """Met à jour le registre d'après le statut courant d'une course"""
+        if run.status in LIVE_STATUSES:
+            self.run_started(run)
+        else:
+            self.run_stopped(run.id)
+
+    def update_position(self, run_id, position, distance=None, duration=None):
+        """Dernière position connue d'une course (sans écriture en base)"""
+        with self._lock:
+            entry = self._entries.get(run_id)
+            if not entry:
+                return False
+            entry['current_position'] = position
+            entry['last_update'] = datetime.utcnow().isoformat()
+            if distance is not None:
+                entry['distance'] = distance
+            if duration is not None:
+                entry['duration'] = duration
+            return True
+
+    def _remove(self, run_id):
+        entry = self._entries.pop(run_id, None)
+        if not entry:
+            return
+        route_id = entry['route_id']
+        if route_id and entry['status'] == LIVE_STATUS:
+            self._active_by_route[route_id] -= 1
+            if self._active_by_route[route_id] <= 0:
+                del self._active_by_route[route_id]
+
+    def active_runners(self, route_ids):
+        """Nombre de coureurs en cours par itinéraire"""
+        self._ensure_loaded()
+        with self._lock:
+            return {route_id: self._active_by_route.get(route_id, 0) for route_id in route_ids}
+
+    def active_runs(self, route_id=None):
+        """Courses en cours, les plus récentes d'abord"""
+        self._ensure_loaded()
+        with self._lock:
+            entries = [
+                dict(entry) for entry in self._entries.values()
+                if route_id is None or entry['route_id'] == route_id
+            ]
+        entries.sort(key=lambda entry: entry['start_time'] or '', reverse=True)
+        return entries
+
+    def get(self, run_id):
+        """Résumé d'une course en cours, ou None"""
+        self._ensure_loaded()
+        with self._lock:
+            entry = self._entries.get(run_id)
+            return dict(entry) if entry else None
+
+    def invalidate(self):
+        """Force un rechargement depuis la base au prochain accès"""
+        with self._lock:
+            self._loaded_at = None
+
+live_runs = LiveRunsRegistry()
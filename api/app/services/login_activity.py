@@ -0,0 +1,143 @@
+# app/services/login_activity.py
+import atexit
+import os
+import threading
+from sqlalchemy import bindparam, update
+from app import db
+from app.models.user import User
+
+# Écriture des dates de connexion : au plus tard après LAST_LOGIN_FLUSH_SECONDS, ou dès LAST_LOGIN_BATCH_SIZE en attente
+LAST_LOGIN_FLUSH_SECONDS = float(os.getenv('LAST_LOGIN_FLUSH_SECONDS', 5))
+LAST_LOGIN_BATCH_SIZE = int(os.getenv('LAST_LOGIN_BATCH_SIZE', 100))
+
+USERS = User.__table__
+
+# UPDATE en lot (executemany) hors ORM : ni updated_at ni auth_version ne changent
+LAST_LOGIN_UPDATE = update(USERS).where(USERS.c.id == bindparam('b_id')).values(last_login=bindparam('b_last_login'))
+# Migration d'un hash hérité, seulement si le mot de passe n'a pas changé entre-temps
+REHASH_UPDATE = update(USERS).where(
+    USERS.c.id == bindparam('b_id'), USERS.c.password_hash == bindparam('b_previous')
+).values(password_hash=bindparam('b_hash'))
+
+class LoginActivityWriter:
+    """
+    Tampon des écritures liées à la connexion (last_login, hash migrés), vidé par lots
+    dans un thread d'arrière-plan au lieu d'un UPDATE + COMMIT dans chaque requête de login.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._last_logins = {}
+        self._rehashes = {}
+        self._app = None
+        self._thread = None
+        self.flushes = 0
+        self.written_logins = 0
+        self.written_rehashes = 0
+        self.failures = 0
+        self.last_error = None
+
+    def init_app(self, app):
+        with self._lock:
+            if self._app is None:
+                self._app = app
+
+    def record_login(self, user_id, when):
+        with self._lock:
+            previous = self._last_logins.get(user_id)
+            self._last_logins[user_id] = max(previous, when) if previous else when
+            due = len(self._last_logins) >= LAST_LOGIN_BATCH_SIZE
+        self._ensure_thread()
+        if due:
+            self._wake.set()
+
+    def record_rehash(self, user_id, previous_hash, new_hash):
+        with self._lock:
+            self._rehashes[user_id] = (previous_hash, new_hash)
+        self._ensure_thread()
+
+    def _ensure_thread(self):
+        with self._lock:
+            if self._app is None or (self._thread is not None and self._thread.is_alive()):
+                return
+            self._thread = threading.Thread(target=self._run, name='login-activity', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            self._wake.wait(LAST_LOGIN_FLUSH_SECONDS)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"❌ [LOGIN] Écriture des connexions en échec: {e}")
+
+    def flush(self):
+        """Écrit les connexions et hash en attente (deux UPDATE groupés, une transaction)"""
+        with self._lock:
+            last_logins, self._last_logins = self._last_logins, {}
+            rehashes, self._rehashes = self._rehashes, {}
+            app = self._app
+        if not (last_logins or rehashes) or app is None:
+            return 0
+
+        with app.app_context():
+            try:
+                if last_logins:
+                    db.session.execute(LAST_LOGIN_UPDATE, [
+                        {'b_id': user_id, 'b_last_login': when} for user_id, when in last_logins.items()
+                    ])
+                if rehashes:
+                    db.session.execute(REHASH_UPDATE, [
+                        {'b_id': user_id, 'b_previous': previous, 'b_hash': new_hash}
+                        for user_id, (previous, new_hash) in rehashes.items()
+                    ])
+                db.session.commit()
+            except Exception as e:
+                db.session.rollback()
+                # Remettre en attente ce qui n'a pas été écrit (les valeurs plus récentes l'emportent)
+                with self._lock:
+                    for user_id, when in last_logins.items():
+                        self._last_logins[user_id] = max(self._last_logins.get(user_id, when), when)
+                    for user_id, pending in rehashes.items():
+                        self._rehashes.setdefault(user_id, pending)
+                    self.failures += 1
+                    self.last_error = str(e)
+                raise
+            finally:
+                db.session.remove()
+
+        with self._lock:
+            self.flushes += 1
+            self.written_logins += len(last_logins)
+            self.written_rehashes += len(rehashes)
+        if rehashes:
+            print(f"🔐 [LOGIN] {len(rehashes)} hash migré(s) vers la KDF configurée")
+        return len(last_logins) + len(rehashes)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'pending_logins': len(self._last_logins),
+                'pending_rehashes': len(self._rehashes),
+                'flushes': self.flushes,
+                'written_logins': self.written_logins,
+                'written_rehashes': self.written_rehashes,
+                'failures': self.failures,
+                'last_error': self.last_error
+            }
+
+login_activity = LoginActivityWriter()
+
+def _flush_at_exit():
+    try:
+        login_activity.flush()
+    except Exception as e:
+        print(f"⚠️ [LOGIN] Connexions non écrites à l'arrêt: {e}")
+
+def init_login_activity(app):
+    """Rattache le tampon à l'application (contexte des écritures) et le vide à l'arrêt du process"""
+    if login_activity._app is None:
+        atexit.register(_flush_at_exit)
+    login_activity.init_app(app)
@@ -0,0 +1,138 @@
+# app/services/password_pool.py
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from werkzeug.security import generate_password_hash
+from app.models.user import PASSWORD_HASH_METHOD, check_password
+
+# Calculs de KDF simultanés (pbkdf2 et bcrypt libèrent le GIL : un thread par cœur suffit)
+KDF_WORKERS = int(os.getenv('KDF_WORKERS', min(4, os.cpu_count() or 1)))
+# Calculs en attente au-delà desquels les demandes sont refusées (503) au lieu d'occuper les workers HTTP
+KDF_QUEUE_SIZE = int(os.getenv('KDF_QUEUE_SIZE', 32))
+# Attente maximale du résultat par la requête
+KDF_TIMEOUT_SECONDS = float(os.getenv('KDF_TIMEOUT_SECONDS', 10))
+
+class KdfPoolBusy(RuntimeError):
+    """File de calcul pleine ou résultat trop long à obtenir"""
+
+class KdfPool:
+    """
+    Pool borné pour le hashage et la vérification des mots de passe, hors du thread de la requête.
+    Au plus workers + queue_size calculs en cours ou en attente ; au-delà, KdfPoolBusy.
+    """
+
+    def __init__(self, workers=KDF_WORKERS, queue_size=KDF_QUEUE_SIZE, timeout=KDF_TIMEOUT_SECONDS):
+        self.workers = workers
+        self.capacity = workers + queue_size
+        self.timeout = timeout
+        self._executor = None
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._running = 0
+        self.submitted = 0
+        self.completed = 0
+        self.rejected = 0
+        self.timeouts = 0
+        self.cancelled = 0
+        self.wait_ms_total = 0.0
+        self.max_wait_ms = 0.0
+        self.run_ms_total = 0.0
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='kdf')
+            return self._executor
+
+    def submit(self, func, *args):
+        """Planifie un calcul ; KdfPoolBusy si la file est pleine"""
+        executor = self._get_executor()
+        with self._lock:
+            if self._in_flight >= self.capacity:
+                self.rejected += 1
+                raise KdfPoolBusy("File de calcul des mots de passe saturée")
+            self._in_flight += 1
+            self.submitted += 1
+        return executor.submit(self._timed, time.perf_counter(), func, *args)
+
+    def _timed(self, enqueued, func, *args):
+        started = time.perf_counter()
+        with self._lock:
+            self._running += 1
+        try:
+            return func(*args)
+        finally:
+            finished = time.perf_counter()
+            wait_ms = (started - enqueued) * 1000
+            with self._lock:
+                self._running -= 1
+                self._in_flight -= 1
+                self.completed += 1
+                self.wait_ms_total += wait_ms
+                self.max_wait_ms = max(self.max_wait_ms, wait_ms)
+                self.run_ms_total += (finished - started) * 1000
+
+    def run(self, func, *args):
+        """Calcule et attend le résultat (au plus timeout secondes)"""
+        future = self.submit(func, *args)
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeoutError:
+            # Encore en file : retiré, pour ne pas calculer un résultat que plus personne n'attend
+            cancelled = future.cancel()
+            with self._lock:
+                self.timeouts += 1
+                if cancelled:
+                    # _timed ne s'exécutera pas : libérer sa place dans la file
+                    self._in_flight -= 1
+                    self.cancelled += 1
+            raise KdfPoolBusy("Calcul du mot de passe trop long")
+
+    def stats(self):
+        with self._lock:
+            completed = self.completed
+            return {
+                'workers': self.workers,
+                'capacity': self.capacity,
+                'running': self._running,
+                'queued': self._in_flight - self._running,
+                'submitted': self.submitted,
+                'completed': completed,
+                'rejected': self.rejected,
+                'timeouts': self.timeouts,
+                'cancelled': self.cancelled,
+                'avg_wait_ms': round(self.wait_ms_total / completed, 2) if completed else 0,
+                'max_wait_ms': round(self.max_wait_ms, 2),
+                'avg_run_ms': round(self.run_ms_total / completed, 2) if completed else 0
+            }
+
+kdf_pool = KdfPool()
+
+def hash_password(password):
+    """Hash PASSWORD_HASH_METHOD calculé dans le pool"""
+    return kdf_pool.run(generate_password_hash, password, PASSWORD_HASH_METHOD)
+
+def verify_password(user, password):
+    """Vérifie le mot de passe d'un utilisateur dans le pool (valeurs lues ici, pas d'accès ORM hors requête)"""
+    return kdf_pool.run(check_password, user.password_hash, password, user.username)
+
+def schedule_rehash(user, password):
+    """
+    Migre un hash hérité vers PASSWORD_HASH_METHOD après une connexion réussie, sans attendre le résultat :
+    écrit par lot avec last_login (app/services/login_activity.py). Ignoré si le pool est saturé.
+    """
+    from app.services.login_activity import login_activity
+
+    user_id, previous_hash = user.id, user.password_hash
+    try:
+        future = kdf_pool.submit(generate_password_hash, password, PASSWORD_HASH_METHOD)
+    except KdfPoolBusy:
+        return False
+
+    def _record(done):
+        if done.exception() is None:
+            login_activity.record_rehash(user_id, previous_hash, done.result())
+
+    future.add_done_callback(_record)
+    return True
@@ -0,0 +1,231 @@
+# app/services/route_leaderboard.py
+import os
+import threading
+import time
+from bisect import bisect_left, insort
+from sqlalchemy import delete, event, func, insert, select, text
+from sqlalchemy.orm import Session, attributes
+from app import db
+from app.models.run import Run
+from app.models.route_best_effort import RouteBestEffort
+
+# Champs d'une course dont dépend le meilleur temps
+TRACKED_FIELDS = ('user_id', 'route_id', 'duration', 'status', 'start_time')
+
+# Seules les courses terminées comptent
+FINISHED_STATUS = 'finished'
+
+# Relecture périodique de la table (autres workers / process)
+RESYNC_SECONDS = float(os.getenv('LEADERBOARD_RESYNC_SECONDS', 60))
+
+DEFAULT_LIMIT = 10
+MAX_LIMIT = 100
+
+def _finished_runs(*columns):
+    """Courses terminées avec une durée, les plus rapides d'abord (colonnes typées)"""
+    return select(*columns).where(
+        Run.status == FINISHED_STATUS, Run.duration > 0
+    ).order_by(Run.duration, Run.start_time)
+
+# --- Maintenance de la table route_best_efforts ---
+
+def _pairs(route_id, user_id):
+    return {(route_id, user_id)} if route_id is not None and user_id is not None else set()
+
+def _previous_pair(run):
+    previous = {}
+    for field in ('route_id', 'user_id'):
+        history = attributes.get_history(run, field)
+        previous[field] = history.deleted[0] if history.deleted else getattr(run, field)
+    return _pairs(previous['route_id'], previous['user_id'])
+
+def _pending_pairs(session):
+    return session.info.setdefault('best_effort_pairs', set())
+
+def _collect_before_flush(session, flush_context, instances):
+    pairs = _pending_pairs(session)
+    for obj in session.deleted:
+        if isinstance(obj, Run):
+            pairs |= _pairs(obj.route_id, obj.user_id) | _previous_pair(obj)
+    for obj in session.dirty:
+        if isinstance(obj, Run) and any(attributes.get_history(obj, field).has_changes() for field in TRACKED_FIELDS):
+            pairs |= _pairs(obj.route_id, obj.user_id) | _previous_pair(obj)
+
+def _refresh_after_flush(session, flush_context):
+    pairs = _pending_pairs(session)
+    for obj in session.new:
+        if isinstance(obj, Run):
+            pairs |= _pairs(obj.route_id, obj.user_id)
+    if not pairs:
+        return
+    session.info['best_effort_pairs'] = set()
+    changes = refresh_best_efforts(session.connection(), pairs)
+    session.info.setdefault('best_effort_changes', []).extend(changes)
+
+def _apply_after_commit(session):
+    changes = session.info.pop('best_effort_changes', None)
+    for route_id, user_id, best in changes or ():
+        leaderboards.update(route_id, user_id, best)
+
+def _discard_after_rollback(session, previous_transaction):
+    session.info.pop('best_effort_changes', None)
+    session.info.pop('best_effort_pairs', None)
+
+def refresh_best_efforts(connection, pairs):
+    """Recalcule le meilleur temps de chaque couple (itinéraire, utilisateur) ; retourne les changements"""
+    changes = []
+    for route_id, user_id in sorted(pairs):
+        row = connection.execute(
+            _finished_runs(Run.id, Run.duration, Run.start_time).where(
+                Run.route_id == route_id, Run.user_id == user_id
+            ).limit(1)
+        ).first()
+        connection.execute(
+            text("DELETE FROM route_best_efforts WHERE route_id = :route_id AND user_id = :user_id"),
+            {'route_id': route_id, 'user_id': user_id}
+        )
+        best = None
+        if row is not None:
+            connection.execute(text("""
+                INSERT INTO route_best_efforts (route_id, user_id, run_id, duration, achieved_at, updated_at)
+                VALUES (:route_id, :user_id, :run_id, :duration, :achieved_at, CURRENT_TIMESTAMP)
+            """), {'route_id': route_id, 'user_id': user_id, 'run_id': row[0],
+                   'duration': float(row[1]), 'achieved_at': row[2]})
+            best = (float(row[1]), row[0], row[2])
+        changes.append((route_id, user_id, best))
+    return changes
+
+def rebuild_best_efforts():
+    """
+    Reconstruit toute la table depuis les courses terminées (tâche de rattrapage), en une seule
+    requête INSERT ... SELECT : la course la plus rapide de chaque couple (itinéraire, utilisateur).
+    """
+    rank = func.row_number().over(
+        partition_by=(Run.route_id, Run.user_id),
+        order_by=(Run.duration, Run.start_time, Run.id)
+    ).label('rank')
+    candidates = select(
+        Run.route_id, Run.user_id, Run.id.label('run_id'), Run.duration, Run.start_time, rank
+    ).where(
+        Run.status == FINISHED_STATUS, Run.duration > 0, Run.route_id.isnot(None)
+    ).subquery()
+    best = select(
+        candidates.c.route_id, candidates.c.user_id, candidates.c.run_id, candidates.c.duration,
+        candidates.c.start_time, func.now()
+    ).where(candidates.c.rank == 1)
+
+    db.session.execute(delete(RouteBestEffort))
+    result = db.session.execute(insert(RouteBestEffort).from_select(
+        ['route_id', 'user_id', 'run_id', 'duration', 'achieved_at', 'updated_at'], best
+    ))
+    db.session.commit()
+    leaderboards.invalidate()
+    return result.rowcount
+
+def init_route_leaderboards(app):
+    """Maintient route_best_efforts à chaque écriture de course (même transaction)"""
+    if not event.contains(Session, 'before_flush', _collect_before_flush):
+        event.listen(Session, 'before_flush', _collect_before_flush)
+        event.listen(Session, 'after_flush', _refresh_after_flush)
+        event.listen(Session, 'after_commit', _apply_after_commit)
+        event.listen(Session, 'after_soft_rollback', _discard_after_rollback)
+
+# --- Classements en mémoire ---
+
+class _Leaderboard:
+    """Meilleurs temps d'un itinéraire triés par durée : rang et top N par bisection"""
+
+    def __init__(self, rows):
+        self.keys = []
+        self.by_user = {}
+        for user_id, duration, run_id, achieved_at in rows:
+            self.by_user[user_id] = (duration, run_id, achieved_at)
+            self.keys.append((duration, user_id))
+        self.keys.sort()
+        self.loaded_at = time.monotonic()
+
+    def set(self, user_id, best):
+        previous = self.by_user.pop(user_id, None)
+        if previous is not None:
+            index = bisect_left(self.keys, (previous[0], user_id))
+            if index < len(self.keys) and self.keys[index] == (previous[0], user_id):
+                del self.keys[index]
+        if best is not None:
+            self.by_user[user_id] = best
+            insort(self.keys, (best[0], user_id))
+
+    def rank(self, user_id):
+        """Rang (ex æquo : même rang) ou None si l'utilisateur n'a pas de temps"""
+        best = self.by_user.get(user_id)
+        if best is None:
+            return None
+        return bisect_left(self.keys, (best[0],)) + 1
+
+    def entry(self, user_id, rank=None):
+        duration, run_id, achieved_at = self.by_user[user_id]
+        return {
+            'rank': rank if rank is not None else self.rank(user_id),
+            'user_id': user_id,
+            'duration': duration,
+            'run_id': run_id,
+            'achieved_at': achieved_at.isoformat() if achieved_at else None
+        }
+
+    def top(self, limit):
+        entries = []
+        for index, (duration, user_id) in enumerate(self.keys[:limit]):
+            # Ex æquo : rang du premier temps identique
+            rank = entries[-1]['rank'] if entries and entries[-1]['duration'] == duration else index + 1
+            entries.append(self.entry(user_id, rank))
+        return entries
+
+class LeaderboardCache:
+    """Classements par itinéraire, chargés à la demande depuis route_best_efforts (une requête indexée)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._boards = {}
+
+    def _board(self, route_id):
+        with self._lock:
+            board = self._boards.get(route_id)
+        if board is not None and time.monotonic() - board.loaded_at < RESYNC_SECONDS:
+            return board
+        rows = db.session.query(
+            RouteBestEffort.user_id, RouteBestEffort.duration, RouteBestEffort.run_id, RouteBestEffort.achieved_at
+        ).filter(RouteBestEffort.route_id == route_id).all()
+        board = _Leaderboard(rows)
+        with self._lock:
+            self._boards[route_id] = board
+        return board
+
+    def update(self, route_id, user_id, best):
+        """Applique un meilleur temps recalculé (None : plus de temps) à un classement déjà chargé"""
+        with self._lock:
+            board = self._boards.get(route_id)
+            if board is not None:
+                board.set(user_id, best)
+
+    def invalidate(self, route_id=None):
+        with self._lock:
+            if route_id is None:
+                self._boards.clear()
+            else:
+                self._boards.pop(route_id, None)
+
+    def leaderboard(self, route_id, limit=DEFAULT_LIMIT, rank_of=None):
+        board = self._board(route_id)
+        with self._lock:
+            data = {
+                'route_id': route_id,
+                'total_runners': len(board.keys),
+                'leaderboard': board.top(limit),
+                'rank_of': None
+            }
+            if rank_of is not None:
+                data['rank_of'] = board.entry(rank_of) if rank_of in board.by_user else {
+                    'rank': None, 'user_id': rank_of
+                }
+        return data
+
+leaderboards = LeaderboardCache()
@@ -0,0 +1,234 @@
+# app/services/run_analysis.py
+import numpy as np
+from datetime import datetime
+from app import db
+from app.models.run_metrics import RunMetrics
+from app.services.live_runs import LIVE_STATUSES
+from app.utils.gps import EARTH_RADIUS_M
+
+# Version de l'algorithme : incrémentée quand les calculs changent (recalcul à la lecture)
+ANALYSIS_VERSION = 1
+
+# En dessous de cette vitesse (m/s), le coureur est considéré à l'arrêt
+MOVING_SPEED_MS = 0.5
+# Au-delà, un segment est considéré comme un saut GPS (mêmes seuils que l'ingestion)
+MAX_PLAUSIBLE_SPEED_MS = 45.0 / 3.6
+# Un trou de plus de 30 s entre deux points ne compte pas comme temps en mouvement
+MAX_MOVING_GAP_S = 30.0
+
+# Dénivelé : lissage glissant puis hystérésis pour ignorer le bruit de l'altimètre
+ELEVATION_SMOOTHING_WINDOW = 5
+ELEVATION_THRESHOLD_M = 3.0
+
+# Série d'allure : un échantillon tous les 100 m, moyenne glissante sur 5 échantillons
+PACE_SAMPLE_M = 100.0
+PACE_SMOOTHING_WINDOW = 5
+PACE_MAX_SAMPLES = 500
+
+BEST_EFFORT_DISTANCES = {'1k': 1000, '5k': 5000, '10k': 10000}
+
+def _column(points, field):
+    values = [point.get(field) for point in points]
+    if any(value is None for value in values):
+        return None
+    return np.array(values, dtype=np.float64)
+
+def segment_distances(lat, lng):
+    """Distances haversine (m) entre points consécutifs"""
+    phi = np.radians(lat)
+    dphi = np.diff(phi)
+    dlambda = np.radians(np.diff(lng))
+    a = np.sin(dphi / 2) ** 2 + np.cos(phi[:-1]) * np.cos(phi[1:]) * np.sin(dlambda / 2) ** 2
+    return 2 * EARTH_RADIUS_M * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+
+def _moving_average(values, window):
+    if len(values) < window:
+        return values
+    kernel = np.ones(window) / window
+    padded = np.pad(values, (window // 2, window - 1 - window // 2), mode='edge')
+    return np.convolve(padded, kernel, mode='valid')
+
+def elevation_changes(altitude):
+    """Dénivelés positif et négatif (m) après lissage et filtrage par hystérésis"""
+    smoothed = _moving_average(altitude, ELEVATION_SMOOTHING_WINDOW)
+    gain = loss = 0.0
+    reference = smoothed[0]
+    for value in smoothed[1:]:
+        delta = value - reference
+        if delta >= ELEVATION_THRESHOLD_M:
+            gain += delta
+            reference = value
+        elif delta <= -ELEVATION_THRESHOLD_M:
+            loss -= delta
+            reference = value
+    return float(gain), float(loss)
+
+def _time_at_distance(cumulative_distance, cumulative_time, distances):
+    """Temps (s) de passage interpolé aux distances données"""
+    return np.interp(distances, cumulative_distance, cumulative_time)
+
+def km_splits(cumulative_distance, cumulative_time):
+    """Temps intermédiaires par kilomètre (dernier tronçon partiel inclus)"""
+    total = cumulative_distance[-1]
+    marks = np.arange(1000.0, total, 1000.0)
+    boundaries = np.concatenate(([0.0], marks, [total]))
+    times = _time_at_distance(cumulative_distance, cumulative_time, boundaries)
+    splits = []
+    for index, (distance, duration) in enumerate(zip(np.diff(boundaries), np.diff(times))):
+        if distance < 1:
+            continue
+        splits.append({
+            'km': index + 1,
+            'distance': round(float(distance), 1),
+            'duration': round(float(duration), 1),
+            'pace': round(float(duration / distance * 1000), 1)  # s/km
+        })
+    return splits
+
+def pace_series(cumulative_distance, cumulative_time):
+    """Allure lissée (s/km) échantillonnée sur la distance : [[distance_m, allure], ...]"""
+    total = cumulative_distance[-1]
+    step = max(PACE_SAMPLE_M, total / PACE_MAX_SAMPLES)
+    grid = np.arange(0.0, total, step)
+    if len(grid) < 2:
+        return []
+    grid = np.append(grid, total)
+    times = _time_at_distance(cumulative_distance, cumulative_time, grid)
+    pace = np.diff(times) / np.diff(grid) * 1000
+    pace = _moving_average(pace, PACE_SMOOTHING_WINDOW)
+    return [[round(float(d), 1), round(float(p), 1)] for d, p in zip(grid[1:], pace)]
+
+def best_efforts(cumulative_distance, cumulative_time):
+    """Meilleur temps (s) sur 1, 5 et 10 km, toutes fenêtres de départ confondues"""
+    total = cumulative_distance[-1]
+    efforts = {}
+    for label, target in BEST_EFFORT_DISTANCES.items():
+        if total < target:
+            efforts[label] = None
+            continue
+        starts = cumulative_distance[cumulative_distance + target <= total]
+        start_times = _time_at_distance(cumulative_distance, cumulative_time, starts)
+        end_times = _time_at_distance(cumulative_distance, cumulative_time, starts + target)
+        efforts[label] = round(float(np.min(end_times - start_times)), 1)
+    return efforts
+
+def analyze_track(points):
+    """
+    Analyse complète d'une trace GPS :
+    distance, temps écoulé / en mouvement, vitesse max, dénivelé, temps au km, allure, meilleurs efforts.
+    Retourne None si la trace est inexploitable.
+    """
+    if len(points) < 2:
+        return None
+
+    lat = _column(points, 'latitude')
+    lng = _column(points, 'longitude')
+    segments = segment_distances(lat, lng)
+    cumulative_distance = np.concatenate(([0.0], np.cumsum(segments)))
+
+    metrics = {
+        'point_count': len(points),
+        'distance': float(cumulative_distance[-1]),
+        'elapsed_time': None,
+        'moving_time': None,
+        'max_speed': None,
+        'avg_moving_speed': None,
+        'elevation_gain': None,
+        'elevation_loss': None,
+        'splits': [],
+        'pace_series': [],
+        'best_efforts': {label: None for label in BEST_EFFORT_DISTANCES}
+    }
+
+    altitude = _column(points, 'altitude')
+    if altitude is not None:
+        metrics['elevation_gain'], metrics['elevation_loss'] = elevation_changes(altitude)
+
+    timestamps = _column(points, 'timestamp')
+    if timestamps is None:
+        return metrics
+
+    elapsed = np.diff(timestamps) / 1000.0
+    with np.errstate(divide='ignore', invalid='ignore'):
+        speeds = np.where(elapsed > 0, segments / elapsed, 0.0)
+    plausible = speeds <= MAX_PLAUSIBLE_SPEED_MS
+    moving = plausible & (speeds >= MOVING_SPEED_MS) & (elapsed <= MAX_MOVING_GAP_S)
+
+    # Les sauts GPS ne comptent ni dans la distance ni dans les temps intermédiaires
+    segments = np.where(plausible, segments, 0.0)
+    cumulative_distance = np.concatenate(([0.0], np.cumsum(segments)))
+    metrics['distance'] = float(cumulative_distance[-1])
+
+    moving_time = float(elapsed[moving].sum())
+    metrics['elapsed_time'] = float((timestamps[-1] - timestamps[0]) / 1000.0)
+    metrics['moving_time'] = moving_time
+    if plausible.any():
+        metrics['max_speed'] = float(speeds[plausible].max() * 3.6)
+    if moving_time > 0:
+        metrics['avg_moving_speed'] = float(segments[moving].sum() / moving_time * 3.6)
+
+    # Horloge "en mouvement" : les arrêts ne pénalisent ni les temps au km ni les meilleurs efforts
+    moving_clock = np.concatenate(([0.0], np.cumsum(np.where(moving, elapsed, 0.0))))
+    if cumulative_distance[-1] > 0:
+        # Interpolation sur une distance strictement croissante (points immobiles écartés)
+        advancing = np.concatenate(([True], segments > 0))
+        distance_axis = cumulative_distance[advancing]
+        clock_axis = moving_clock[advancing]
+        metrics['splits'] = km_splits(distance_axis, clock_axis)
+        metrics['pace_series'] = pace_series(distance_axis, clock_axis)
+        metrics['best_efforts'] = best_efforts(distance_axis, clock_axis)
+
+    return metrics
+
+def refresh_run_metrics(run, points=None):
+    """
+    Calcule et enregistre les métriques dérivées d'une course.
+    Complète au passage les champs de la course non renseignés par le client.
+    """
+    if points is None:
+        points = run.get_gps_points()
+    try:
+        metrics = analyze_track(points)
+        record = RunMetrics.query.filter_by(run_id=run.id).first()
+        if metrics is None:
+            if record:
+                db.session.delete(record)
+                db.session.commit()
+            return None
+
+        if record is None:
+            record = RunMetrics(run_id=run.id)
+            db.session.add(record)
+        record.update_from(metrics)
+        record.version = ANALYSIS_VERSION
+        record.computed_at = datetime.utcnow()
+
+        if run.elevation_gain is None and metrics['elevation_gain'] is not None:
+            run.elevation_gain = round(metrics['elevation_gain'], 1)
+        if run.max_speed is None and metrics['max_speed'] is not None:
+            run.max_speed = round(metrics['max_speed'], 2)
+        if not run.duration and metrics['elapsed_time']:
+            run.duration = int(metrics['elapsed_time'])
+
+        db.session.commit()
+        return record
+    except Exception as e:
+        db.session.rollback()
+        print(f"⚠️ Erreur calcul des métriques de la course {run.id}: {e}")
+        return None
+
+def get_run_metrics(run):
+    """Métriques enregistrées d'une course, calculées au premier accès si absentes ou périmées"""
+    record = RunMetrics.query.filter_by(run_id=run.id).first()
+    if record is not None and record.version == ANALYSIS_VERSION:
+        return record
+    if not run.gps_data or run.status in LIVE_STATUSES:
+        return record
+    return refresh_run_metrics(run)
+
+def metrics_summaries(run_ids):
+    """Résumé des métriques de plusieurs courses, en une requête"""
+    if not run_ids:
+        return {}
+    records = RunMetrics.query.filter(RunMetrics.run_id.in_(run_ids)).all()
+    return {record.run_id: record.to_summary() for record in records}
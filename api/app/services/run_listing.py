@@ -0,0 +1,48 @@
+# app/services/run_listing.py
+from datetime import datetime
+from sqlalchemy.orm import defer, joinedload
+from app.models.run import Run
+from app.models.user import User
+from app.models.route import Route
+
+def build_run_listing_query():
+    """
+    Requête de listing des courses en un seul aller-retour :
+    - utilisateur et itinéraire chargés par jointure (pas de lazy load par ligne)
+    - seules les colonnes affichées sont lues (gps_data et current_position exclus)
+    """
+    return Run.query.options(
+        defer(Run.gps_data),
+        defer(Run.current_position),
+        joinedload(Run.user).load_only(User.id, User.username, User.first_name, User.last_name),
+        joinedload(Run.route).load_only(Route.id, Route.name, Route.difficulty)
+    )
+
+def filter_runs_query(query, current_user_id, is_admin, user_id=None, route_id=None,
+                      status=None, date_from=None, date_to=None):
+    """Applique les droits d'accès et les filtres communs des listes de courses"""
+    # Si pas admin, ne peut voir que ses propres courses
+    if not is_admin:
+        query = query.filter(Run.user_id == current_user_id)
+    elif user_id:
+        query = query.filter(Run.user_id == user_id)
+
+    if route_id:
+        query = query.filter(Run.route_id == route_id)
+
+    if status:
+        query = query.filter(Run.status == status)
+
+    if date_from:
+        try:
+            query = query.filter(Run.start_time >= datetime.fromisoformat(date_from))
+        except ValueError:
+            pass
+
+    if date_to:
+        try:
+            query = query.filter(Run.start_time <= datetime.fromisoformat(date_to))
+        except ValueError:
+            pass
+
+    return query
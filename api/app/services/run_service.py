@@ -1,4 +1,17 @@
 from datetime import datetime
+from app.services.track_lod import refresh_track_lods
+from app.services.run_analysis import refresh_run_metrics
+
+def finalize_run(run):
+    """
+    Traitements de fin de course à partir de la trace GPS (décodée une seule fois) :
+    niveaux de détail de la trace et métriques dérivées
+    """
+    points = run.get_gps_points()
+    if not points:
+        return
+    refresh_track_lods(run, points)
+    refresh_run_metrics(run, points)
 
 def calculate_run_stats(run):
     """
@@ -16,9 +29,9 @@ def calculate_run_stats(run):
         run.avg_speed = run.distance / run.duration  # en m/s
     
     # Estimation des calories (approximation simple)
-    if not run.calories and run.distance:
+    if not run.calories_burned and run.distance:
         # Approximation: 1 km = 60 kcal pour une personne de 70kg
-        run.calories = int(run.distance / 1000 * 60)
+        run.calories_burned = int(run.distance / 1000 * 60)
     
     return run
 
@@ -0,0 +1,146 @@
+# app/services/stats_distribution.py
+import math
+from datetime import datetime, timedelta
+from sqlalchemy import func, text
+from app import db
+from app.models.distribution import UserDistributionBin, RouteDistributionBin
+
+# Histogrammes à intervalles fixes : (borne basse, largeur, nombre d'intervalles, unité).
+# Les valeurs hors bornes sont comptées dans le premier ou le dernier intervalle.
+DISTRIBUTION_METRICS = {
+    'pace': (120.0, 10.0, 78, 's/km'),  # 2:00 à 15:00 min/km
+    'distance': (0.0, 500.0, 100, 'm'),  # 0 à 50 km
+    'heart_rate': (60.0, 2.0, 80, 'bpm'),  # 60 à 220 bpm
+}
+
+PERCENTILES = (50, 90, 99)
+
+# (table, colonne de regroupement) par dimension, comme pour les agrégats journaliers
+DIMENSIONS = {
+    'user': ('user_distribution_bins', 'user_id'),
+    'route': ('route_distribution_bins', 'route_id'),
+}
+
+def run_values(distance, duration, avg_heart_rate):
+    """Valeurs d'une course pour chaque métrique (absentes si non renseignées)"""
+    values = {}
+    if distance and distance > 0:
+        values['distance'] = float(distance)
+        if duration and duration > 0:
+            values['pace'] = duration / (distance / 1000.0)
+    if avg_heart_rate and avg_heart_rate > 0:
+        values['heart_rate'] = float(avg_heart_rate)
+    return values
+
+def bin_index(metric, value):
+    low, width, count, _ = DISTRIBUTION_METRICS[metric]
+    return min(max(int(math.floor((value - low) / width)), 0), count - 1)
+
+def _count_bins(rows):
+    """{(id, jour, métrique, bin): nombre} depuis des lignes (id, jour, distance, durée, fc)"""
+    counts = {}
+    for key_id, day, distance, duration, avg_heart_rate in rows:
+        for metric, value in run_values(distance, duration, avg_heart_rate).items():
+            key = (key_id, day, metric, bin_index(metric, value))
+            counts[key] = counts.get(key, 0) + 1
+    return counts
+
+def _insert_counts(connection, table, column, counts):
+    if not counts:
+        return
+    connection.execute(
+        text(f"INSERT INTO {table} ({column}, day, metric, bin, count) "
+             f"VALUES (:key_id, :day, :metric, :bin, :count)"),
+        [{'key_id': key_id, 'day': day, 'metric': metric, 'bin': index, 'count': count}
+         for (key_id, day, metric, index), count in counts.items()]
+    )
+
+def refresh_distribution_keys(connection, keys):
+    """Recalcule les histogrammes des clés (dimension, id, jour) depuis les courses de ce jour"""
+    for dimension, key_id, day in sorted(keys, key=lambda key: (key[0], key[1], key[2])):
+        table, column = DIMENSIONS[dimension]
+        start = datetime.combine(day, datetime.min.time())
+        connection.execute(
+            text(f"DELETE FROM {table} WHERE {column} = :key_id AND day = :day"),
+            {'key_id': key_id, 'day': day}
+        )
+        rows = connection.execute(text(f"""
+            SELECT distance, duration, avg_heart_rate FROM runs
+            WHERE {column} = :key_id AND start_time >= :start AND start_time < :end
+        """), {'key_id': key_id, 'start': start, 'end': start + timedelta(days=1)}).all()
+        _insert_counts(connection, table, column, _count_bins((key_id, day) + tuple(row) for row in rows))
+
+def backfill_distributions(connection, start, end):
+    """Reconstruit les histogrammes des courses démarrées dans [start, end[ (jours entiers)"""
+    written = 0
+    for table, column in DIMENSIONS.values():
+        connection.execute(
+            text(f"DELETE FROM {table} WHERE day >= :day_from AND day < :day_to"),
+            {'day_from': start.date(), 'day_to': end.date()}
+        )
+        rows = connection.execute(text(f"""
+            SELECT {column}, start_time, distance, duration, avg_heart_rate FROM runs
+            WHERE {column} IS NOT NULL AND start_time >= :start AND start_time < :end
+        """), {'start': start, 'end': end}).all()
+        counts = _count_bins(
+            (key_id, _as_day(start_time), distance, duration, avg_heart_rate)
+            for key_id, start_time, distance, duration, avg_heart_rate in rows
+        )
+        _insert_counts(connection, table, column, counts)
+        written += len(counts)
+    return written
+
+def _as_day(value):
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    return value.date()
+
+# --- Lecture ---
+
+def _percentile(bins, total, low, width, percentile):
+    """Percentile approché : interpolation linéaire dans l'intervalle qui le contient"""
+    rank = percentile / 100.0 * total
+    seen = 0
+    for index, count in bins:
+        if seen + count >= rank:
+            fraction = (rank - seen) / count if count else 0
+            return round(low + (index + fraction) * width, 2)
+        seen += count
+    index = bins[-1][0]
+    return round(low + (index + 1) * width, 2)
+
+def distribution(metric, day_from=None, day_to=None, user_id=None, route_id=None):
+    """
+    Histogramme fusionné sur une période (somme des intervalles journaliers), global ou filtré,
+    et percentiles approchés (précision : largeur d'un intervalle).
+    """
+    low, width, bin_count, unit = DISTRIBUTION_METRICS[metric]
+    model = RouteDistributionBin if route_id is not None else UserDistributionBin
+    query = db.session.query(model.bin, func.sum(model.count)).filter(model.metric == metric)
+    if route_id is not None:
+        query = query.filter(RouteDistributionBin.route_id == route_id)
+    elif user_id is not None:
+        query = query.filter(UserDistributionBin.user_id == user_id)
+    if day_from is not None:
+        query = query.filter(model.day >= day_from)
+    if day_to is not None:
+        query = query.filter(model.day <= day_to)
+
+    bins = [(int(index), int(count)) for index, count in query.group_by(model.bin).order_by(model.bin).all() if count]
+    total = sum(count for _, count in bins)
+    mean = (sum((low + (index + 0.5) * width) * count for index, count in bins) / total) if total else None
+
+    return {
+        'metric': metric,
+        'unit': unit,
+        'count': total,
+        'bin_width': width,
+        'range': [low, low + bin_count * width],
+        'mean': round(mean, 2) if mean is not None else None,
+        'percentiles': {
+            f'p{percentile}': _percentile(bins, total, low, width, percentile) if total else None
+            for percentile in PERCENTILES
+        },
+        # [début, fin, nombre] des intervalles non vides
+        'bins': [[low + index * width, low + (index + 1) * width, count] for index, count in bins]
+    }
@@ -0,0 +1,68 @@
+# app/services/stats_engine.py
+import time
+from datetime import datetime, timedelta
+from sqlalchemy import text
+from app import db
+
+# Fenêtre d'activité : un utilisateur est actif s'il a couru dans les 30 derniers jours
+ACTIVE_WINDOW_DAYS = 30
+
+# Toutes les métriques des courses en un seul parcours de la table (agrégation conditionnelle)
+RUNS_STATS_SQL = text("""
+    SELECT
+        COUNT(*) AS total_runs,
+        COALESCE(SUM(distance), 0) AS total_distance,
+        COALESCE(SUM(CASE WHEN start_time >= :month_start THEN 1 ELSE 0 END), 0) AS runs_this_month,
+        COALESCE(SUM(CASE WHEN start_time >= :month_start THEN distance ELSE 0 END), 0) AS distance_this_month,
+        COUNT(DISTINCT CASE WHEN start_time >= :active_since THEN user_id END) AS active_users,
+        AVG(CASE WHEN avg_speed > 0 THEN avg_speed END) AS avg_speed
+    FROM runs
+""")
+
+# Utilisateurs et itinéraires : tables de petite taille, regroupées en une seule requête
+USERS_ROUTES_STATS_SQL = text("""
+    SELECT
+        (SELECT COUNT(*) FROM users) AS total_users,
+        (SELECT COALESCE(SUM(CASE WHEN created_at >= :month_start THEN 1 ELSE 0 END), 0) FROM users) AS new_users_this_month,
+        (SELECT COUNT(*) FROM routes) AS total_routes,
+        (SELECT COALESCE(SUM(CASE WHEN status = 'active' THEN 1 ELSE 0 END), 0) FROM routes) AS active_routes
+""")
+
+def _timed(timings, name, statement, params):
+    started = time.perf_counter()
+    row = db.session.execute(statement, params).mappings().one()
+    timings[name] = round((time.perf_counter() - started) * 1000, 2)
+    return row
+
+def compute_admin_stats(now=None):
+    """
+    Statistiques du tableau de bord admin en deux requêtes paramétrées.
+    Retourne (stats, timings) où timings donne la durée de chaque requête en millisecondes.
+    """
+    now = now or datetime.utcnow()
+    params = {
+        'month_start': now.replace(day=1, hour=0, minute=0, second=0, microsecond=0),
+        'active_since': now - timedelta(days=ACTIVE_WINDOW_DAYS)
+    }
+
+    timings = {}
+    runs = _timed(timings, 'runs', RUNS_STATS_SQL, params)
+    others = _timed(timings, 'users_routes', USERS_ROUTES_STATS_SQL, params)
+    timings['total'] = round(sum(timings.values()), 2)
+
+    avg_speed = float(runs['avg_speed'] or 0)
+    stats = {
+        'total_users': int(others['total_users'] or 0),
+        'active_users': int(runs['active_users'] or 0),
+        'new_users_this_month': int(others['new_users_this_month'] or 0),
+        'total_runs': int(runs['total_runs'] or 0),
+        'runs_this_month': int(runs['runs_this_month'] or 0),
+        # Distances stockées en mètres, exposées en km
+        'total_distance': round(float(runs['total_distance'] or 0) / 1000, 1),
+        'distance_this_month': round(float(runs['distance_this_month'] or 0) / 1000, 1),
+        'total_routes': int(others['total_routes'] or 0),
+        'active_routes': int(others['active_routes'] or 0),
+        # Vitesse moyenne en km/h convertie en allure (min/km)
+        'average_pace': round(60 / avg_speed, 2) if avg_speed > 0 else 0
+    }
+    return stats, timings
@@ -0,0 +1,230 @@
+# app/services/stats_rollups.py
+from datetime import datetime, date, timedelta
+from sqlalchemy import event, func, text
+from sqlalchemy.orm import Session, attributes
+from app import db
+from app.models.run import Run
+from app.models.rollup import UserDailyStats, RouteDailyStats
+from app.services.stats_distribution import refresh_distribution_keys, backfill_distributions
+
+# Champs d'une course dont dépendent les agrégats
+TRACKED_FIELDS = ('user_id', 'route_id', 'start_time', 'distance', 'duration',
+                  'avg_speed', 'max_speed', 'calories_burned', 'avg_heart_rate')
+
+ROLLUP_COLUMNS = ('runs_count, total_distance, total_duration, duration_count, avg_speed_sum, '
+                  'avg_speed_count, max_speed, max_duration, min_duration, total_calories')
+
+# Mêmes agrégats pour le recalcul d'une clé et pour la reconstruction complète
+RUN_AGGREGATES_SQL = """
+    COUNT(*), COALESCE(SUM(distance), 0), COALESCE(SUM(duration), 0), COUNT(duration),
+    COALESCE(SUM(CASE WHEN avg_speed > 0 THEN avg_speed END), 0),
+    COUNT(CASE WHEN avg_speed > 0 THEN 1 END),
+    MAX(max_speed), MAX(duration), MIN(duration), COALESCE(SUM(calories_burned), 0)
+"""
+
+# (table, colonne de regroupement) par dimension
+DIMENSIONS = {
+    'user': ('user_daily_stats', 'user_id'),
+    'route': ('route_daily_stats', 'route_id'),
+}
+
+# Fenêtre de reconstruction (jours par transaction)
+BACKFILL_WINDOW_DAYS = 31
+
+def _day_bounds(day):
+    start = datetime.combine(day, datetime.min.time())
+    return start, start + timedelta(days=1)
+
+def _keys_for(user_id, route_id, start_time):
+    if start_time is None:
+        return set()
+    day = start_time.date()
+    keys = set()
+    if user_id is not None:
+        keys.add(('user', user_id, day))
+    if route_id is not None:
+        keys.add(('route', route_id, day))
+    return keys
+
+def _current_keys(run):
+    return _keys_for(run.user_id, run.route_id, run.start_time)
+
+def _previous_keys(run):
+    """Clés correspondant aux valeurs chargées avant modification"""
+    previous = {}
+    for field in ('user_id', 'route_id', 'start_time'):
+        history = attributes.get_history(run, field)
+        previous[field] = history.deleted[0] if history.deleted else getattr(run, field)
+    return _keys_for(previous['user_id'], previous['route_id'], previous['start_time'])
+
+def _is_stats_change(run):
+    return any(attributes.get_history(run, field).has_changes() for field in TRACKED_FIELDS)
+
+def _pending_keys(session):
+    return session.info.setdefault('stats_rollup_keys', set())
+
+def _collect_before_flush(session, flush_context, instances):
+    # Courses supprimées ou modifiées : lues avant l'écriture (lignes encore présentes)
+    keys = _pending_keys(session)
+    for obj in session.deleted:
+        if isinstance(obj, Run):
+            keys |= _current_keys(obj) | _previous_keys(obj)
+    for obj in session.dirty:
+        if isinstance(obj, Run) and _is_stats_change(obj):
+            keys |= _current_keys(obj) | _previous_keys(obj)
+
+def _refresh_after_flush(session, flush_context):
+    # Nouvelles courses : start_time par défaut connu seulement après l'INSERT
+    keys = _pending_keys(session)
+    for obj in session.new:
+        if isinstance(obj, Run):
+            keys |= _current_keys(obj)
+    if not keys:
+        return
+    session.info['stats_rollup_keys'] = set()
+    refresh_rollup_keys(session.connection(), keys)
+    refresh_distribution_keys(session.connection(), keys)
+
+def refresh_rollup_keys(connection, keys):
+    """Recalcule les lignes d'agrégats (dimension, id, jour) depuis la table runs"""
+    for dimension, key_id, day in sorted(keys, key=lambda key: (key[0], key[1], key[2])):
+        table, column = DIMENSIONS[dimension]
+        start, end = _day_bounds(day)
+        connection.execute(
+            text(f"DELETE FROM {table} WHERE {column} = :key_id AND day = :day"),
+            {'key_id': key_id, 'day': day}
+        )
+        connection.execute(text(f"""
+            INSERT INTO {table} (day, {column}, {ROLLUP_COLUMNS})
+            SELECT :day, {column}, {RUN_AGGREGATES_SQL}
+            FROM runs
+            WHERE {column} = :key_id AND start_time >= :start AND start_time < :end
+            GROUP BY {column}
+        """), {'key_id': key_id, 'day': day, 'start': start, 'end': end})
+
+def init_stats_rollups(app):
+    """Maintient les agrégats journaliers et les histogrammes à chaque écriture de course (même transaction)"""
+    if not event.contains(Session, 'before_flush', _collect_before_flush):
+        event.listen(Session, 'before_flush', _collect_before_flush)
+        event.listen(Session, 'after_flush', _refresh_after_flush)
+
+def backfill_rollups(date_from=None, date_to=None, window_days=BACKFILL_WINDOW_DAYS):
+    """
+    Reconstruit les agrégats depuis la table runs, par fenêtres de window_days jours.
+    Sans bornes, couvre toute la période des courses existantes.
+    """
+    if date_from is None or date_to is None:
+        first, last = db.session.query(func.min(Run.start_time), func.max(Run.start_time)).one()
+        if first is None:
+            return 0
+        date_from = date_from or first.date()
+        date_to = date_to or last.date()
+
+    rows = 0
+    window_start = date_from
+    while window_start <= date_to:
+        window_end = min(window_start + timedelta(days=window_days - 1), date_to)
+        start, _ = _day_bounds(window_start)
+        _, end = _day_bounds(window_end)
+        for table, column in DIMENSIONS.values():
+            db.session.execute(
+                text(f"DELETE FROM {table} WHERE day >= :day_from AND day <= :day_to"),
+                {'day_from': window_start, 'day_to': window_end}
+            )
+            result = db.session.execute(text(f"""
+                INSERT INTO {table} (day, {column}, {ROLLUP_COLUMNS})
+                SELECT DATE(start_time), {column}, {RUN_AGGREGATES_SQL}
+                FROM runs
+                WHERE {column} IS NOT NULL AND start_time >= :start AND start_time < :end
+                GROUP BY DATE(start_time), {column}
+            """), {'start': start, 'end': end})
+            rows += max(result.rowcount or 0, 0)
+        # Histogrammes (pace, distance, fréquence cardiaque) de la même fenêtre
+        rows += backfill_distributions(db.session.connection(), start, end)
+        db.session.commit()
+        print(f"📊 Agrégats reconstruits du {window_start} au {window_end}")
+        window_start = window_end + timedelta(days=1)
+    return rows
+
+# --- Lecture des agrégats ---
+
+def _totals_columns(model):
+    return (
+        func.coalesce(func.sum(model.runs_count), 0),
+        func.coalesce(func.sum(model.total_distance), 0),
+        func.coalesce(func.sum(model.total_duration), 0),
+        func.coalesce(func.sum(model.duration_count), 0),
+        func.coalesce(func.sum(model.avg_speed_sum), 0),
+        func.coalesce(func.sum(model.avg_speed_count), 0),
+        func.max(model.max_speed),
+        func.max(model.max_duration),
+        func.min(model.min_duration),
+        func.coalesce(func.sum(model.total_calories), 0),
+    )
+
+def _totals_dict(row):
+    (runs_count, total_distance, total_duration, duration_count, avg_speed_sum,
+     avg_speed_count, max_speed, max_duration, min_duration, total_calories) = row
+    runs_count = int(runs_count or 0)
+    return {
+        'runs_count': runs_count,
+        'total_distance': float(total_distance or 0),
+        'total_duration': float(total_duration or 0),
+        'duration_count': int(duration_count or 0),
+        'avg_distance': float(total_distance or 0) / runs_count if runs_count else 0,
+        'avg_duration': float(total_duration or 0) / duration_count if duration_count else 0,
+        'avg_speed': float(avg_speed_sum or 0) / avg_speed_count if avg_speed_count else 0,
+        'max_speed': float(max_speed or 0),
+        'max_duration': float(max_duration or 0),
+        'min_duration': float(min_duration or 0),
+        'total_calories': int(total_calories or 0),
+    }
+
+def _filtered(query, model, key_column=None, key_id=None, day_from=None, day_to=None):
+    if key_id is not None:
+        query = query.filter(key_column == key_id)
+    if day_from is not None:
+        query = query.filter(model.day >= day_from)
+    if day_to is not None:
+        query = query.filter(model.day <= day_to)
+    return query
+
+def user_rollup_totals(user_id=None, day_from=None, day_to=None):
+    """Totaux sur une période, pour un utilisateur ou pour tous (jours inclus)"""
+    query = db.session.query(*_totals_columns(UserDailyStats))
+    query = _filtered(query, UserDailyStats, UserDailyStats.user_id, user_id, day_from, day_to)
+    return _totals_dict(query.one())
+
+def user_rollup_daily(user_id=None, day_from=None, day_to=None):
+    """Totaux jour par jour : {date: totaux}"""
+    query = db.session.query(UserDailyStats.day, *_totals_columns(UserDailyStats))
+    query = _filtered(query, UserDailyStats, UserDailyStats.user_id, user_id, day_from, day_to)
+    rows = query.group_by(UserDailyStats.day).order_by(UserDailyStats.day).all()
+    return {as_date(row[0]): _totals_dict(row[1:]) for row in rows}
+
+def route_rollup_totals(route_id, day_from=None, day_to=None):
+    """Totaux d'un itinéraire sur une période (jours inclus)"""
+    query = db.session.query(*_totals_columns(RouteDailyStats))
+    query = _filtered(query, RouteDailyStats, RouteDailyStats.route_id, route_id, day_from, day_to)
+    return _totals_dict(query.one())
+
+def route_runs_count(route_ids, day):
+    """Nombre de courses d'un jour par itinéraire"""
+    if not route_ids:
+        return {}
+    rows = db.session.query(RouteDailyStats.route_id, RouteDailyStats.runs_count).filter(
+        RouteDailyStats.route_id.in_(route_ids),
+        RouteDailyStats.day == day
+    ).all()
+    return dict(rows)
+
+def as_date(value):
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return date.fromisoformat(str(value)[:10])
+
+def month_start(today=None):
+    today = today or datetime.now().date()
+    return today.replace(day=1)
@@ -0,0 +1,164 @@
+# app/services/stats_series.py
+from datetime import date, timedelta
+from sqlalchemy import func
+from app import db
+from app.models.rollup import UserDailyStats, RouteDailyStats
+from app.services.stats_rollups import as_date
+
+BUCKETS = ('day', 'week', 'month')
+
+# Métrique -> unité (distance en mètres, durée en secondes, vitesses en km/h)
+METRICS = {
+    'runs': 'count',
+    'distance': 'm',
+    'duration': 's',
+    'avg_speed': 'km/h',
+    'max_speed': 'km/h',
+    'calories': 'kcal',
+    'active_users': 'count',
+}
+
+# Période par défaut (nombre de buckets jusqu'à aujourd'hui) et nombre maximal de buckets
+DEFAULT_BUCKET_COUNT = {'day': 30, 'week': 12, 'month': 12}
+MAX_BUCKETS = 400
+
+class SeriesError(ValueError):
+    """Paramètres de série invalides"""
+
+def bucket_start(day, bucket):
+    """Premier jour du bucket contenant day (semaine ISO : lundi)"""
+    if bucket == 'week':
+        return day - timedelta(days=day.weekday())
+    if bucket == 'month':
+        return day.replace(day=1)
+    return day
+
+def next_bucket(start, bucket):
+    if bucket == 'week':
+        return start + timedelta(days=7)
+    if bucket == 'month':
+        return date(start.year + (start.month == 12), start.month % 12 + 1, 1)
+    return start + timedelta(days=1)
+
+def bucket_starts(day_from, day_to, bucket):
+    """Tous les buckets de la période, vides compris"""
+    starts = []
+    current = bucket_start(day_from, bucket)
+    while current <= day_to:
+        starts.append(current)
+        current = next_bucket(current, bucket)
+    return starts
+
+def default_range(bucket, today):
+    """Période couvrant les DEFAULT_BUCKET_COUNT derniers buckets, bucket courant inclus"""
+    start = bucket_start(today, bucket)
+    for _ in range(DEFAULT_BUCKET_COUNT[bucket] - 1):
+        start = bucket_start(start - timedelta(days=1), bucket)
+    return start, today
+
+def _empty_totals():
+    return {
+        'runs_count': 0,
+        'total_distance': 0.0,
+        'total_duration': 0.0,
+        'duration_count': 0,
+        'avg_speed_sum': 0.0,
+        'avg_speed_count': 0,
+        'max_speed': None,
+        'total_calories': 0,
+        'active_users': 0,
+    }
+
+def bucket_totals(bucket, day_from, day_to, user_id=None, route_id=None, with_active_users=False):
+    """
+    Totaux par bucket {début du bucket: totaux} depuis les agrégats journaliers, buckets vides inclus.
+    Une requête groupée par jour, puis regroupement des jours en semaines ou mois.
+    """
+    if bucket not in BUCKETS:
+        raise SeriesError(f"bucket invalide: {bucket}")
+    if day_from > day_to:
+        raise SeriesError("from doit précéder to")
+    starts = bucket_starts(day_from, day_to, bucket)
+    if len(starts) > MAX_BUCKETS:
+        raise SeriesError(f"Période trop longue ({len(starts)} buckets, maximum {MAX_BUCKETS})")
+
+    model = RouteDailyStats if route_id is not None else UserDailyStats
+    query = db.session.query(
+        model.day,
+        func.sum(model.runs_count),
+        func.sum(model.total_distance),
+        func.sum(model.total_duration),
+        func.sum(model.duration_count),
+        func.sum(model.avg_speed_sum),
+        func.sum(model.avg_speed_count),
+        func.max(model.max_speed),
+        func.sum(model.total_calories),
+    ).filter(model.day >= day_from, model.day <= day_to)
+    if route_id is not None:
+        query = query.filter(RouteDailyStats.route_id == route_id)
+    elif user_id is not None:
+        query = query.filter(UserDailyStats.user_id == user_id)
+
+    buckets = {start: _empty_totals() for start in starts}
+    for row in query.group_by(model.day).all():
+        totals = buckets[bucket_start(as_date(row[0]), bucket)]
+        totals['runs_count'] += int(row[1] or 0)
+        totals['total_distance'] += float(row[2] or 0)
+        totals['total_duration'] += float(row[3] or 0)
+        totals['duration_count'] += int(row[4] or 0)
+        totals['avg_speed_sum'] += float(row[5] or 0)
+        totals['avg_speed_count'] += int(row[6] or 0)
+        if row[7] is not None:
+            totals['max_speed'] = max(totals['max_speed'] or 0, float(row[7]))
+        totals['total_calories'] += int(row[8] or 0)
+
+    if with_active_users:
+        # Utilisateurs distincts par bucket : une ligne (jour, utilisateur) par jour couru
+        users_query = db.session.query(UserDailyStats.day, UserDailyStats.user_id).filter(
+            UserDailyStats.day >= day_from, UserDailyStats.day <= day_to
+        )
+        if user_id is not None:
+            users_query = users_query.filter(UserDailyStats.user_id == user_id)
+        seen = {}
+        for day, row_user_id in users_query.all():
+            seen.setdefault(bucket_start(as_date(day), bucket), set()).add(row_user_id)
+        for start, users in seen.items():
+            buckets[start]['active_users'] = len(users)
+
+    return buckets
+
+def metric_value(totals, metric):
+    if metric == 'runs':
+        return totals['runs_count']
+    if metric == 'distance':
+        return round(totals['total_distance'], 2)
+    if metric == 'duration':
+        return round(totals['total_duration'], 2)
+    if metric == 'avg_speed':
+        count = totals['avg_speed_count']
+        return round(totals['avg_speed_sum'] / count, 2) if count else 0
+    if metric == 'max_speed':
+        return round(totals['max_speed'] or 0, 2)
+    if metric == 'calories':
+        return totals['total_calories']
+    return totals['active_users']
+
+def build_series(metric, bucket, day_from, day_to, user_id=None, route_id=None):
+    """Série compacte : libellés (début de bucket) et valeurs, alignés"""
+    if metric not in METRICS:
+        raise SeriesError(f"metric invalide: {metric}")
+    if metric == 'active_users' and route_id is not None:
+        raise SeriesError("active_users n'est pas disponible par itinéraire")
+    buckets = bucket_totals(bucket, day_from, day_to, user_id=user_id, route_id=route_id,
+                            with_active_users=metric == 'active_users')
+    return {
+        'metric': metric,
+        'unit': METRICS[metric],
+        'bucket': bucket,
+        'from': day_from.isoformat(),
+        'to': day_to.isoformat(),
+        'user_id': user_id,
+        'route_id': route_id,
+        'labels': [start.isoformat() for start in buckets],
+        'values': [metric_value(totals, metric) for totals in buckets.values()]
+    }
@@ -0,0 +1,199 @@
+# app/services/token_revocation.py
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from sqlalchemy.exc import IntegrityError
+from app import db
+from app.models.token_blocklist import TokenBlocklist
+
+# Filtre de Bloom : 2^20 bits (128 Ko) et 7 fonctions de hachage, ~1 % de faux positifs à 100 000 JTI
+TOKEN_BLOOM_BITS = int(os.getenv('TOKEN_BLOOM_BITS', 1 << 20))
+TOKEN_BLOOM_HASHES = int(os.getenv('TOKEN_BLOOM_HASHES', 7))
+# Réponses exactes (révoqué ou non) gardées pour les JTI signalés par le filtre
+TOKEN_LRU_MAX_ENTRIES = int(os.getenv('TOKEN_LRU_MAX_ENTRIES', 10000))
+# Relecture des révocations faites par les autres process (nouvelles lignes uniquement)
+TOKEN_SYNC_SECONDS = float(os.getenv('TOKEN_SYNC_SECONDS', 10))
+# Reconstruction complète du filtre (les JTI purgés ne peuvent pas en être retirés)
+TOKEN_REBUILD_SECONDS = float(os.getenv('TOKEN_REBUILD_SECONDS', 3600))
+# Conservation après expiration avant purge
+TOKEN_PURGE_GRACE_SECONDS = int(os.getenv('TOKEN_PURGE_GRACE_SECONDS', 300))
+
+class BloomFilter:
+    """Ensemble probabiliste sans faux négatif : 'absent' est certain, 'présent' est à vérifier"""
+
+    def __init__(self, bits=TOKEN_BLOOM_BITS, hashes=TOKEN_BLOOM_HASHES):
+        self.bits = bits
+        self.hashes = hashes
+        self.count = 0
+        self._array = bytearray((bits + 7) // 8)
+
+    def _positions(self, value):
+        digest = hashlib.blake2b(value.encode('utf-8'), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'big')
+        h2 = int.from_bytes(digest[8:], 'big') | 1
+        return [(h1 + i * h2) % self.bits for i in range(self.hashes)]
+
+    def add(self, value):
+        for position in self._positions(value):
+            self._array[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, value):
+        return all(self._array[position >> 3] & (1 << (position & 7)) for position in self._positions(value))
+
+class RevocationStore:
+    """
+    JTI révoqués : table token_blocklist (index unique sur jti) derrière un filtre de Bloom et un LRU.
+    Un token absent du filtre (cas courant) est accepté sans requête ; sinon le LRU, puis la table, tranchent.
+    Les révocations d'autres process sont relues toutes les TOKEN_SYNC_SECONDS (lignes d'id supérieur).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._sync_lock = threading.Lock()
+        self._bloom = None
+        self._lru = OrderedDict()
+        self._last_id = 0
+        self._synced_at = 0.0
+        self._built_at = 0.0
+        self.checks = 0
+        self.bloom_negatives = 0
+        self.lru_hits = 0
+        self.db_lookups = 0
+        self.revoked = 0
+
+    def _remember(self, jti, revoked):
+        with self._lock:
+            self._lru[jti] = revoked
+            self._lru.move_to_end(jti)
+            while len(self._lru) > TOKEN_LRU_MAX_ENTRIES:
+                self._lru.popitem(last=False)
+
+    def _rebuild(self):
+        """Filtre reconstruit depuis les JTI non expirés (une requête)"""
+        bloom = BloomFilter()
+        rows = db.session.query(TokenBlocklist.id, TokenBlocklist.jti).filter(
+            TokenBlocklist.expires_at > datetime.utcnow()
+        ).all()
+        for _, jti in rows:
+            bloom.add(jti)
+        last_id = db.session.query(db.func.max(TokenBlocklist.id)).scalar() or 0
+        now = time.monotonic()
+        with self._lock:
+            self._bloom = bloom
+            self._last_id = last_id
+            self._lru.clear()
+            self._built_at = self._synced_at = now
+
+    def _sync(self):
+        """Ajoute au filtre les révocations écrites depuis la dernière lecture (parcours de la clé primaire)"""
+        rows = db.session.query(TokenBlocklist.id, TokenBlocklist.jti).filter(
+            TokenBlocklist.id > self._last_id
+        ).order_by(TokenBlocklist.id).all()
+        with self._lock:
+            for row_id, jti in rows:
+                self._bloom.add(jti)
+                self._lru[jti] = True
+                self._last_id = max(self._last_id, row_id)
+            self._synced_at = time.monotonic()
+
+    def _maybe_refresh(self):
+        now = time.monotonic()
+        if self._bloom is not None and now - self._synced_at < TOKEN_SYNC_SECONDS:
+            return
+        # Un seul thread relit la table ; les autres continuent avec le filtre courant
+        if self._bloom is not None and not self._sync_lock.acquire(blocking=False):
+            return
+        if self._bloom is None:
+            self._sync_lock.acquire()
+        try:
+            if self._bloom is None or now - self._built_at >= TOKEN_REBUILD_SECONDS:
+                self._rebuild()
+            elif now - self._synced_at >= TOKEN_SYNC_SECONDS:
+                self._sync()
+        finally:
+            self._sync_lock.release()
+
+    def is_revoked(self, jti):
+        self._maybe_refresh()
+        with self._lock:
+            self.checks += 1
+            if jti not in self._bloom:
+                self.bloom_negatives += 1
+                return False
+            cached = self._lru.get(jti)
+            if cached is not None:
+                self._lru.move_to_end(jti)
+                self.lru_hits += 1
+                return cached
+            self.db_lookups += 1
+        revoked = db.session.query(TokenBlocklist.id).filter(TokenBlocklist.jti == jti).first() is not None
+        self._remember(jti, revoked)
+        return revoked
+
+    def revoke(self, claims):
+        """
+        Révoque le token décrit par ses claims (jti, type, sub, exp) ; idempotent.
+        Retourne True si cet appel a inséré la révocation, False si le token l'était déjà
+        (l'index unique sur jti départage deux requêtes concurrentes).
+        """
+        jti = claims['jti']
+        entry = TokenBlocklist(
+            jti=jti,
+            token_type=claims.get('type', 'access'),
+            user_id=int(claims['sub']) if claims.get('sub') is not None else None,
+            expires_at=datetime.utcfromtimestamp(claims['exp']) if claims.get('exp') else datetime.utcnow() + timedelta(days=30)
+        )
+        try:
+            db.session.add(entry)
+            db.session.commit()
+            inserted = True
+        except IntegrityError:
+            # Déjà révoqué (double déconnexion, requêtes concurrentes)
+            db.session.rollback()
+            inserted = False
+        self._maybe_refresh()
+        with self._lock:
+            self._bloom.add(jti)
+            if inserted:
+                self.revoked += 1
+        self._remember(jti, True)
+        return inserted
+
+    def purge_expired(self, grace_seconds=TOKEN_PURGE_GRACE_SECONDS):
+        """Supprime les JTI expirés (un token expiré est de toute façon refusé) et reconstruit le filtre"""
+        cutoff = datetime.utcnow() - timedelta(seconds=grace_seconds)
+        purged = TokenBlocklist.query.filter(TokenBlocklist.expires_at < cutoff).delete(synchronize_session=False)
+        db.session.commit()
+        if purged:
+            self._rebuild()
+        return purged
+
+    def stats(self):
+        with self._lock:
+            return {
+                'bloom_entries': self._bloom.count if self._bloom else 0,
+                'bloom_bits': TOKEN_BLOOM_BITS,
+                'lru_entries': len(self._lru),
+                'checks': self.checks,
+                'bloom_negatives': self.bloom_negatives,
+                'lru_hits': self.lru_hits,
+                'db_lookups': self.db_lookups,
+                'revoked': self.revoked
+            }
+
+revocation_store = RevocationStore()
+
+def revoke_token(claims):
+    """True si le token vient d'être révoqué par cet appel, False s'il l'était déjà"""
+    return revocation_store.revoke(claims)
+
+def init_token_revocation(app, jwt):
+    """Vérification de chaque token (access et refresh) contre la liste de révocation"""
+
+    @jwt.token_in_blocklist_loader
+    def check_if_token_revoked(jwt_header, jwt_payload):
+        return revocation_store.is_revoked(jwt_payload['jti'])
@@ -0,0 +1,147 @@
+# app/services/track_lod.py
+import numpy as np
+from app import db
+from app.models.run import Run
+from app.models.track_lod import RunTrackLod
+from app.services.gps_ingestion import ACTIVE_STATUSES
+from app.utils.gps_codec import encode_polyline, decode_polyline
+from app.utils.track_simplify import (
+    project_track, douglas_peucker_importance, simplify_indices, effective_tolerance
+)
+
+# Niveaux de détail précalculés (nombre maximal de points) : vignette, carte, détail
+TRACK_LOD_LEVELS = (32, 128, 512)
+THUMBNAIL_LEVEL = TRACK_LOD_LEVELS[0]
+
+def compute_track_lods(points):
+    """Simplifie une trace une fois et en déduit tous les niveaux de détail"""
+    if len(points) < 2:
+        return []
+
+    x, y = project_track(points)
+    importance = douglas_peucker_importance(x, y)
+
+    lods = []
+    for level in TRACK_LOD_LEVELS:
+        keep = simplify_indices(importance, max_points=level)
+        lods.append(RunTrackLod(
+            max_points=level,
+            point_count=len(keep),
+            source_points=len(points),
+            tolerance=effective_tolerance(importance, keep),
+            polyline=encode_polyline([points[i] for i in keep])
+        ))
+        if len(keep) == np.count_nonzero(importance > 0):
+            break  # les niveaux suivants seraient identiques
+    return lods
+
+def refresh_track_lods(run, points=None):
+    """(Re)calcule et enregistre les niveaux de détail d'une course terminée"""
+    if points is None:
+        points = run.get_gps_points()
+    try:
+        RunTrackLod.query.filter_by(run_id=run.id).delete(synchronize_session=False)
+        for lod in compute_track_lods(points):
+            lod.run_id = run.id
+            db.session.add(lod)
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        print(f"⚠️ Erreur calcul des niveaux de détail de la course {run.id}: {e}")
+
+def backfill_track_lods(batch_size=200):
+    """Niveaux de détail des courses terminées qui n'en ont pas (courses antérieures au précalcul)"""
+    done = 0
+    last_id = 0
+    while True:
+        runs = Run.query.filter(
+            Run.id > last_id,
+            Run.gps_data.isnot(None),
+            Run.status.notin_(ACTIVE_STATUSES),
+            ~Run.track_lods.any()
+        ).order_by(Run.id).limit(batch_size).all()
+        if not runs:
+            break
+        for run in runs:
+            points = run.get_gps_points()
+            if len(points) >= 2:
+                refresh_track_lods(run, points)
+                done += 1
+        last_id = runs[-1].id
+        # Traces décodées libérées d'un lot à l'autre
+        for run in runs:
+            db.session.expunge(run)
+    return done
+
+def _simplify_from_track(points, tolerance=None, max_points=None):
+    """Simplification à la volée depuis la trace complète (niveau non précalculé)"""
+    x, y = project_track(points)
+    importance = douglas_peucker_importance(x, y)
+    keep = simplify_indices(importance, tolerance=tolerance, max_points=max_points)
+    return {
+        'max_points': max_points,
+        'points': len(keep),
+        'source_points': len(points),
+        'tolerance': round(effective_tolerance(importance, keep), 2),
+        'encoding': 'polyline',
+        'precision': 5,
+        'polyline': encode_polyline([points[i] for i in keep])
+    }
+
+def _pick_lod(lods, tolerance=None, max_points=None):
+    """Niveau précalculé satisfaisant la demande, ou None s'il faut repartir de la trace"""
+    if tolerance is not None:
+        # Le moins de points possible tout en respectant la tolérance
+        candidates = [lod for lod in lods if lod.tolerance <= tolerance]
+        return min(candidates, key=lambda lod: lod.point_count) if candidates else None
+
+    candidates = [lod for lod in lods if lod.point_count <= max_points]
+    if not candidates:
+        return None
+    best = max(candidates, key=lambda lod: lod.point_count)
+    if max_points > TRACK_LOD_LEVELS[-1] and best.tolerance > 0:
+        return None  # plus de détail demandé que le dernier niveau précalculé
+    return best
+
+def get_run_track(run, tolerance=None, max_points=None):
+    """
+    Trace simplifiée d'une course (polyline encodée), sans écriture en base.
+    Servie depuis les niveaux précalculés quand c'est possible, sinon calculée depuis gps_data.
+    """
+    if tolerance is None and max_points is None:
+        max_points = TRACK_LOD_LEVELS[1]
+
+    # Course en cours : la trace grandit, simplification à la volée (rien n'est enregistré).
+    # Les niveaux ne sont écrits qu'à la fin de la course (finalize_run) ou par
+    # scripts/backfill_track_lods.py pour les courses antérieures au précalcul.
+    if run.status in ACTIVE_STATUSES:
+        lods = []
+    else:
+        lods = RunTrackLod.query.filter_by(run_id=run.id).all()
+
+    lod = _pick_lod(lods, tolerance=tolerance, max_points=max_points)
+    if lod is not None:
+        data = lod.to_dict()
+        data['cached'] = True
+        return data
+
+    points = run.get_gps_points()
+    if len(points) < 2:
+        return None
+    data = _simplify_from_track(points, tolerance=tolerance, max_points=max_points)
+    data['cached'] = False
+    return data
+
+def track_thumbnails(run_ids):
+    """Plus petit niveau de détail de plusieurs courses, en une requête"""
+    if not run_ids:
+        return {}
+    lods = RunTrackLod.query.filter(
+        RunTrackLod.run_id.in_(run_ids),
+        RunTrackLod.max_points == THUMBNAIL_LEVEL
+    ).all()
+    return {lod.run_id: lod.to_dict() for lod in lods}
+
+def track_points(data):
+    """Points {latitude, longitude} d'une trace simplifiée"""
+    return decode_polyline(data['polyline'], data['precision'])
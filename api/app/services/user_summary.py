@@ -0,0 +1,425 @@
+# app/services/user_summary.py
+from datetime import datetime, timedelta
+from sqlalchemy import delete, event, insert, select, update
+from sqlalchemy.orm import Session, attributes
+from app import db
+from app.models.run import Run
+from app.models.run_metrics import RunMetrics
+from app.models.user import User
+from app.models.user_summary import UserSummary
+
+# Champs d'une course dont dépend le résumé
+TRACKED_FIELDS = ('user_id', 'start_time', 'distance', 'duration', 'avg_speed', 'max_speed',
+                  'calories_burned', 'status')
+
+# Seules les courses terminées comptent pour les records et la plus longue course
+FINISHED_STATUS = 'finished'
+
+# Distances des records (mètres) et meilleur effort GPS correspondant dans run_metrics
+RECORD_DISTANCES = (
+    ('1k', 1000.0, 'best_1k'),
+    ('5k', 5000.0, 'best_5k'),
+    ('10k', 10000.0, 'best_10k'),
+    ('half', 21097.5, None),
+    ('marathon', 42195.0, None),
+)
+
+# Utilisateurs par transaction lors de la reconstruction
+REBUILD_BATCH_SIZE = 200
+
+SUMMARY_TABLE = UserSummary.__table__
+
+def _week_start(value):
+    day = value.date()
+    return day - timedelta(days=day.weekday())
+
+def _month_start(value):
+    return value.date().replace(day=1)
+
+def empty_summary(user_id):
+    return {
+        'user_id': user_id,
+        'runs_count': 0,
+        'total_distance': 0.0,
+        'total_duration': 0.0,
+        'avg_speed_sum': 0.0,
+        'avg_speed_count': 0,
+        'max_speed': None,
+        'total_calories': 0,
+        'longest_run_id': None,
+        'longest_run_distance': None,
+        'longest_run_duration': None,
+        'longest_run_at': None,
+        'personal_records': {},
+        'last_active_week': None,
+        'current_week_streak': 0,
+        'longest_week_streak': 0,
+        'month_start': None,
+        'month_runs': 0,
+        'month_distance': 0.0,
+        'month_duration': 0.0,
+        'first_run_at': None,
+        'last_run_at': None,
+    }
+
+def _record_candidates(distance, duration, efforts):
+    """
+    Temps candidats par distance de record : meilleur effort GPS s'il existe,
+    sinon durée au prorata (allure moyenne) d'une course au moins aussi longue
+    """
+    for label, meters, _ in RECORD_DISTANCES:
+        if distance < meters:
+            continue
+        measured = efforts.get(label)
+        if measured:
+            yield label, float(measured), False
+        elif duration and duration > 0:
+            yield label, duration * meters / distance, distance > meters
+
+def _add_totals(summary, distance, duration, avg_speed, calories, sign=1):
+    """Ajoute (sign=1) ou retire (sign=-1) la contribution d'une course aux totaux"""
+    summary['total_distance'] += sign * float(distance or 0)
+    summary['total_duration'] += sign * float(duration or 0)
+    if avg_speed and avg_speed > 0:
+        summary['avg_speed_sum'] += sign * float(avg_speed)
+        summary['avg_speed_count'] += sign
+    summary['total_calories'] += sign * int(calories or 0)
+
+def _update_records(summary, run_id, start_time, distance, duration, efforts):
+    records = dict(summary['personal_records'] or {})
+    for label, seconds, estimated in _record_candidates(distance, duration, efforts or {}):
+        current = records.get(label)
+        if current is None or seconds < current['duration']:
+            records[label] = {
+                'duration': round(seconds, 1),
+                'run_id': run_id,
+                'achieved_at': start_time.isoformat(),
+                'estimated': estimated
+            }
+    summary['personal_records'] = records
+
+def _add_finished(summary, run_id, start_time, distance, duration, efforts=None):
+    """Plus longue course et records d'une course terminée"""
+    if summary['longest_run_distance'] is None or distance > summary['longest_run_distance']:
+        summary['longest_run_id'] = run_id
+        summary['longest_run_distance'] = distance
+        summary['longest_run_duration'] = float(duration) if duration else None
+        summary['longest_run_at'] = start_time
+    _update_records(summary, run_id, start_time, distance, duration, efforts)
+
+def _add_run(summary, run_id, start_time, distance, duration, avg_speed, max_speed, calories, status,
+             efforts=None):
+    """Ajoute une course aux totaux, à la plus longue course et aux records (pas aux séries)"""
+    distance = float(distance or 0)
+    summary['runs_count'] += 1
+    _add_totals(summary, distance, duration, avg_speed, calories)
+    if max_speed is not None:
+        summary['max_speed'] = max(summary['max_speed'] or 0, float(max_speed))
+    if summary['first_run_at'] is None or start_time < summary['first_run_at']:
+        summary['first_run_at'] = start_time
+    if summary['last_run_at'] is None or start_time > summary['last_run_at']:
+        summary['last_run_at'] = start_time
+
+    if status != FINISHED_STATUS or distance <= 0:
+        return
+    _add_finished(summary, run_id, start_time, distance, duration, efforts)
+
+def summarize_runs(user_id, rows):
+    """Résumé complet depuis les courses d'un utilisateur (lignes de _user_runs)"""
+    summary = empty_summary(user_id)
+    weeks = set()
+    months = {}
+    for (run_id, start_time, distance, duration, avg_speed, max_speed, calories, status,
+         best_1k, best_5k, best_10k) in rows:
+        efforts = {'1k': best_1k, '5k': best_5k, '10k': best_10k}
+        _add_run(summary, run_id, start_time, distance, duration, avg_speed, max_speed, calories, status, efforts)
+        weeks.add(_week_start(start_time))
+        month = months.setdefault(_month_start(start_time), [0, 0.0, 0.0])
+        month[0] += 1
+        month[1] += float(distance or 0)
+        month[2] += float(duration or 0)
+
+    # Séries : semaines consécutives (écart de 7 jours)
+    streak = 0
+    previous = None
+    for week in sorted(weeks):
+        streak = streak + 1 if previous is not None and week - previous == timedelta(days=7) else 1
+        summary['longest_week_streak'] = max(summary['longest_week_streak'], streak)
+        previous = week
+    summary['last_active_week'] = previous
+    summary['current_week_streak'] = streak
+
+    if months:
+        latest = max(months)
+        summary['month_start'] = latest
+        summary['month_runs'], summary['month_distance'], summary['month_duration'] = months[latest]
+    return summary
+
+def _apply_counted_run(summary, run, previous, efforts):
+    """
+    Course déjà comptée mais pas encore terminée (en cours, en pause) : seuls ses totaux
+    y figurent. Remplace ces totaux et, à la première fin de course, ajoute records et plus longue course.
+    """
+    previous_max = previous['max_speed']
+    if (previous_max is not None and summary['max_speed'] is not None
+            and float(previous_max) >= summary['max_speed'] and (run.max_speed or 0) < previous_max):
+        return False
+
+    _add_totals(summary, previous['distance'], previous['duration'], previous['avg_speed'],
+                previous['calories_burned'], sign=-1)
+    _add_totals(summary, run.distance, run.duration, run.avg_speed, run.calories_burned)
+    if run.max_speed is not None:
+        summary['max_speed'] = max(summary['max_speed'] or 0, float(run.max_speed))
+
+    if _month_start(run.start_time) == summary['month_start']:
+        summary['month_distance'] += float(run.distance or 0) - float(previous['distance'] or 0)
+        summary['month_duration'] += float(run.duration or 0) - float(previous['duration'] or 0)
+
+    distance = float(run.distance or 0)
+    if run.status == FINISHED_STATUS and distance > 0:
+        _add_finished(summary, run.id, run.start_time, distance, run.duration, efforts)
+    return True
+
+def apply_new_run(summary, run, efforts=None, previous=None):
+    """
+    Mise à jour incrémentale pour une nouvelle course, ou pour une course déjà comptée
+    qui n'était pas terminée (previous : ses valeurs avant modification).
+    Retourne False si un recalcul complet est nécessaire (course antérieure à la dernière semaine active,
+    vitesse max de l'utilisateur revue à la baisse).
+    """
+    if previous is not None:
+        return _apply_counted_run(summary, run, previous, efforts)
+
+    week = _week_start(run.start_time)
+    last_week = summary['last_active_week']
+    if last_week is None or week < last_week:
+        return False
+
+    _add_run(summary, run.id, run.start_time, run.distance, run.duration, run.avg_speed, run.max_speed,
+             run.calories_burned, run.status, efforts)
+
+    if week == last_week + timedelta(days=7):
+        summary['current_week_streak'] += 1
+    elif week > last_week:
+        summary['current_week_streak'] = 1
+    summary['longest_week_streak'] = max(summary['longest_week_streak'], summary['current_week_streak'])
+    summary['last_active_week'] = week
+
+    month = _month_start(run.start_time)
+    if summary['month_start'] is None or month > summary['month_start']:
+        summary['month_start'] = month
+        summary['month_runs'], summary['month_distance'], summary['month_duration'] = 0, 0.0, 0.0
+    if month == summary['month_start']:
+        summary['month_runs'] += 1
+        summary['month_distance'] += float(run.distance or 0)
+        summary['month_duration'] += float(run.duration or 0)
+    return True
+
+def apply_new_efforts(summary, run, efforts):
+    """
+    Meilleurs efforts GPS d'une course terminée déjà comptée (métriques calculées après la fin de course).
+    Retourne False si un record détenu par cette course n'est pas amélioré (recalcul complet nécessaire).
+    """
+    distance = float(run.distance or 0)
+    if run.status != FINISHED_STATUS or distance <= 0:
+        return True
+    records = summary['personal_records'] or {}
+    for label, seconds, estimated in _record_candidates(distance, run.duration, efforts):
+        current = records.get(label)
+        if current is None or current['run_id'] != run.id:
+            continue
+        # Record détenu par cette course remplacé par un temps qui n'est pas meilleur : une autre course
+        # peut le reprendre
+        seconds = round(seconds, 1)
+        if seconds > current['duration'] or (seconds == current['duration']
+                                              and estimated != current['estimated']):
+            return False
+    _update_records(summary, run.id, run.start_time, distance, run.duration, efforts)
+    return True
+
+# --- Écriture (même transaction que la course) ---
+
+def _user_runs(connection, user_id):
+    """Courses d'un utilisateur et leurs meilleurs efforts GPS (colonnes typées, index user_id)"""
+    return connection.execute(
+        select(Run.id, Run.start_time, Run.distance, Run.duration, Run.avg_speed, Run.max_speed,
+               Run.calories_burned, Run.status, RunMetrics.best_1k, RunMetrics.best_5k, RunMetrics.best_10k)
+        .outerjoin(RunMetrics, RunMetrics.run_id == Run.id)
+        .where(Run.user_id == user_id)
+        .order_by(Run.start_time, Run.id)
+    ).all()
+
+def _load(connection, user_id):
+    row = connection.execute(select(SUMMARY_TABLE).where(SUMMARY_TABLE.c.user_id == user_id)).mappings().first()
+    if row is None:
+        return None
+    summary = {key: row[key] for key in empty_summary(user_id)}
+    summary['personal_records'] = dict(summary['personal_records'] or {})
+    return summary
+
+def _write(connection, summary, exists):
+    values = dict(summary, updated_at=datetime.utcnow())
+    if exists:
+        connection.execute(update(SUMMARY_TABLE).where(SUMMARY_TABLE.c.user_id == summary['user_id']).values(values))
+    else:
+        connection.execute(insert(SUMMARY_TABLE).values(values))
+
+def refresh_user_summaries(connection, user_ids):
+    """Recalcule le résumé de chaque utilisateur depuis ses courses (une requête indexée par utilisateur)"""
+    for user_id in sorted(user_ids):
+        exists = connection.execute(
+            select(SUMMARY_TABLE.c.user_id).where(SUMMARY_TABLE.c.user_id == user_id)
+        ).first() is not None
+        _write(connection, summarize_runs(user_id, _user_runs(connection, user_id)), exists)
+
+def apply_new_runs(connection, runs, efforts=None, counted=(), measured=()):
+    """
+    Applique aux résumés les nouvelles courses, les courses comptées mais pas encore terminées
+    (counted : couples course / valeurs précédentes) et les meilleurs efforts de courses terminées
+    (measured) ; efforts : meilleurs efforts GPS par course.
+    Retourne les utilisateurs à recalculer entièrement.
+    """
+    efforts = efforts or {}
+    by_user = {}
+    for run in runs:
+        by_user.setdefault(run.user_id, ([], [], []))[0].append(run)
+    for run, previous in counted:
+        by_user.setdefault(run.user_id, ([], [], []))[1].append((run, previous))
+    for run in measured:
+        by_user.setdefault(run.user_id, ([], [], []))[2].append(run)
+    full = set()
+    for user_id, (new_runs, counted_runs, measured_runs) in by_user.items():
+        summary = _load(connection, user_id)
+        if (summary is None
+                or not all(apply_new_run(summary, run, efforts.get(run.id))
+                           for run in sorted(new_runs, key=lambda item: (item.start_time, item.id)))
+                or not all(apply_new_run(summary, run, efforts.get(run.id), previous)
+                           for run, previous in counted_runs)
+                or not all(apply_new_efforts(summary, run, efforts[run.id]) for run in measured_runs)):
+            full.add(user_id)
+            continue
+        _write(connection, summary, exists=True)
+    return full
+
+def _previous_user(run):
+    history = attributes.get_history(run, 'user_id')
+    return history.deleted[0] if history.deleted else run.user_id
+
+def _counted_previous(run):
+    """
+    Valeurs avant modification d'une course déjà comptée mais pas encore terminée, ou None
+    si la modification demande un recalcul complet (course terminée, déplacée, valeur d'origine inconnue)
+    """
+    previous = {}
+    for field in TRACKED_FIELDS:
+        history = attributes.get_history(run, field)
+        if not history.has_changes():
+            previous[field] = getattr(run, field)
+        elif history.deleted:
+            previous[field] = history.deleted[0]
+        else:
+            # Attribut expiré puis modifié sans lecture : valeur d'origine inconnue
+            return None
+    if (previous['status'] == FINISHED_STATUS or previous['user_id'] != run.user_id
+            or previous['start_time'] != run.start_time):
+        return None
+    return previous
+
+def _efforts(metrics):
+    return {'1k': metrics.best_1k, '5k': metrics.best_5k, '10k': metrics.best_10k}
+
+def _pending(session):
+    return session.info.setdefault('user_summary_pending', {'users': set(), 'run_ids': set(), 'counted': []})
+
+def _collect_before_flush(session, flush_context, instances):
+    pending = _pending(session)
+    for obj in session.deleted:
+        if isinstance(obj, Run):
+            pending['users'] |= {user_id for user_id in (obj.user_id, _previous_user(obj)) if user_id is not None}
+        elif isinstance(obj, RunMetrics) and obj.run_id is not None:
+            pending['run_ids'].add(obj.run_id)
+    for obj in session.dirty:
+        if isinstance(obj, Run) and any(attributes.get_history(obj, field).has_changes()
+                                        for field in TRACKED_FIELDS):
+            previous = _counted_previous(obj)
+            if previous is not None:
+                pending['counted'].append((obj, previous))
+            else:
+                pending['users'] |= {user_id for user_id in (obj.user_id, _previous_user(obj))
+                                     if user_id is not None}
+        elif isinstance(obj, RunMetrics) and obj.run_id is not None and session.is_modified(obj):
+            pending['run_ids'].add(obj.run_id)
+
+def _refresh_after_flush(session, flush_context):
+    pending = _pending(session)
+    new_runs = [obj for obj in session.new if isinstance(obj, Run) and obj.user_id is not None]
+    # Nouvelles métriques (y compris via la relation run.metrics : run_id connu seulement après l'INSERT)
+    efforts = {obj.run_id: _efforts(obj) for obj in session.new
+               if isinstance(obj, RunMetrics) and obj.run_id is not None}
+    if not (pending['users'] or pending['run_ids'] or pending['counted'] or new_runs or efforts):
+        return
+    session.info.pop('user_summary_pending', None)
+
+    connection = session.connection()
+    # Modification ou suppression d'une course ou de métriques déjà comptées : recalcul complet
+    users = set(pending['users'])
+    if pending['run_ids']:
+        users |= set(connection.execute(select(Run.user_id).where(Run.id.in_(pending['run_ids']))).scalars())
+
+    # Course terminée dont les métriques existaient déjà (calculées pendant la course)
+    finishing = {run.id for run, _ in pending['counted'] if run.status == FINISHED_STATUS} - set(efforts)
+    if finishing:
+        efforts.update((run_id, {'1k': best_1k, '5k': best_5k, '10k': best_10k})
+                       for run_id, best_1k, best_5k, best_10k in connection.execute(
+                           select(RunMetrics.run_id, RunMetrics.best_1k, RunMetrics.best_5k, RunMetrics.best_10k)
+                           .where(RunMetrics.run_id.in_(finishing))))
+
+    # Nouvelles métriques d'une course déjà enregistrée (fin de course) : seuls les records changent
+    handled = {run.id for run in new_runs} | {run.id for run, _ in pending['counted']}
+    measured_ids = set(efforts) - handled
+    measured = connection.execute(
+        select(Run.id, Run.user_id, Run.start_time, Run.distance, Run.duration, Run.status)
+        .where(Run.id.in_(measured_ids))
+    ).all() if measured_ids else []
+
+    users |= apply_new_runs(
+        connection,
+        [run for run in new_runs if run.user_id not in users],
+        efforts,
+        [(run, previous) for run, previous in pending['counted'] if run.user_id not in users],
+        [run for run in measured if run.user_id not in users]
+    )
+    refresh_user_summaries(connection, users)
+
+def _discard_after_rollback(session, previous_transaction):
+    session.info.pop('user_summary_pending', None)
+
+def init_user_summaries(app):
+    """Maintient user_summaries à chaque écriture de course ou de métriques (même transaction)"""
+    if not event.contains(Session, 'before_flush', _collect_before_flush):
+        event.listen(Session, 'before_flush', _collect_before_flush)
+        event.listen(Session, 'after_flush', _refresh_after_flush)
+        event.listen(Session, 'after_soft_rollback', _discard_after_rollback)
+
+def rebuild_user_summaries(batch_size=REBUILD_BATCH_SIZE):
+    """Reconstruit tous les résumés par lots d'utilisateurs et supprime ceux des comptes disparus"""
+    user_ids = [user_id for (user_id,) in db.session.query(User.id).order_by(User.id).all()]
+    for index in range(0, len(user_ids), batch_size):
+        refresh_user_summaries(db.session.connection(), user_ids[index:index + batch_size])
+        db.session.commit()
+    removed = db.session.execute(
+        delete(SUMMARY_TABLE).where(SUMMARY_TABLE.c.user_id.notin_(select(User.id)))
+    ).rowcount
+    db.session.commit()
+    return {'users': len(user_ids), 'removed': max(removed or 0, 0)}
+
+# --- Lecture ---
+
+def get_user_summary(user_id, today=None):
+    """Résumé d'un utilisateur : une lecture par clé primaire (calcul à la volée si la ligne manque)"""
+    summary = db.session.get(UserSummary, user_id)
+    if summary is None:
+        # Objet transitoire (non ajouté à la session) : la ligne sera écrite à la prochaine course
+        # ou par la reconstruction planifiée
+        summary = UserSummary(**summarize_runs(user_id, _user_runs(db.session.connection(), user_id)))
+    return summary.to_dict(today)
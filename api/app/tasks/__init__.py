@@ -0,0 +1,2 @@
+# app/tasks/__init__.py
+"""Tâches de fond : planificateur (python -m app.tasks) et tâches ponctuelles"""
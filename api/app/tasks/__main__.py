@@ -0,0 +1,22 @@
+# app/tasks/__main__.py
+"""Process dédié au planificateur : python -m app.tasks"""
+import os
+
+# Le planificateur tourne dans ce process, pas dans un thread démarré par create_app
+os.environ['SCHEDULER_MODE'] = 'off'
+
+from app import create_app
+from app.tasks.scheduler import build_scheduler
+
+def main():
+    # Une seule application (et un seul pool de connexions) pour toutes les exécutions
+    app = create_app()
+    scheduler = build_scheduler(app)
+    try:
+        scheduler.run_forever()
+    except KeyboardInterrupt:
+        print("\n🛑 Arrêt du planificateur...")
+        scheduler.stop()
+
+if __name__ == '__main__':
+    main()
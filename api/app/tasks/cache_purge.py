@@ -0,0 +1,20 @@
+# app/tasks/cache_purge.py
+from app import create_app, db
+from app.services.cache import stats_cache
+
+def purge_stats_cache(app=None):
+    """Tâche pour supprimer les entrées expirées de stats_cache"""
+    app = app or create_app()
+    
+    with app.app_context():
+        try:
+            # Lignes expirées depuis plus que la fenêtre de valeurs périmées (index idx_expires_at)
+            purged = stats_cache.purge_expired()
+            print(f"🧹 Cache purgé: {purged} entrée(s) expirée(s) supprimée(s)")
+            
+        except Exception as e:
+            print(f"❌ Erreur purge cache: {e}")
+            db.session.rollback()
+
+if __name__ == '__main__':
+    purge_stats_cache()
@@ -0,0 +1,255 @@
+# app/tasks/scheduler.py
+import os
+import random
+import tempfile
+import threading
+import time
+from datetime import datetime
+from app import db
+
+try:
+    import fcntl
+except ImportError:  # Windows : pas de verrou entre process
+    fcntl = None
+
+# Mode d'exécution dans le process web : 'thread' démarre le planificateur avec l'application,
+# 'off' le laisse au process dédié (python -m app.tasks)
+SCHEDULER_MODE = os.getenv('SCHEDULER_MODE', 'off').lower()
+
+# En mode thread, chaque worker (gunicorn -w N) crée son planificateur : seul celui qui détient
+# ce verrou exécute les tâches, les autres réessaient de le prendre (mort du détenteur)
+SCHEDULER_LOCK_FILE = os.getenv('SCHEDULER_LOCK_FILE', os.path.join(tempfile.gettempdir(), 'running-app-scheduler.lock'))
+SCHEDULER_LOCK_RETRY_SECONDS = float(os.getenv('SCHEDULER_LOCK_RETRY_SECONDS', 30))
+
+# Intervalles par défaut (secondes) et jitter (fraction de l'intervalle)
+CACHE_WARM_INTERVAL_SECONDS = float(os.getenv('CACHE_WARM_INTERVAL_SECONDS', 60))
+CACHE_PURGE_INTERVAL_SECONDS = float(os.getenv('CACHE_PURGE_INTERVAL_SECONDS', 3600))
+USER_SUMMARY_REBUILD_INTERVAL_SECONDS = float(os.getenv('USER_SUMMARY_REBUILD_INTERVAL_SECONDS', 24 * 3600))
+TOKEN_PURGE_INTERVAL_SECONDS = float(os.getenv('TOKEN_PURGE_INTERVAL_SECONDS', 3600))
+SCHEDULER_JITTER = float(os.getenv('SCHEDULER_JITTER', 0.1))
+
+# Clé de stats_cache où le planificateur publie son état (lisible depuis les process web)
+SCHEDULER_STATUS_KEY = 'scheduler_status'
+SCHEDULER_STATUS_TTL = 24 * 3600
+
+class Job:
+    """Tâche périodique et état de sa dernière exécution"""
+
+    def __init__(self, name, func, interval, jitter=SCHEDULER_JITTER):
+        self.name = name
+        self.func = func
+        self.interval = interval
+        self.jitter = jitter
+        self.next_run = None
+        self.runs = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+        self.last_started_at = None
+        self.last_duration_ms = None
+        self.last_error = None
+        self.last_result = None
+
+    def schedule_next(self, now, first=False):
+        if first:
+            # Premier passage étalé sur une fraction de l'intervalle (plusieurs process démarrés ensemble)
+            self.next_run = now + random.uniform(0, self.interval * self.jitter)
+        else:
+            spread = self.interval * self.jitter
+            self.next_run = now + self.interval + random.uniform(-spread, spread)
+
+    def to_dict(self):
+        return {
+            'interval': self.interval,
+            'jitter': self.jitter,
+            'runs': self.runs,
+            'failures': self.failures,
+            'consecutive_failures': self.consecutive_failures,
+            'last_started_at': self.last_started_at.isoformat() if self.last_started_at else None,
+            'last_duration_ms': self.last_duration_ms,
+            'last_error': self.last_error,
+            'last_result': self.last_result,
+            'next_run_in': round(max(self.next_run - time.monotonic(), 0), 1) if self.next_run else None
+        }
+
+class ProcessLock:
+    """
+    Verrou exclusif sur un fichier (flock), libéré par le système à la mort du process.
+    Ne coordonne que les process d'une même machine.
+    """
+
+    def __init__(self, path=SCHEDULER_LOCK_FILE):
+        self.path = path
+        self._file = None
+
+    def acquire(self):
+        """True si ce process détient le verrou (sans attendre)"""
+        if self._file is not None:
+            return True
+        if fcntl is None:
+            return True
+        lock_file = open(self.path, 'a')
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return False
+        self._file = lock_file
+        return True
+
+    def release(self):
+        if self._file is not None:
+            fcntl.flock(self._file, fcntl.LOCK_UN)
+            self._file.close()
+            self._file = None
+
+class Scheduler:
+    """
+    Planificateur minimal : exécute les tâches enregistrées à intervalle régulier (avec jitter),
+    l'une après l'autre, dans le contexte d'une unique application.
+    """
+
+    def __init__(self, app, lock=None):
+        self.app = app
+        # Verrou entre process : les tâches ne tournent que dans le process qui le détient
+        self.lock = lock
+        self.jobs = {}
+        self.started_at = None
+        self._stop = threading.Event()
+        self._thread = None
+        self._looping = False
+        self._lock = threading.Lock()
+
+    def add_job(self, name, func, interval, jitter=SCHEDULER_JITTER):
+        self.jobs[name] = Job(name, func, interval, jitter)
+
+    @property
+    def running(self):
+        return self._looping
+
+    def start(self):
+        """Démarre la boucle dans un thread démon"""
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stop.clear()
+            target = self.run_forever if self.lock is None else self._run_when_locked
+            self._thread = threading.Thread(target=target, name='stats-scheduler', daemon=True)
+            self._thread.start()
+
+    def _run_when_locked(self):
+        """Attend de détenir le verrou (un seul planificateur actif parmi les workers), puis boucle"""
+        while not self._stop.is_set():
+            if self.lock.acquire():
+                try:
+                    self.run_forever()
+                finally:
+                    self.lock.release()
+                return
+            self._stop.wait(SCHEDULER_LOCK_RETRY_SECONDS)
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout)
+
+    def run_forever(self):
+        """Boucle principale (bloquante) : thread démon ou process dédié"""
+        self._looping = True
+        self.started_at = datetime.utcnow()
+        now = time.monotonic()
+        for job in self.jobs.values():
+            job.schedule_next(now, first=True)
+        print(f"⏰ [SCHEDULER] Démarré: {', '.join(self.jobs)}")
+
+        while not self._stop.is_set():
+            job = min(self.jobs.values(), key=lambda item: item.next_run, default=None)
+            if job is None:
+                break
+            delay = job.next_run - time.monotonic()
+            if delay > 0:
+                self._stop.wait(delay)
+                continue
+            self.run_job(job)
+            job.schedule_next(time.monotonic())
+        self._looping = False
+        print("⏰ [SCHEDULER] Arrêté")
+
+    def run_job(self, job):
+        """Exécute une tâche et met à jour son état (l'échec d'une tâche n'arrête pas la boucle)"""
+        job.last_started_at = datetime.utcnow()
+        started = time.perf_counter()
+        with self.app.app_context():
+            try:
+                job.last_result = job.func()
+                job.last_error = None
+                job.consecutive_failures = 0
+            except Exception as e:
+                db.session.rollback()
+                job.failures += 1
+                job.consecutive_failures += 1
+                job.last_error = str(e)
+                print(f"❌ [SCHEDULER] {job.name} en échec: {e}")
+            finally:
+                job.runs += 1
+                job.last_duration_ms = round((time.perf_counter() - started) * 1000, 2)
+                self._publish_status()
+                db.session.remove()
+
+    def status(self):
+        return {
+            'running': self.running,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'pid': os.getpid(),
+            'updated_at': datetime.utcnow().isoformat(),
+            'jobs': {name: job.to_dict() for name, job in self.jobs.items()}
+        }
+
+    def _publish_status(self):
+        from app.services.cache import stats_cache
+        stats_cache.put(SCHEDULER_STATUS_KEY, self.status(), ttl=SCHEDULER_STATUS_TTL)
+
+def _warm_cache():
+    from app.services.cache import stats_cache
+    return {'refreshed': stats_cache.refresh_registered()}
+
+def _purge_cache():
+    from app.services.cache import stats_cache
+    return {'purged': stats_cache.purge_expired()}
+
+def _rebuild_user_summaries():
+    from app.services.user_summary import rebuild_user_summaries
+    return rebuild_user_summaries()
+
+def _purge_revoked_tokens():
+    from app.services.token_revocation import revocation_store
+    return {'purged': revocation_store.purge_expired()}
+
+def build_scheduler(app, lock=None):
+    """Planificateur avec les tâches de cache par défaut, la reconstruction des résumés et la purge des tokens"""
+    scheduler = Scheduler(app, lock)
+    scheduler.add_job('cache_warm', _warm_cache, CACHE_WARM_INTERVAL_SECONDS)
+    scheduler.add_job('cache_purge', _purge_cache, CACHE_PURGE_INTERVAL_SECONDS)
+    scheduler.add_job('user_summaries', _rebuild_user_summaries, USER_SUMMARY_REBUILD_INTERVAL_SECONDS)
+    scheduler.add_job('token_purge', _purge_revoked_tokens, TOKEN_PURGE_INTERVAL_SECONDS)
+    return scheduler
+
+# Un seul planificateur par process, même si plusieurs applications sont créées (run.py multi-hôtes)
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+def get_scheduler():
+    return _scheduler
+
+def init_scheduler(app, mode=SCHEDULER_MODE):
+    """
+    Démarre le planificateur dans un thread si SCHEDULER_MODE=thread.
+    Chaque worker en démarre un, mais seul celui qui détient SCHEDULER_LOCK_FILE exécute les tâches.
+    """
+    global _scheduler
+    if mode != 'thread':
+        return None
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = build_scheduler(app, ProcessLock())
+            _scheduler.start()
+    return _scheduler
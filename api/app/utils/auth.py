@@ -0,0 +1,167 @@
+# app/utils/auth.py
+import os
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from datetime import timedelta
+from flask import jsonify
+from flask_jwt_extended import create_access_token, create_refresh_token, get_current_user as _jwt_current_user
+from sqlalchemy import event
+from sqlalchemy.orm import Session, attributes
+from app import db
+from app.models.user import User
+
+# Champs du compte dont un changement invalide les tokens déjà émis (auth_version + 1)
+AUTH_FIELDS = ('is_admin', 'is_active', 'password_hash')
+
+# Durée de validité d'une version mise en cache (les autres process voient un changement au plus tard après ce délai)
+USER_CACHE_TTL_SECONDS = float(os.getenv('USER_CACHE_TTL_SECONDS', 30))
+USER_CACHE_MAX_ENTRIES = int(os.getenv('USER_CACHE_MAX_ENTRIES', 10000))
+
+# Durée de vie des tokens : access court si les clients utilisent le refresh token (rotation à chaque usage)
+ACCESS_TOKEN_EXPIRES = timedelta(minutes=int(os.getenv('JWT_ACCESS_TOKEN_MINUTES', 24 * 60)))
+REFRESH_TOKEN_EXPIRES = timedelta(days=int(os.getenv('JWT_REFRESH_TOKEN_DAYS', 30)))
+
+# Utilisateur authentifié tel que décrit par le token (sans ligne users chargée)
+AuthUser = namedtuple('AuthUser', 'id is_admin is_active version')
+
+def build_token_claims(user):
+    """Claims ajoutés au token : rôle, statut et version du compte"""
+    return {
+        'is_admin': bool(user.is_admin),
+        'is_active': bool(user.is_active),
+        'ver': user.auth_version or 0
+    }
+
+def create_user_token(user, expires_delta=ACCESS_TOKEN_EXPIRES):
+    """Token d'accès (identity en string) portant les claims du compte"""
+    return create_access_token(
+        identity=str(user.id),
+        additional_claims=build_token_claims(user),
+        expires_delta=expires_delta
+    )
+
+def create_user_refresh_token(user, expires_delta=REFRESH_TOKEN_EXPIRES):
+    """Refresh token (mêmes claims : invalidé lui aussi par un changement de auth_version)"""
+    return create_refresh_token(
+        identity=str(user.id),
+        additional_claims=build_token_claims(user),
+        expires_delta=expires_delta
+    )
+
+class UserCache:
+    """
+    Version courante, rôle et statut des comptes (LRU en mémoire, relu en base après USER_CACHE_TTL_SECONDS).
+    Invalidé immédiatement dans ce process à chaque changement de AUTH_FIELDS.
+    """
+
+    def __init__(self, ttl=USER_CACHE_TTL_SECONDS, max_entries=USER_CACHE_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        # Incrémentée à chaque invalidation : une lecture commencée avant n'est pas mise en cache
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.skipped_stores = 0
+
+    def get(self, user_id):
+        """AuthUser courant ou None si le compte n'existe pas (une requête par clé primaire en cas de miss)"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None and now - entry[1] < self.ttl:
+                self._entries.move_to_end(user_id)
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+            generation = self._generation
+
+        row = db.session.query(User.id, User.is_admin, User.is_active, User.auth_version).filter(
+            User.id == user_id
+        ).first()
+        user = AuthUser(row[0], bool(row[1]), bool(row[2]), row[3] or 0) if row else None
+        with self._lock:
+            if generation != self._generation:
+                # Compte invalidé pendant la lecture : la ligne lue est peut-être antérieure au commit
+                self.skipped_stores += 1
+                return user
+            # Horodatage du début de la lecture : l'entrée n'est pas plus récente que la ligne lue
+            self._entries[user_id] = (user, now)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return user
+
+    def invalidate(self, user_id=None):
+        with self._lock:
+            self._generation += 1
+            if user_id is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(user_id, None)
+
+    def stats(self):
+        with self._lock:
+            return {'entries': len(self._entries), 'hits': self.hits, 'misses': self.misses,
+                    'skipped_stores': self.skipped_stores, 'ttl': self.ttl}
+
+user_cache = UserCache()
+
+def load_auth_user(jwt_header, jwt_data):
+    """
+    Chargement de l'utilisateur par flask_jwt_extended (une fois par requête) : claims du token
+    validés par la version en cache. None (401) si le compte a disparu ou changé depuis l'émission.
+    """
+    user_id = int(jwt_data['sub'])
+    current = user_cache.get(user_id)
+    # Tokens émis avant l'ajout des claims : version 0
+    if current is None or jwt_data.get('ver', 0) != current.version:
+        return None
+    return AuthUser(
+        user_id,
+        jwt_data.get('is_admin', current.is_admin),
+        jwt_data.get('is_active', current.is_active),
+        current.version
+    )
+
+def get_current_user():
+    """Utilisateur de la requête (AuthUser : id, is_admin, is_active, version), mémorisé par requête"""
+    return _jwt_current_user()
+
+# --- Version des comptes ---
+
+def _collect_before_flush(session, flush_context, instances):
+    changed = session.info.setdefault('auth_changed_users', set())
+    for obj in session.dirty:
+        if isinstance(obj, User) and any(attributes.get_history(obj, field).has_changes() for field in AUTH_FIELDS):
+            obj.auth_version = (obj.auth_version or 0) + 1
+            changed.add(obj.id)
+    for obj in session.deleted:
+        if isinstance(obj, User):
+            changed.add(obj.id)
+
+def _invalidate_after_commit(session):
+    for user_id in session.info.pop('auth_changed_users', None) or ():
+        user_cache.invalidate(user_id)
+
+def _discard_after_rollback(session, previous_transaction):
+    session.info.pop('auth_changed_users', None)
+
+def init_auth(app, jwt):
+    """Chargement de l'utilisateur depuis les claims et invalidation des tokens à chaque changement de compte"""
+    jwt.user_lookup_loader(load_auth_user)
+
+    @jwt.user_lookup_error_loader
+    def outdated_token_callback(jwt_header, jwt_payload):
+        return jsonify({
+            'status': 'error',
+            'message': 'Session expirée, veuillez vous reconnecter',
+            'error_code': 'TOKEN_OUTDATED'
+        }), 401
+
+    if not event.contains(Session, 'before_flush', _collect_before_flush):
+        event.listen(Session, 'before_flush', _collect_before_flush)
+        event.listen(Session, 'after_commit', _invalidate_after_commit)
+        event.listen(Session, 'after_soft_rollback', _discard_after_rollback)
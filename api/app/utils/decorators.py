@@ -1,41 +1,38 @@
 from functools import wraps
 from flask import jsonify
-from flask_jwt_extended import get_jwt_identity
-from app.models.user import User
+from app.utils.auth import get_current_user
 
 def admin_required(f):
     """Décorateur pour vérifier que l'utilisateur est administrateur"""
     @wraps(f)
     def decorated_function(*args, **kwargs):
         try:
-            current_user_id = get_jwt_identity()
-            print(f"🔐 Admin check - User ID: {current_user_id}")
-            
-            user = User.query.get(current_user_id)
+            # Claims du token, déjà validés par jwt_required (aucune requête sur users)
+            user = get_current_user()
             
             if not user:
-                print(f"❌ Admin check - User not found: {current_user_id}")
+                print("❌ Admin check - User not found")
                 return jsonify({
                     'status': 'error',
                     'message': 'Utilisateur non trouvé',
                     'error_code': 'USER_NOT_FOUND'
                 }), 404
             
-            print(f"👤 Admin check - User: {user.username}, Admin: {user.is_admin}")
+            print(f"👤 Admin check - User ID: {user.id}, Admin: {user.is_admin}")
             
             if not user.is_admin:
-                print(f"🚫 Admin check - Access denied for user: {user.username}")
+                print(f"🚫 Admin check - Access denied for user: {user.id}")
                 return jsonify({
                     'status': 'error',
                     'message': 'Accès administrateur requis',
                     'error_code': 'ADMIN_REQUIRED',
                     'user_info': {
-                        'username': user.username,
+                        'id': user.id,
                         'is_admin': user.is_admin
                     }
                 }), 403
             
-            print(f"✅ Admin check - Access granted for user: {user.username}")
+            print(f"✅ Admin check - Access granted for user: {user.id}")
             return f(*args, **kwargs)
         except Exception as e:
             print(f"💥 Admin check - Error: {e}")
@@ -52,8 +49,7 @@ def active_user_required(f):
     @wraps(f)
     def decorated_function(*args, **kwargs):
         try:
-            current_user_id = get_jwt_identity()
-            user = User.query.get(current_user_id)
+            user = get_current_user()
             
             if not user:
                 return jsonify({
@@ -0,0 +1,87 @@
+# app/utils/gps.py
+import json
+import math
+import os
+from app.utils.gps_codec import is_compact, encode_track, decode_track
+
+# Stockage compact sans perte (deltas int32 + zlib) de Run.gps_data ; 0 pour revenir au JSON
+GPS_COMPACT_STORAGE = os.getenv('GPS_COMPACT_STORAGE', '1') != '0'
+
+EARTH_RADIUS_M = 6371000.0
+
+def haversine_m(lat1, lng1, lat2, lng2):
+    """Distance en mètres entre deux points GPS"""
+    phi1 = math.radians(lat1)
+    phi2 = math.radians(lat2)
+    dphi = math.radians(lat2 - lat1)
+    dlambda = math.radians(lng2 - lng1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlambda / 2) ** 2
+    return 2 * EARTH_RADIUS_M * math.atan2(math.sqrt(a), math.sqrt(1 - a))
+
+def normalize_point(point):
+    """
+    Normalise un point GPS envoyé par les clients :
+    {latitude, longitude, timestamp (ms), altitude?, speed? (m/s), accuracy?}
+    Accepte aussi lat/lng et lon. Retourne None si le point est invalide.
+    """
+    if not isinstance(point, dict):
+        return None
+
+    try:
+        latitude = float(point.get('latitude', point.get('lat')))
+        longitude = float(point.get('longitude', point.get('lng', point.get('lon'))))
+    except (TypeError, ValueError):
+        return None
+
+    if not (-90 <= latitude <= 90) or not (-180 <= longitude <= 180):
+        return None
+
+    normalized = {'latitude': latitude, 'longitude': longitude}
+
+    timestamp = point.get('timestamp')
+    if timestamp is not None:
+        try:
+            normalized['timestamp'] = int(float(timestamp))
+        except (TypeError, ValueError):
+            pass
+
+    for field in ('altitude', 'speed', 'accuracy'):
+        if point.get(field) is not None:
+            try:
+                normalized[field] = float(point[field])
+            except (TypeError, ValueError):
+                pass
+
+    return normalized
+
+def parse_gps_data(value):
+    """Liste des points d'un gps_data stocké (format compact, {coordinates: [...]} ou liste)"""
+    if not value:
+        return []
+    if is_compact(value):
+        try:
+            return decode_track(value)
+        except Exception:
+            return []
+    try:
+        data = json.loads(value) if isinstance(value, str) else value
+    except (json.JSONDecodeError, TypeError):
+        return []
+    if isinstance(data, dict):
+        data = data.get('coordinates') or []
+    return data if isinstance(data, list) else []
+
+def dump_gps_data(points, compact=None):
+    """
+    Sérialise une liste de points au format stocké dans Run.gps_data.
+    Les points que le format compact ne sait pas représenter exactement (champ inconnu comme heartRate,
+    valeur nulle, type inattendu) sont gardés en JSON.
+    """
+    if compact is None:
+        compact = GPS_COMPACT_STORAGE
+    if compact:
+        try:
+            return encode_track(points)
+        except (KeyError, TypeError, ValueError):
+            pass  # trace non représentable sans perte : repli sur le JSON
+    return json.dumps({'coordinates': points}, separators=(',', ':'))
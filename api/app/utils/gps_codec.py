@@ -0,0 +1,201 @@
+# app/utils/gps_codec.py
+import base64
+import struct
+import zlib
+import numpy as np
+
+# Préfixe des traces stockées au format compact dans Run.gps_data
+COMPACT_PREFIX = 'gpsz2:'
+# Séparateur des morceaux ajoutés en fin de trace pendant une course (absent de l'alphabet base64)
+CHUNK_SEPARATOR = '.'
+
+_MAGIC = b'GPS2'
+_HEADER = struct.Struct('<4sI')
+_COLUMN = struct.Struct('<BB')
+
+# Colonnes connues : (champ, facteur d'échelle vers un entier)
+# latitude/longitude au 1e-6 degré (~0,1 m), altitude/vitesse/précision au centième
+_COLUMNS = [
+    ('latitude', 1e6),
+    ('longitude', 1e6),
+    ('timestamp', 1),
+    ('altitude', 100),
+    ('speed', 100),
+    ('accuracy', 100),
+]
+_KNOWN_FIELDS = {field for field, _ in _COLUMNS}
+_REQUIRED_FIELDS = ('latitude', 'longitude')
+
+# Présence d'une colonne : sur tous les points, sur aucun, ou bitmap d'un bit par point
+_PRESENT_ALL, _PRESENT_NONE, _PRESENT_BITMAP = 0, 1, 2
+# Stockage des valeurs : entiers mis à l'échelle (exact uniquement), entiers, flottants bruts
+_KIND_SCALED, _KIND_INT, _KIND_INT_RAW, _KIND_FLOAT_RAW = 0, 1, 2, 3
+
+_INT32 = np.iinfo(np.int32)
+_INT64 = np.iinfo(np.int64)
+
+def is_compact(value):
+    return isinstance(value, str) and value.startswith(COMPACT_PREFIX)
+
+def _deltas_fit_int32(values):
+    deltas = np.diff(values)
+    return not deltas.size or (deltas.max() <= _INT32.max and deltas.min() >= _INT32.min)
+
+def _encode_column(values, scale):
+    """Choisit le stockage le plus compact qui redonne exactement les valeurs d'origine"""
+    if all(type(value) is int for value in values):
+        if any(value > _INT64.max or value < _INT64.min for value in values):
+            raise ValueError("Entier hors de l'encodage compact")
+        ints = np.array(values, dtype=np.int64)
+        if _deltas_fit_int32(ints):
+            return _KIND_INT, struct.pack('<q', int(ints[0])) + np.diff(ints).astype('<i4').tobytes()
+        return _KIND_INT_RAW, ints.astype('<i8').tobytes()
+
+    if not all(type(value) is float for value in values):
+        raise ValueError("Types mélangés dans une colonne")
+    floats = np.array(values, dtype=np.float64)
+    if not np.isfinite(floats).all():
+        raise ValueError("Valeur non finie")
+    if scale != 1 and np.abs(floats).max() * scale < 2 ** 53:
+        scaled = np.rint(floats * scale).astype(np.int64)
+        # Mise à l'échelle retenue seulement si elle est sans perte (valeurs à 6 ou 2 décimales au plus)
+        if np.array_equal(scaled / scale, floats) and _deltas_fit_int32(scaled):
+            return _KIND_SCALED, struct.pack('<q', int(scaled[0])) + np.diff(scaled).astype('<i4').tobytes()
+    return _KIND_FLOAT_RAW, floats.astype('<f8').tobytes()
+
+def _decode_column(raw, offset, kind, count, scale):
+    if kind in (_KIND_SCALED, _KIND_INT):
+        (first,) = struct.unpack_from('<q', raw, offset)
+        offset += 8
+        deltas = np.frombuffer(raw, dtype='<i4', count=count - 1, offset=offset).astype(np.int64)
+        offset += 4 * (count - 1)
+        values = np.concatenate(([first], first + np.cumsum(deltas))).astype(np.int64)
+        return (values / scale).tolist() if kind == _KIND_SCALED else values.tolist(), offset
+    if kind == _KIND_INT_RAW:
+        return np.frombuffer(raw, dtype='<i8', count=count, offset=offset).tolist(), offset + 8 * count
+    if kind == _KIND_FLOAT_RAW:
+        return np.frombuffer(raw, dtype='<f8', count=count, offset=offset).tolist(), offset + 8 * count
+    raise ValueError("Trace compacte invalide")
+
+def encode_track(points, compress_level=6):
+    """
+    Encode une trace en binaire compact, sans perte : decode_track(encode_track(points)) == points.
+    Par colonne : présence (tous les points, aucun, ou bitmap), puis les valeurs des points qui l'ont
+    (première valeur en int64 puis deltas int32, ou valeurs brutes si la mise à l'échelle perdrait de la précision),
+    le tout compressé zlib.
+    ValueError si un point a un champ inconnu, une valeur nulle ou un type non géré : l'appelant garde le JSON.
+    """
+    count = len(points)
+    for point in points:
+        if not isinstance(point, dict):
+            raise ValueError("Point invalide")
+        if any(field not in point for field in _REQUIRED_FIELDS):
+            raise ValueError("Point sans coordonnées")
+        unknown = set(point) - _KNOWN_FIELDS
+        if unknown:
+            raise ValueError(f"Champs non gérés par l'encodage compact: {sorted(unknown)}")
+        if any(value is None for value in point.values()):
+            raise ValueError("Valeur nulle")
+
+    chunks = [_HEADER.pack(_MAGIC, count)]
+    for field, scale in _COLUMNS:
+        mask = np.array([field in point for point in points], dtype=bool)
+        present = int(mask.sum())
+        if not present:
+            chunks.append(_COLUMN.pack(_PRESENT_NONE, 0))
+            continue
+        kind, data = _encode_column([point[field] for point in points if field in point], scale)
+        if present == count:
+            chunks.append(_COLUMN.pack(_PRESENT_ALL, kind))
+        else:
+            chunks.append(_COLUMN.pack(_PRESENT_BITMAP, kind))
+            chunks.append(np.packbits(mask, bitorder='little').tobytes())
+        chunks.append(data)
+
+    payload = zlib.compress(b''.join(chunks), compress_level)
+    return COMPACT_PREFIX + base64.b64encode(payload).decode('ascii')
+
+def _decode_chunk(raw):
+    magic, count = _HEADER.unpack_from(raw, 0)
+    if magic != _MAGIC:
+        raise ValueError("Trace compacte invalide")
+
+    offset = _HEADER.size
+    points = [{} for _ in range(count)]
+    for field, scale in _COLUMNS:
+        presence, kind = _COLUMN.unpack_from(raw, offset)
+        offset += _COLUMN.size
+        if presence == _PRESENT_NONE:
+            continue
+        if presence == _PRESENT_ALL:
+            indexes = range(count)
+        else:
+            size = (count + 7) // 8
+            mask = np.unpackbits(np.frombuffer(raw, dtype=np.uint8, count=size, offset=offset),
+                                 count=count, bitorder='little')
+            offset += size
+            indexes = np.flatnonzero(mask).tolist()
+        values, offset = _decode_column(raw, offset, kind, len(indexes), scale)
+        for index, value in zip(indexes, values):
+            points[index][field] = value
+    return points
+
+def decode_track(value):
+    """Décode une trace compacte (un ou plusieurs morceaux séparés par '.') en liste de points"""
+    points = []
+    for chunk in value[len(COMPACT_PREFIX):].split(CHUNK_SEPARATOR):
+        points.extend(_decode_chunk(zlib.decompress(base64.b64decode(chunk))))
+    return points
+
+def encode_polyline(points, precision=5):
+    """Encode latitude/longitude au format Google Encoded Polyline"""
+    factor = 10 ** precision
+    output = []
+    previous_lat = previous_lng = 0
+    for point in points:
+        lat = int(round(point['latitude'] * factor))
+        lng = int(round(point['longitude'] * factor))
+        for delta in (lat - previous_lat, lng - previous_lng):
+            value = ~(delta << 1) if delta < 0 else delta << 1
+            while value >= 0x20:
+                output.append(chr((0x20 | (value & 0x1f)) + 63))
+                value >>= 5
+            output.append(chr(value + 63))
+        previous_lat, previous_lng = lat, lng
+    return ''.join(output)
+
+def decode_polyline(encoded, precision=5):
+    """Décode une Google Encoded Polyline en liste de points"""
+    factor = 10 ** precision
+    points = []
+    index = lat = lng = 0
+    while index < len(encoded):
+        deltas = []
+        for _ in range(2):
+            shift = result = 0
+            while True:
+                byte = ord(encoded[index]) - 63
+                index += 1
+                result |= (byte & 0x1f) << shift
+                shift += 5
+                if byte < 0x20:
+                    break
+            deltas.append(~(result >> 1) if result & 1 else result >> 1)
+        lat += deltas[0]
+        lng += deltas[1]
+        points.append({'latitude': lat / factor, 'longitude': lng / factor})
+    return points
+
+def polyline_payload(points, precision=5):
+    """Forme compacte renvoyée par l'API : polyline + décalages temporels (ms) depuis le départ"""
+    payload = {
+        'encoding': 'polyline',
+        'precision': precision,
+        'points': len(points),
+        'polyline': encode_polyline(points, precision)
+    }
+    if points and all(point.get('timestamp') is not None for point in points):
+        start = points[0]['timestamp']
+        payload['start_timestamp'] = start
+        payload['time_offsets'] = [point['timestamp'] - start for point in points]
+    return payload
@@ -0,0 +1,88 @@
+# app/utils/pagination.py
+import base64
+import json
+from datetime import datetime
+from sqlalchemy import and_, or_
+
+class InvalidCursor(ValueError):
+    """Curseur de pagination illisible ou falsifié"""
+
+def encode_cursor(sort_value, row_id):
+    """Encode la position (valeur de tri, id) en curseur opaque ; une valeur de tri NULL est encodée null"""
+    payload = json.dumps([sort_value.isoformat() if sort_value is not None else None, row_id], separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+
+def decode_cursor(cursor):
+    """Décode un curseur opaque en (valeur de tri ou None, id)"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        sort_value, row_id = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+        return (datetime.fromisoformat(sort_value) if sort_value is not None else None), int(row_id)
+    except (ValueError, TypeError, json.JSONDecodeError) as e:
+        raise InvalidCursor(f"Curseur invalide: {cursor}") from e
+
+def is_cursor_request(args):
+    """Le mode curseur est activé dès que le paramètre 'cursor' est présent (même vide)"""
+    return 'cursor' in args
+
+def _after_cursor(sort_column, id_column, sort_value, row_id, descending):
+    """Lignes situées après la position (sort_value, row_id), NULL compris (voir keyset_paginate)"""
+    if sort_value is None:
+        if descending:
+            # Dernier bloc : seules les autres lignes NULL restent
+            return and_(sort_column.is_(None), id_column < row_id)
+        return or_(
+            and_(sort_column.is_(None), id_column > row_id),
+            sort_column.isnot(None)
+        )
+    if descending:
+        return or_(
+            sort_column < sort_value,
+            and_(sort_column == sort_value, id_column < row_id),
+            sort_column.is_(None)
+        )
+    return or_(
+        sort_column > sort_value,
+        and_(sort_column == sort_value, id_column > row_id)
+    )
+
+def keyset_paginate(query, sort_column, id_column, cursor=None, limit=10,
+                    descending=True, with_total=False):
+    """
+    Pagination par clé (sort_column, id_column) sans OFFSET.
+    Le COUNT(*) n'est exécuté que si with_total est demandé.
+    sort_column peut être NULL : NULL est traité comme la plus petite valeur (ordre de MySQL et SQLite),
+    ces lignes viennent donc en dernier en ordre décroissant et en premier en ordre croissant.
+    """
+    limit = max(1, min(limit, 1000))
+    total = query.order_by(None).count() if with_total else None
+
+    if cursor:
+        sort_value, row_id = decode_cursor(cursor)
+        query = query.filter(_after_cursor(sort_column, id_column, sort_value, row_id, descending))
+
+    if descending:
+        query = query.order_by(sort_column.desc(), id_column.desc())
+    else:
+        query = query.order_by(sort_column.asc(), id_column.asc())
+
+    # Une ligne de plus pour savoir s'il existe une page suivante
+    rows = query.limit(limit + 1).all()
+    has_more = len(rows) > limit
+    items = rows[:limit]
+
+    next_cursor = None
+    if has_more and items:
+        last = items[-1]
+        next_cursor = encode_cursor(getattr(last, sort_column.key), getattr(last, id_column.key))
+
+    pagination = {
+        'mode': 'cursor',
+        'per_page': limit,
+        'next_cursor': next_cursor,
+        'has_more': has_more
+    }
+    if with_total:
+        pagination['total'] = total
+
+    return items, pagination
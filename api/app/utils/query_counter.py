@@ -0,0 +1,25 @@
+# app/utils/query_counter.py
+from flask import g, has_request_context
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+def _count_query(conn, cursor, statement, parameters, context, executemany):
+    """Incrémente le compteur de requêtes SQL de la requête HTTP en cours"""
+    if has_request_context():
+        g.sql_query_count = g.get('sql_query_count', 0) + 1
+
+def get_query_count():
+    """Nombre de requêtes SQL exécutées pendant la requête HTTP en cours"""
+    if not has_request_context():
+        return 0
+    return g.get('sql_query_count', 0)
+
+def init_query_counter(app):
+    """Active le comptage des requêtes SQL et l'en-tête X-Query-Count"""
+    if not event.contains(Engine, 'before_cursor_execute', _count_query):
+        event.listen(Engine, 'before_cursor_execute', _count_query)
+
+    @app.after_request
+    def add_query_count_header(response):
+        response.headers['X-Query-Count'] = str(get_query_count())
+        return response
@@ -0,0 +1,75 @@
+# app/utils/track_simplify.py
+import numpy as np
+from app.utils.gps import EARTH_RADIUS_M
+
+# En dessous de cet écart (mètres), les points ne sont plus départagés
+MIN_TOLERANCE_M = 0.5
+
+def project_track(points):
+    """Projection équirectangulaire locale (mètres) autour du premier point"""
+    lat = np.radians(np.array([point['latitude'] for point in points], dtype=np.float64))
+    lng = np.radians(np.array([point['longitude'] for point in points], dtype=np.float64))
+    x = EARTH_RADIUS_M * (lng - lng[0]) * np.cos(lat[0])
+    y = EARTH_RADIUS_M * (lat - lat[0])
+    return x, y
+
+def _segment_distances(x, y, start, end):
+    """Distance des points intérieurs au segment [start, end]"""
+    px = x[start + 1:end] - x[start]
+    py = y[start + 1:end] - y[start]
+    dx = x[end] - x[start]
+    dy = y[end] - y[start]
+    length_sq = dx * dx + dy * dy
+    if length_sq == 0:
+        return np.hypot(px, py)
+    t = np.clip((px * dx + py * dy) / length_sq, 0.0, 1.0)
+    return np.hypot(px - t * dx, py - t * dy)
+
+def douglas_peucker_importance(x, y, min_tolerance=MIN_TOLERANCE_M):
+    """
+    Importance de chaque point au sens de Douglas-Peucker : la plus grande tolérance (m)
+    pour laquelle le point est conservé. Les extrémités valent l'infini.
+    Un seul passage suffit ensuite pour n'importe quelle tolérance ou nombre de points.
+    """
+    count = len(x)
+    importance = np.zeros(count, dtype=np.float64)
+    if count == 0:
+        return importance
+    importance[0] = importance[-1] = np.inf
+
+    stack = [(0, count - 1, np.inf)]
+    while stack:
+        start, end, parent = stack.pop()
+        if end - start < 2:
+            continue
+        distances = _segment_distances(x, y, start, end)
+        offset = int(np.argmax(distances))
+        distance = float(distances[offset])
+        if distance < min_tolerance:
+            continue
+        index = start + 1 + offset
+        # Borné par le segment parent : les niveaux de détail restent emboîtés
+        value = min(distance, parent)
+        importance[index] = value
+        stack.append((start, index, value))
+        stack.append((index, end, value))
+    return importance
+
+def simplify_indices(importance, tolerance=None, max_points=None):
+    """Indices (triés) des points conservés pour une tolérance (m) ou un nombre maximal de points"""
+    if tolerance is not None:
+        keep = np.flatnonzero(importance > tolerance)
+    else:
+        keep = np.flatnonzero(importance > 0)
+    if max_points is not None and len(keep) > max_points:
+        order = np.argsort(-importance[keep], kind='stable')[:max(max_points, 2)]
+        keep = np.sort(keep[order])
+    return keep
+
+def effective_tolerance(importance, keep):
+    """Écart maximal (m) des points écartés : tolérance équivalente de la simplification"""
+    dropped = np.ones(len(importance), dtype=bool)
+    dropped[keep] = False
+    if not dropped.any():
+        return 0.0
+    return float(importance[dropped].max())
@@ -0,0 +1,52 @@
+"""add user summaries
+
+Revision ID: 1e8c5a3f7d20
+Revises: 4b7e1d9a3c62
+Create Date: 2026-10-18 15:02:47.318265
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '1e8c5a3f7d20'
+down_revision = '4b7e1d9a3c62'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Résumé par utilisateur (totaux, records, séries), lu par clé primaire.
+    # Remplissage : python scripts/backfill_stats_rollups.py (ou tâche planifiée user_summaries) ;
+    # en attendant, les résumés absents sont calculés à la lecture.
+    op.create_table('user_summaries',
+    sa.Column('user_id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('runs_count', sa.Integer(), nullable=False),
+    sa.Column('total_distance', sa.Float(), nullable=False),
+    sa.Column('total_duration', sa.Float(), nullable=False),
+    sa.Column('avg_speed_sum', sa.Float(), nullable=False),
+    sa.Column('avg_speed_count', sa.Integer(), nullable=False),
+    sa.Column('max_speed', sa.Float(), nullable=True),
+    sa.Column('total_calories', sa.Integer(), nullable=False),
+    sa.Column('longest_run_id', sa.Integer(), nullable=True),
+    sa.Column('longest_run_distance', sa.Float(), nullable=True),
+    sa.Column('longest_run_duration', sa.Float(), nullable=True),
+    sa.Column('longest_run_at', sa.DateTime(), nullable=True),
+    sa.Column('personal_records', sa.JSON(), nullable=True),
+    sa.Column('last_active_week', sa.Date(), nullable=True),
+    sa.Column('current_week_streak', sa.Integer(), nullable=False),
+    sa.Column('longest_week_streak', sa.Integer(), nullable=False),
+    sa.Column('month_start', sa.Date(), nullable=True),
+    sa.Column('month_runs', sa.Integer(), nullable=False),
+    sa.Column('month_distance', sa.Float(), nullable=False),
+    sa.Column('month_duration', sa.Float(), nullable=False),
+    sa.Column('first_run_at', sa.DateTime(), nullable=True),
+    sa.Column('last_run_at', sa.DateTime(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('user_id')
+    )
+
+
+def downgrade():
+    op.drop_table('user_summaries')
@@ -0,0 +1,78 @@
+"""add daily stats rollups
+
+Revision ID: 2a6e9d14b8c3
+Revises: f17c4b2e9d56
+Create Date: 2026-10-18 12:47:31.582910
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '2a6e9d14b8c3'
+down_revision = 'f17c4b2e9d56'
+branch_labels = None
+depends_on = None
+
+ROLLUP_COLUMNS = ('runs_count, total_distance, total_duration, duration_count, avg_speed_sum, '
+                  'avg_speed_count, max_speed, max_duration, min_duration, total_calories')
+
+RUN_AGGREGATES_SQL = """
+    COUNT(*), COALESCE(SUM(distance), 0), COALESCE(SUM(duration), 0), COUNT(duration),
+    COALESCE(SUM(CASE WHEN avg_speed > 0 THEN avg_speed END), 0),
+    COUNT(CASE WHEN avg_speed > 0 THEN 1 END),
+    MAX(max_speed), MAX(duration), MIN(duration), COALESCE(SUM(calories_burned), 0)
+"""
+
+
+def _rollup_columns():
+    return [
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('day', sa.Date(), nullable=False),
+        sa.Column('runs_count', sa.Integer(), nullable=False),
+        sa.Column('total_distance', sa.Float(), nullable=False),
+        sa.Column('total_duration', sa.Float(), nullable=False),
+        sa.Column('duration_count', sa.Integer(), nullable=False),
+        sa.Column('avg_speed_sum', sa.Float(), nullable=False),
+        sa.Column('avg_speed_count', sa.Integer(), nullable=False),
+        sa.Column('max_speed', sa.Float(), nullable=True),
+        sa.Column('max_duration', sa.Float(), nullable=True),
+        sa.Column('min_duration', sa.Float(), nullable=True),
+        sa.Column('total_calories', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+    ]
+
+
+def upgrade():
+    # Agrégats journaliers des courses par utilisateur et par itinéraire
+    op.create_table('user_daily_stats',
+    *_rollup_columns(),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.UniqueConstraint('user_id', 'day', name='uq_user_daily_stats_user_id_day')
+    )
+    op.create_index('ix_user_daily_stats_day', 'user_daily_stats', ['day'])
+
+    op.create_table('route_daily_stats',
+    *_rollup_columns(),
+    sa.Column('route_id', sa.Integer(), nullable=False),
+    sa.UniqueConstraint('route_id', 'day', name='uq_route_daily_stats_route_id_day')
+    )
+    op.create_index('ix_route_daily_stats_day', 'route_daily_stats', ['day'])
+
+    # Remplissage initial (scripts/backfill_stats_rollups.py pour reconstruire ensuite)
+    for table, column in (('user_daily_stats', 'user_id'), ('route_daily_stats', 'route_id')):
+        op.execute(f"""
+            INSERT INTO {table} (day, {column}, {ROLLUP_COLUMNS})
+            SELECT DATE(start_time), {column}, {RUN_AGGREGATES_SQL}
+            FROM runs
+            WHERE {column} IS NOT NULL
+            GROUP BY DATE(start_time), {column}
+        """)
+
+
+def downgrade():
+    op.drop_index('ix_route_daily_stats_day', table_name='route_daily_stats')
+    op.drop_table('route_daily_stats')
+    op.drop_index('ix_user_daily_stats_day', table_name='user_daily_stats')
+    op.drop_table('user_daily_stats')
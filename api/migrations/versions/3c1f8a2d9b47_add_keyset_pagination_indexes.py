@@ -0,0 +1,31 @@
+"""add keyset pagination indexes
+
+Revision ID: 3c1f8a2d9b47
+Revises: 7901bce79748
+Create Date: 2026-10-18 09:12:04.381215
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3c1f8a2d9b47'
+down_revision = '7901bce79748'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Index composites pour la pagination par curseur (valeur de tri, id)
+    op.create_index('ix_runs_start_time_id', 'runs', ['start_time', 'id'])
+    op.create_index('ix_runs_user_id_start_time_id', 'runs', ['user_id', 'start_time', 'id'])
+    op.create_index('ix_routes_created_at_id', 'routes', ['created_at', 'id'])
+    op.create_index('ix_users_created_at_id', 'users', ['created_at', 'id'])
+
+
+def downgrade():
+    op.drop_index('ix_users_created_at_id', table_name='users')
+    op.drop_index('ix_routes_created_at_id', table_name='routes')
+    op.drop_index('ix_runs_user_id_start_time_id', table_name='runs')
+    op.drop_index('ix_runs_start_time_id', table_name='runs')
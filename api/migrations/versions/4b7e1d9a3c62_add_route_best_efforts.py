@@ -0,0 +1,59 @@
+"""add route best efforts
+
+Revision ID: 4b7e1d9a3c62
+Revises: 9d4f2a6c1e07
+Create Date: 2026-10-18 14:31:12.660418
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '4b7e1d9a3c62'
+down_revision = '9d4f2a6c1e07'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Meilleur temps par couple itinéraire / utilisateur (classements)
+    op.create_table('route_best_efforts',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('route_id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('run_id', sa.Integer(), nullable=False),
+    sa.Column('duration', sa.Float(), nullable=False),
+    sa.Column('achieved_at', sa.DateTime(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['run_id'], ['runs.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('route_id', 'user_id', name='uq_route_best_efforts_route_id_user_id')
+    )
+    op.create_index('ix_route_best_efforts_route_id_duration', 'route_best_efforts', ['route_id', 'duration'])
+
+    # Remplissage initial : première course de chaque couple par durée croissante
+    connection = op.get_bind()
+    rows = connection.execute(sa.text("""
+        SELECT route_id, user_id, id, duration, start_time FROM runs
+        WHERE route_id IS NOT NULL AND status = 'finished' AND duration > 0
+        ORDER BY duration, start_time
+    """))
+    best = {}
+    for route_id, user_id, run_id, duration, start_time in rows:
+        best.setdefault((route_id, user_id), (run_id, duration, start_time))
+    if best:
+        connection.execute(
+            sa.text("""
+                INSERT INTO route_best_efforts (route_id, user_id, run_id, duration, achieved_at, updated_at)
+                VALUES (:route_id, :user_id, :run_id, :duration, :achieved_at, CURRENT_TIMESTAMP)
+            """),
+            [{'route_id': route_id, 'user_id': user_id, 'run_id': run_id, 'duration': duration,
+              'achieved_at': start_time}
+             for (route_id, user_id), (run_id, duration, start_time) in best.items()]
+        )
+
+
+def downgrade():
+    op.drop_index('ix_route_best_efforts_route_id_duration', table_name='route_best_efforts')
+    op.drop_table('route_best_efforts')
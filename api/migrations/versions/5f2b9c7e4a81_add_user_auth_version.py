@@ -0,0 +1,28 @@
+"""add user auth version
+
+Revision ID: 5f2b9c7e4a81
+Revises: 1e8c5a3f7d20
+Create Date: 2026-10-18 15:40:09.582731
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5f2b9c7e4a81'
+down_revision = '1e8c5a3f7d20'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Version du compte portée par les tokens (claim 'ver') : incrémentée à chaque changement
+    # de rôle, de statut ou de mot de passe pour invalider les tokens déjà émis
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('auth_version', sa.Integer(), nullable=False, server_default='0'))
+
+
+def downgrade():
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.drop_column('auth_version')
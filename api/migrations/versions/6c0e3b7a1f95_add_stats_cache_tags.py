@@ -0,0 +1,50 @@
+"""add invalidation tags to stats_cache
+
+Revision ID: 6c0e3b7a1f95
+Revises: 2a6e9d14b8c3
+Create Date: 2026-10-18 13:22:08.417263
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '6c0e3b7a1f95'
+down_revision = '2a6e9d14b8c3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+
+    # La table a pu être créée hors Alembic (migrations/create_stats_cache.py ou db.create_all)
+    if not inspector.has_table('stats_cache'):
+        op.create_table('stats_cache',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('cache_key', sa.String(length=100), nullable=False),
+        sa.Column('cache_data', sa.JSON(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.Column('expires_at', sa.DateTime(), nullable=False),
+        sa.Column('tags', sa.String(length=255), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('cache_key', name='unique_cache_key')
+        )
+        op.create_index('idx_expires_at', 'stats_cache', ['expires_at'])
+        return
+
+    columns = {column['name'] for column in inspector.get_columns('stats_cache')}
+    if 'tags' not in columns:
+        with op.batch_alter_table('stats_cache', schema=None) as batch_op:
+            batch_op.add_column(sa.Column('tags', sa.String(length=255), nullable=True))
+
+    indexes = {index['name'] for index in inspector.get_indexes('stats_cache')}
+    if 'idx_expires_at' not in indexes:
+        op.create_index('idx_expires_at', 'stats_cache', ['expires_at'])
+
+
+def downgrade():
+    with op.batch_alter_table('stats_cache', schema=None) as batch_op:
+        batch_op.drop_column('tags')
@@ -0,0 +1,37 @@
+"""add token blocklist
+
+Revision ID: 8a3d6f1b2e94
+Revises: 5f2b9c7e4a81
+Create Date: 2026-10-18 16:12:35.904127
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8a3d6f1b2e94'
+down_revision = '5f2b9c7e4a81'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # JTI révoqués (déconnexion, rotation des refresh tokens), purgés après expiration
+    op.create_table('token_blocklist',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('jti', sa.String(length=36), nullable=False),
+    sa.Column('token_type', sa.String(length=10), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=True),
+    sa.Column('revoked_at', sa.DateTime(), nullable=False),
+    sa.Column('expires_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_token_blocklist_jti', 'token_blocklist', ['jti'], unique=True)
+    op.create_index('ix_token_blocklist_expires_at', 'token_blocklist', ['expires_at'])
+
+
+def downgrade():
+    op.drop_index('ix_token_blocklist_expires_at', table_name='token_blocklist')
+    op.drop_index('ix_token_blocklist_jti', table_name='token_blocklist')
+    op.drop_table('token_blocklist')
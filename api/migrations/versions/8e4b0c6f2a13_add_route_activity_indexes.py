@@ -0,0 +1,27 @@
+"""add route activity indexes
+
+Revision ID: 8e4b0c6f2a13
+Revises: 3c1f8a2d9b47
+Create Date: 2026-10-18 10:02:47.519302
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8e4b0c6f2a13'
+down_revision = '3c1f8a2d9b47'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Courses du jour par itinéraire et courses en cours
+    op.create_index('ix_runs_route_id_start_time', 'runs', ['route_id', 'start_time'])
+    op.create_index('ix_runs_status', 'runs', ['status'])
+
+
+def downgrade():
+    op.drop_index('ix_runs_status', table_name='runs')
+    op.drop_index('ix_runs_route_id_start_time', table_name='runs')
@@ -0,0 +1,95 @@
+"""add run distribution histograms
+
+Revision ID: 9d4f2a6c1e07
+Revises: 6c0e3b7a1f95
+Create Date: 2026-10-18 13:58:44.103926
+
+"""
+import math
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9d4f2a6c1e07'
+down_revision = '6c0e3b7a1f95'
+branch_labels = None
+depends_on = None
+
+# Intervalles figés à la date de la migration (voir app/services/stats_distribution.py)
+DISTRIBUTION_METRICS = {
+    'pace': (120.0, 10.0, 78),
+    'distance': (0.0, 500.0, 100),
+    'heart_rate': (60.0, 2.0, 80),
+}
+
+
+def _bin_columns():
+    return [
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('day', sa.Date(), nullable=False),
+        sa.Column('metric', sa.String(length=20), nullable=False),
+        sa.Column('bin', sa.Integer(), nullable=False),
+        sa.Column('count', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+    ]
+
+
+def _bin_index(metric, value):
+    low, width, count = DISTRIBUTION_METRICS[metric]
+    return min(max(int(math.floor((value - low) / width)), 0), count - 1)
+
+
+def _fill(table, column):
+    connection = op.get_bind()
+    rows = connection.execute(sa.text(f"""
+        SELECT {column}, DATE(start_time), distance, duration, avg_heart_rate
+        FROM runs WHERE {column} IS NOT NULL
+    """))
+    counts = {}
+    for key_id, day, distance, duration, avg_heart_rate in rows:
+        values = {}
+        if distance and distance > 0:
+            values['distance'] = float(distance)
+            if duration and duration > 0:
+                values['pace'] = duration / (distance / 1000.0)
+        if avg_heart_rate and avg_heart_rate > 0:
+            values['heart_rate'] = float(avg_heart_rate)
+        for metric, value in values.items():
+            key = (key_id, day, metric, _bin_index(metric, value))
+            counts[key] = counts.get(key, 0) + 1
+    if counts:
+        connection.execute(
+            sa.text(f"INSERT INTO {table} ({column}, day, metric, bin, count) "
+                    f"VALUES (:key_id, :day, :metric, :bin, :count)"),
+            [{'key_id': key_id, 'day': day, 'metric': metric, 'bin': index, 'count': count}
+             for (key_id, day, metric, index), count in counts.items()]
+        )
+
+
+def upgrade():
+    # Histogrammes journaliers (pace, distance, fréquence cardiaque) par utilisateur et par itinéraire
+    op.create_table('user_distribution_bins',
+    *_bin_columns(),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.UniqueConstraint('user_id', 'day', 'metric', 'bin', name='uq_user_distribution_bins_key')
+    )
+    op.create_index('ix_user_distribution_bins_metric_day', 'user_distribution_bins', ['metric', 'day'])
+
+    op.create_table('route_distribution_bins',
+    *_bin_columns(),
+    sa.Column('route_id', sa.Integer(), nullable=False),
+    sa.UniqueConstraint('route_id', 'day', 'metric', 'bin', name='uq_route_distribution_bins_key')
+    )
+    op.create_index('ix_route_distribution_bins_metric_day', 'route_distribution_bins', ['metric', 'day'])
+
+    # Remplissage initial (scripts/backfill_stats_rollups.py pour reconstruire ensuite)
+    _fill('user_distribution_bins', 'user_id')
+    _fill('route_distribution_bins', 'route_id')
+
+
+def downgrade():
+    op.drop_index('ix_route_distribution_bins_metric_day', table_name='route_distribution_bins')
+    op.drop_table('route_distribution_bins')
+    op.drop_index('ix_user_distribution_bins_metric_day', table_name='user_distribution_bins')
+    op.drop_table('user_distribution_bins')
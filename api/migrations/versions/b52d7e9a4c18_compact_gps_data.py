@@ -0,0 +1,235 @@
+"""compact gps_data
+
+Revision ID: b52d7e9a4c18
+Revises: 8e4b0c6f2a13
+Create Date: 2026-10-18 10:41:12.204815
+
+"""
+import base64
+import json
+import struct
+import zlib
+
+from alembic import op
+import numpy as np
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b52d7e9a4c18'
+down_revision = '8e4b0c6f2a13'
+branch_labels = None
+depends_on = None
+
+# Courses lues puis réécrites par lot (SELECT puis UPDATE groupé) ; toute la migration
+# s'exécute dans l'unique transaction d'Alembic
+BATCH_SIZE = 500
+
+# --- Copie figée du format compact (app/utils/gps_codec.py au moment de cette migration) ---
+# La migration ne dépend pas du code de l'application : son résultat ne change pas avec lui.
+
+COMPACT_PREFIX = 'gpsz2:'
+
+_MAGIC = b'GPS2'
+_HEADER = struct.Struct('<4sI')
+_COLUMN = struct.Struct('<BB')
+
+_COLUMNS = [
+    ('latitude', 1e6),
+    ('longitude', 1e6),
+    ('timestamp', 1),
+    ('altitude', 100),
+    ('speed', 100),
+    ('accuracy', 100),
+]
+_KNOWN_FIELDS = {field for field, _ in _COLUMNS}
+_REQUIRED_FIELDS = ('latitude', 'longitude')
+
+_PRESENT_ALL, _PRESENT_NONE, _PRESENT_BITMAP = 0, 1, 2
+_KIND_SCALED, _KIND_INT, _KIND_INT_RAW, _KIND_FLOAT_RAW = 0, 1, 2, 3
+
+_INT32 = np.iinfo(np.int32)
+_INT64 = np.iinfo(np.int64)
+
+
+def _deltas_fit_int32(values):
+    deltas = np.diff(values)
+    return not deltas.size or (deltas.max() <= _INT32.max and deltas.min() >= _INT32.min)
+
+
+def _encode_column(values, scale):
+    if all(type(value) is int for value in values):
+        if any(value > _INT64.max or value < _INT64.min for value in values):
+            raise ValueError("Entier hors de l'encodage compact")
+        ints = np.array(values, dtype=np.int64)
+        if _deltas_fit_int32(ints):
+            return _KIND_INT, struct.pack('<q', int(ints[0])) + np.diff(ints).astype('<i4').tobytes()
+        return _KIND_INT_RAW, ints.astype('<i8').tobytes()
+
+    if not all(type(value) is float for value in values):
+        raise ValueError("Types mélangés dans une colonne")
+    floats = np.array(values, dtype=np.float64)
+    if not np.isfinite(floats).all():
+        raise ValueError("Valeur non finie")
+    if scale != 1 and np.abs(floats).max() * scale < 2 ** 53:
+        scaled = np.rint(floats * scale).astype(np.int64)
+        if np.array_equal(scaled / scale, floats) and _deltas_fit_int32(scaled):
+            return _KIND_SCALED, struct.pack('<q', int(scaled[0])) + np.diff(scaled).astype('<i4').tobytes()
+    return _KIND_FLOAT_RAW, floats.astype('<f8').tobytes()
+
+
+def _decode_column(raw, offset, kind, count, scale):
+    if kind in (_KIND_SCALED, _KIND_INT):
+        (first,) = struct.unpack_from('<q', raw, offset)
+        offset += 8
+        deltas = np.frombuffer(raw, dtype='<i4', count=count - 1, offset=offset).astype(np.int64)
+        offset += 4 * (count - 1)
+        values = np.concatenate(([first], first + np.cumsum(deltas))).astype(np.int64)
+        return (values / scale).tolist() if kind == _KIND_SCALED else values.tolist(), offset
+    if kind == _KIND_INT_RAW:
+        return np.frombuffer(raw, dtype='<i8', count=count, offset=offset).tolist(), offset + 8 * count
+    if kind == _KIND_FLOAT_RAW:
+        return np.frombuffer(raw, dtype='<f8', count=count, offset=offset).tolist(), offset + 8 * count
+    raise ValueError("Trace compacte invalide")
+
+
+def _encode_track(points):
+    count = len(points)
+    for point in points:
+        if not isinstance(point, dict):
+            raise ValueError("Point invalide")
+        if any(field not in point for field in _REQUIRED_FIELDS):
+            raise ValueError("Point sans coordonnées")
+        if set(point) - _KNOWN_FIELDS:
+            raise ValueError("Champs non gérés par l'encodage compact")
+        if any(value is None for value in point.values()):
+            raise ValueError("Valeur nulle")
+
+    chunks = [_HEADER.pack(_MAGIC, count)]
+    for field, scale in _COLUMNS:
+        mask = np.array([field in point for point in points], dtype=bool)
+        present = int(mask.sum())
+        if not present:
+            chunks.append(_COLUMN.pack(_PRESENT_NONE, 0))
+            continue
+        kind, data = _encode_column([point[field] for point in points if field in point], scale)
+        if present == count:
+            chunks.append(_COLUMN.pack(_PRESENT_ALL, kind))
+        else:
+            chunks.append(_COLUMN.pack(_PRESENT_BITMAP, kind))
+            chunks.append(np.packbits(mask, bitorder='little').tobytes())
+        chunks.append(data)
+
+    return COMPACT_PREFIX + base64.b64encode(zlib.compress(b''.join(chunks), 6)).decode('ascii')
+
+
+def _decode_chunk(raw):
+    magic, count = _HEADER.unpack_from(raw, 0)
+    if magic != _MAGIC:
+        raise ValueError("Trace compacte invalide")
+    offset = _HEADER.size
+    points = [{} for _ in range(count)]
+    for field, scale in _COLUMNS:
+        presence, kind = _COLUMN.unpack_from(raw, offset)
+        offset += _COLUMN.size
+        if presence == _PRESENT_NONE:
+            continue
+        if presence == _PRESENT_ALL:
+            indexes = range(count)
+        else:
+            size = (count + 7) // 8
+            mask = np.unpackbits(np.frombuffer(raw, dtype=np.uint8, count=size, offset=offset),
+                                 count=count, bitorder='little')
+            offset += size
+            indexes = np.flatnonzero(mask).tolist()
+        values, offset = _decode_column(raw, offset, kind, len(indexes), scale)
+        for index, value in zip(indexes, values):
+            points[index][field] = value
+    return points
+
+
+def _decode_track(value):
+    # Traces écrites par morceaux par l'application : morceaux séparés par '.'
+    points = []
+    for chunk in value[len(COMPACT_PREFIX):].split('.'):
+        points.extend(_decode_chunk(zlib.decompress(base64.b64decode(chunk))))
+    return points
+
+
+# --- Conversion ---
+
+def _convert(select_sql, params, convert):
+    """Parcourt les courses par lots (clé primaire croissante) et réécrit gps_data"""
+    connection = op.get_bind()
+    last_id = 0
+    converted_rows = skipped_rows = 0
+    while True:
+        rows = connection.execute(
+            sa.text(select_sql), dict(params, last_id=last_id, limit=BATCH_SIZE)
+        ).fetchall()
+        if not rows:
+            break
+
+        updates = []
+        for run_id, gps_data in rows:
+            converted = convert(gps_data)
+            if converted is None:
+                skipped_rows += 1
+            elif converted != gps_data:
+                updates.append({'run_id': run_id, 'gps_data': converted})
+        if updates:
+            connection.execute(
+                sa.text("UPDATE runs SET gps_data = :gps_data WHERE id = :run_id"), updates
+            )
+            converted_rows += len(updates)
+        last_id = rows[-1][0]
+    print(f"🗜️ gps_data : {converted_rows} trace(s) converties, {skipped_rows} laissée(s) telles quelles")
+
+
+def _json_points(gps_data):
+    try:
+        data = json.loads(gps_data)
+    except (TypeError, ValueError):
+        return None
+    if isinstance(data, dict):
+        data = data.get('coordinates')
+    return data if isinstance(data, list) else None
+
+
+def _to_compact(gps_data):
+    """Trace JSON -> compacte, seulement si le décodage redonne exactement les points d'origine"""
+    points = _json_points(gps_data)
+    if not points:
+        return None
+    try:
+        compact = _encode_track(points)
+    except (KeyError, TypeError, ValueError):
+        return None
+    return compact if _decode_track(compact) == points else None
+
+
+def _to_json(gps_data):
+    try:
+        points = _decode_track(gps_data)
+    except Exception:
+        return None
+    return json.dumps({'coordinates': points}, separators=(',', ':'))
+
+
+def upgrade():
+    # Conversion sans perte des traces JSON existantes ; les autres restent en JSON
+    _convert(
+        "SELECT id, gps_data FROM runs WHERE id > :last_id AND gps_data IS NOT NULL "
+        "AND gps_data NOT LIKE :prefix ORDER BY id LIMIT :limit",
+        {'prefix': COMPACT_PREFIX + '%'},
+        _to_compact
+    )
+
+
+def downgrade():
+    _convert(
+        "SELECT id, gps_data FROM runs WHERE id > :last_id AND gps_data LIKE :prefix "
+        "ORDER BY id LIMIT :limit",
+        {'prefix': COMPACT_PREFIX + '%'},
+        _to_json
+    )
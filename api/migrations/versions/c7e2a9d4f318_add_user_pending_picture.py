@@ -0,0 +1,30 @@
+"""add user pending picture
+
+Revision ID: c7e2a9d4f318
+Revises: 8a3d6f1b2e94
+Create Date: 2026-10-18 18:05:47.316902
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c7e2a9d4f318'
+down_revision = '8a3d6f1b2e94'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Empreinte de l'image en cours de traitement : la fin du job ne met à jour que les
+    # utilisateurs qui l'attendent encore, quel que soit le process qui a reçu l'envoi
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('pending_picture', sa.String(length=64), nullable=True))
+        batch_op.create_index('ix_users_pending_picture', ['pending_picture'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.drop_index('ix_users_pending_picture')
+        batch_op.drop_column('pending_picture')
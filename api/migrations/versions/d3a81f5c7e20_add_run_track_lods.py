@@ -0,0 +1,39 @@
+"""add run track lods
+
+Revision ID: d3a81f5c7e20
+Revises: b52d7e9a4c18
+Create Date: 2026-10-18 11:26:05.731942
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd3a81f5c7e20'
+down_revision = 'b52d7e9a4c18'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Traces simplifiées précalculées par niveau de détail
+    op.create_table('run_track_lods',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('run_id', sa.Integer(), nullable=False),
+    sa.Column('max_points', sa.Integer(), nullable=False),
+    sa.Column('point_count', sa.Integer(), nullable=False),
+    sa.Column('source_points', sa.Integer(), nullable=False),
+    sa.Column('tolerance', sa.Float(), nullable=False),
+    sa.Column('polyline', sa.Text(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['run_id'], ['runs.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('run_id', 'max_points', name='uq_run_track_lods_run_id_max_points')
+    )
+    op.create_index('ix_run_track_lods_run_id', 'run_track_lods', ['run_id'])
+
+
+def downgrade():
+    op.drop_index('ix_run_track_lods_run_id', table_name='run_track_lods')
+    op.drop_table('run_track_lods')
@@ -0,0 +1,46 @@
+"""add run metrics
+
+Revision ID: f17c4b2e9d56
+Revises: d3a81f5c7e20
+Create Date: 2026-10-18 12:08:44.106327
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f17c4b2e9d56'
+down_revision = 'd3a81f5c7e20'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Métriques dérivées de la trace GPS (une ligne par course)
+    op.create_table('run_metrics',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('run_id', sa.Integer(), nullable=False),
+    sa.Column('version', sa.Integer(), nullable=False),
+    sa.Column('point_count', sa.Integer(), nullable=False),
+    sa.Column('distance', sa.Float(), nullable=False),
+    sa.Column('elapsed_time', sa.Float(), nullable=True),
+    sa.Column('moving_time', sa.Float(), nullable=True),
+    sa.Column('max_speed', sa.Float(), nullable=True),
+    sa.Column('avg_moving_speed', sa.Float(), nullable=True),
+    sa.Column('elevation_gain', sa.Float(), nullable=True),
+    sa.Column('elevation_loss', sa.Float(), nullable=True),
+    sa.Column('best_1k', sa.Float(), nullable=True),
+    sa.Column('best_5k', sa.Float(), nullable=True),
+    sa.Column('best_10k', sa.Float(), nullable=True),
+    sa.Column('splits', sa.JSON(), nullable=True),
+    sa.Column('pace_series', sa.JSON(), nullable=True),
+    sa.Column('computed_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['run_id'], ['runs.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('run_id')
+    )
+
+
+def downgrade():
+    op.drop_table('run_metrics')
@@ -0,0 +1,34 @@
+#!/usr/bin/env python3
+# scripts/backfill_stats_rollups.py
+import sys
+import os
+from datetime import date
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app
+from app.services.stats_rollups import backfill_rollups
+from app.services.route_leaderboard import rebuild_best_efforts
+from app.services.user_summary import rebuild_user_summaries
+
+def main():
+    """
+    Reconstruit les agrégats journaliers (user_daily_stats, route_daily_stats, histogrammes),
+    les meilleurs temps par itinéraire (route_best_efforts) et les résumés par utilisateur (user_summaries).
+    Usage : python scripts/backfill_stats_rollups.py [AAAA-MM-JJ [AAAA-MM-JJ]]
+    """
+    date_from = date.fromisoformat(sys.argv[1]) if len(sys.argv) > 1 else None
+    date_to = date.fromisoformat(sys.argv[2]) if len(sys.argv) > 2 else None
+
+    app = create_app()
+    with app.app_context():
+        print("🔄 Reconstruction des agrégats journaliers...")
+        rows = backfill_rollups(date_from, date_to)
+        print(f"🎉 {rows} ligne(s) d'agrégats écrites")
+        pairs = rebuild_best_efforts()
+        print(f"🏆 {pairs} meilleur(s) temps par itinéraire")
+        summaries = rebuild_user_summaries()
+        print(f"👤 {summaries['users']} résumé(s) utilisateur reconstruits")
+
+if __name__ == '__main__':
+    main()
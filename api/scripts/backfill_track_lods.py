@@ -0,0 +1,24 @@
+#!/usr/bin/env python3
+# scripts/backfill_track_lods.py
+import sys
+import os
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app
+from app.services.track_lod import backfill_track_lods
+
+def main():
+    """
+    Précalcule les niveaux de détail (run_track_lods) des courses terminées qui n'en ont pas.
+    Les nouvelles courses les reçoivent à l'arrêt ; GET /api/runs/<id>/track n'écrit jamais.
+    Usage : python scripts/backfill_track_lods.py
+    """
+    app = create_app()
+    with app.app_context():
+        print("🔄 Calcul des niveaux de détail manquants...")
+        runs = backfill_track_lods()
+        print(f"🗺️ {runs} course(s) mises à jour")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+# scripts/migrate_profile_pictures.py
+import sys
+import os
+import base64
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app, db
+from app.models.user import User
+from app.services.image_store import store_image, is_image_hash, purge_orphan_images
+
+BATCH_SIZE = 100
+
+def migrate_legacy_pictures():
+    """Remplace les images data:image/...;base64 des utilisateurs par leur hash dans le stockage d'images"""
+    migrated, failed = 0, 0
+    last_id = 0
+    while True:
+        users = User.query.filter(
+            User.id > last_id, User.profile_picture.like('data:image/%')
+        ).order_by(User.id).limit(BATCH_SIZE).all()
+        if not users:
+            break
+        for user in users:
+            last_id = user.id
+            try:
+                data = base64.b64decode(user.profile_picture.split(',', 1)[1])
+                user.profile_picture = store_image(data)
+                migrated += 1
+            except (IndexError, ValueError) as e:
+                print(f"⚠️ Image illisible pour {user.username}: {e}")
+                failed += 1
+        db.session.commit()
+    return migrated, failed
+
+def main():
+    """
+    Migre les images de profil encodées en base64 vers le stockage par empreinte (UPLOAD_FOLDER/images).
+    Usage : python scripts/migrate_profile_pictures.py [--purge]
+    --purge supprime aussi les fichiers qu'aucun utilisateur ne référence plus.
+    """
+    app = create_app()
+    with app.app_context():
+        print("🔄 Migration des images de profil...")
+        migrated, failed = migrate_legacy_pictures()
+        print(f"🎉 {migrated} image(s) migrée(s), {failed} en échec")
+
+        if '--purge' in sys.argv[1:]:
+            referenced = {
+                value for (value,) in db.session.query(User.profile_picture).filter(
+                    User.profile_picture.isnot(None)
+                )
+                if is_image_hash(value)
+            }
+            removed = purge_orphan_images(referenced)
+            print(f"🧹 {removed} image(s) orpheline(s) supprimée(s)")
+
+if __name__ == '__main__':
+    main()
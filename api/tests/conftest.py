@@ -0,0 +1,69 @@
+# tests/conftest.py
+import importlib
+import pkgutil
+import pytest
+from app import create_app, db
+from app import models as app_models
+
+def _reset_services(flask_app):
+    """Services à état global (un par process) rattachés à l'application du test, sans état hérité"""
+    from app.services.cache import stats_cache
+    from app.services.gps_ingestion import gps_ingestion
+    from app.services.live_runs import live_runs
+    from app.services.login_activity import login_activity
+    from app.services.image_pipeline import image_pipeline
+    from app.services.route_leaderboard import leaderboards
+    from app.services.token_revocation import revocation_store
+    from app.utils.auth import user_cache
+
+    for service in (gps_ingestion, login_activity, image_pipeline):
+        service._app = flask_app
+    with gps_ingestion._lock:
+        gps_ingestion._buffers.clear()
+    with stats_cache._lock:
+        stats_cache._entries.clear()
+        stats_cache._inflight.clear()
+        stats_cache._registered_on_read.clear()
+    live_runs.invalidate()
+    leaderboards.invalidate()
+    user_cache.invalidate()
+    with revocation_store._lock:
+        # Filtre reconstruit depuis la base du test au premier contrôle
+        revocation_store._bloom = None
+        revocation_store._lru.clear()
+
+@pytest.fixture
+def app(tmp_path):
+    flask_app = create_app(config={
+        'TESTING': True,
+        'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'test.db'}",
+        'UPLOAD_FOLDER': str(tmp_path / 'uploads')
+    })
+    with flask_app.app_context():
+        for module in pkgutil.iter_modules(app_models.__path__):
+            importlib.import_module(f'{app_models.__name__}.{module.name}')
+        db.create_all()
+        _reset_services(flask_app)
+        yield flask_app
+        db.session.remove()
+        db.engine.dispose()
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+@pytest.fixture
+def users(app):
+    """(admin, bob)"""
+    from app.models.user import User
+    admin = User(username='admin', email='admin@example.com', is_admin=True)
+    admin.set_password('Secret123')
+    bob = User(username='bob', email='bob@example.com')
+    bob.set_password('Secret123')
+    db.session.add_all([admin, bob])
+    db.session.commit()
+    return admin, bob
+
+def auth_headers(user):
+    from app.utils.auth import create_user_token
+    return {'Authorization': f'Bearer {create_user_token(user)}'}
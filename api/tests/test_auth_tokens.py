@@ -0,0 +1,41 @@
+# tests/test_auth_tokens.py
+
+def _login(client):
+    response = client.post('/api/auth/login', json={'username': 'bob', 'password': 'Secret123'})
+    assert response.status_code == 200
+    return response.get_json()['data']
+
+def _bearer(token):
+    return {'Authorization': f'Bearer {token}'}
+
+def test_refresh_rotates_and_rejects_a_reused_refresh_token(client, users):
+    tokens = _login(client)
+
+    response = client.post('/api/auth/refresh', headers=_bearer(tokens['refresh_token']))
+    assert response.status_code == 200
+    rotated = response.get_json()['data']
+    assert rotated['refresh_token'] != tokens['refresh_token']
+    assert client.get('/api/auth/validate', headers=_bearer(rotated['access_token'])).status_code == 200
+
+    # Refresh token déjà échangé : refusé, le nouveau reste valable
+    response = client.post('/api/auth/refresh', headers=_bearer(tokens['refresh_token']))
+    assert response.status_code == 401
+    assert response.get_json()['error_code'] == 'TOKEN_REVOKED'
+    assert client.post('/api/auth/refresh', headers=_bearer(rotated['refresh_token'])).status_code == 200
+
+def test_refresh_requires_a_refresh_token(client, users):
+    tokens = _login(client)
+    assert client.post('/api/auth/refresh', headers=_bearer(tokens['access_token'])).status_code == 401
+    # L'access token présenté n'a pas été consommé
+    assert client.get('/api/auth/validate', headers=_bearer(tokens['access_token'])).status_code == 200
+
+def test_logout_revokes_access_and_refresh_tokens(client, users):
+    tokens = _login(client)
+    response = client.post('/api/auth/logout', headers=_bearer(tokens['access_token']),
+                           json={'refresh_token': tokens['refresh_token']})
+    assert response.status_code == 200
+
+    response = client.get('/api/auth/validate', headers=_bearer(tokens['access_token']))
+    assert response.status_code == 401
+    assert response.get_json()['error_code'] == 'TOKEN_REVOKED'
+    assert client.post('/api/auth/refresh', headers=_bearer(tokens['refresh_token'])).status_code == 401
@@ -0,0 +1,96 @@
+# tests/test_cache.py
+import threading
+import time
+from app.services.cache import TwoTierCache
+from conftest import auth_headers
+
+def _in_threads(app, count, target):
+    """Lance target() dans count threads (contexte d'application chacun) et renvoie leurs résultats"""
+    results = [None] * count
+    barrier = threading.Barrier(count)
+
+    def run(index):
+        with app.app_context():
+            barrier.wait()
+            results[index] = target()
+
+    threads = [threading.Thread(target=run, args=(index,)) for index in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(timeout=10)
+    return results
+
+def test_concurrent_misses_compute_once(app):
+    cache = TwoTierCache(ttl=60)
+    calls = []
+
+    def compute():
+        calls.append(1)
+        time.sleep(0.3)
+        return {'total': 42}
+
+    results = _in_threads(app, 8, lambda: cache.get('single_flight:test', compute))
+    assert results == [{'total': 42}] * 8
+    assert len(calls) == 1
+    assert cache.stats()['single_flight']['recomputes'] == 1
+
+def test_stale_value_served_while_one_request_recomputes(app):
+    cache = TwoTierCache(ttl=60, stale_ttl=60)
+    cache.put('stale:test', {'value': 'old'}, ttl=0)
+    calls = []
+
+    def compute():
+        calls.append(1)
+        time.sleep(0.3)
+        return {'value': 'new'}
+
+    results = _in_threads(app, 4, lambda: cache.get('stale:test', compute, background=False))
+    # Le thread qui recalcule renvoie la nouvelle valeur, les autres la valeur périmée sans attendre
+    assert len(calls) == 1
+    assert results.count({'value': 'new'}) == 1
+    assert results.count({'value': 'old'}) == 3
+    assert cache.get('stale:test', compute) == {'value': 'new'}
+
+def test_invalidate_tags_drops_tagged_keys_from_both_tiers(app):
+    cache = TwoTierCache(ttl=60)
+    cache.put('tagged:runs', {'v': 1}, tags=('runs',))
+    cache.put('tagged:both', {'v': 2}, tags=('runs', 'users'))
+    cache.put('tagged:users', {'v': 3}, tags=('users',))
+
+    assert cache.invalidate_tags('runs') == 2
+    assert cache.peek('tagged:runs') is None
+    assert cache.peek('tagged:both') is None
+    assert cache.peek('tagged:users') == {'v': 3}
+    # Niveau mémoire vidé aussi : la valeur est recalculée
+    assert cache.get('tagged:runs', lambda: {'v': 10}) == {'v': 10}
+    assert cache.get('tagged:users', lambda: {'v': 30}) == {'v': 3}
+
+def test_memory_tier_is_lru_bounded(app):
+    cache = TwoTierCache(ttl=60, max_entries=2)
+    for index in range(3):
+        cache.put(f'lru:{index}', index)
+    cache.get('lru:1', lambda: None)
+    cache.put('lru:3', 3)
+    assert list(cache._entries) == ['lru:1', 'lru:3']
+    assert cache.memory_stats()['evictions'] == 2
+    # Entrée évincée de la mémoire : relue depuis la table
+    assert cache.get('lru:0', lambda: 'recalculé') == 0
+
+def test_cached_endpoint_is_recomputed_after_a_write(client, users):
+    from app.services.cache import stats_cache
+    admin, bob = users
+    headers = auth_headers(admin)
+
+    def recomputes():
+        return stats_cache.stats().get('dashboard_overview', {}).get('recomputes', 0)
+
+    before = recomputes()
+    assert client.get('/api/dashboard/overview', headers=headers).status_code == 200
+    assert client.get('/api/dashboard/overview', headers=headers).status_code == 200
+    assert recomputes() == before + 1
+
+    # Démarrer une course invalide le tag 'runs'
+    assert client.post('/api/runs/start', headers=auth_headers(bob), json={}).status_code == 201
+    assert client.get('/api/dashboard/overview', headers=headers).status_code == 200
+    assert recomputes() == before + 2
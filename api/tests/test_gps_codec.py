@@ -0,0 +1,65 @@
+# tests/test_gps_codec.py
+import json
+from app.utils.gps import dump_gps_data, parse_gps_data
+from app.utils.gps_codec import COMPACT_PREFIX, encode_track, decode_track, is_compact
+
+def _track(count=2000):
+    return [
+        {
+            'latitude': round(48.85 + i * 0.000013, 6),
+            'longitude': round(2.35 + i * 0.000021, 6),
+            'timestamp': 1760000000000 + i * 1000,
+            'altitude': round(35 + (i % 40) * 0.25, 2),
+            'speed': round(2.5 + (i % 7) * 0.1, 2),
+            'accuracy': 4.0
+        }
+        for i in range(count)
+    ]
+
+def test_round_trip_full_track():
+    points = _track()
+    encoded = encode_track(points)
+    assert encoded.startswith(COMPACT_PREFIX)
+    assert decode_track(encoded) == points
+    assert len(encoded) < len(json.dumps({'coordinates': points})) / 10
+
+def test_round_trip_mixed_optional_fields():
+    points = [
+        {'latitude': 48.8566, 'longitude': 2.3522, 'timestamp': 1760000000000, 'altitude': 35.5},
+        {'latitude': 48.8567, 'longitude': 2.3524},
+        {'latitude': 48.8568, 'longitude': 2.3526, 'timestamp': 1760000002000, 'speed': 3.1},
+        {'latitude': 48.8569, 'longitude': 2.3528, 'accuracy': 12.0},
+    ]
+    assert decode_track(encode_track(points)) == points
+    assert parse_gps_data(dump_gps_data(points)) == points
+
+def test_round_trip_single_fix_without_timestamp():
+    points = _track(2)
+    del points[1]['timestamp']
+    stored = dump_gps_data(points)
+    assert is_compact(stored)
+    assert parse_gps_data(stored) == points
+
+def test_round_trip_full_precision_values():
+    points = [
+        {'latitude': 48.856612345678, 'longitude': 2.352212345678, 'timestamp': 1760000000000, 'speed': 1 / 3},
+        {'latitude': 48.856712345678, 'longitude': 2.352312345678, 'timestamp': 1760000001000, 'speed': 2 / 3},
+    ]
+    assert decode_track(encode_track(points)) == points
+
+def test_extra_fields_fall_back_to_json():
+    points = _track(2)
+    points[0]['heartRate'] = 142
+    stored = dump_gps_data(points)
+    assert not is_compact(stored)
+    assert parse_gps_data(stored) == points
+
+def test_null_values_fall_back_to_json():
+    points = _track(2)
+    points[1]['altitude'] = None
+    stored = dump_gps_data(points)
+    assert not is_compact(stored)
+    assert parse_gps_data(stored) == points
+
+def test_empty_track():
+    assert decode_track(encode_track([])) == []
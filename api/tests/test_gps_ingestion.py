@@ -0,0 +1,75 @@
+# tests/test_gps_ingestion.py
+from app import db
+from app.models.run import Run
+from app.services.gps_ingestion import TrackAccumulator, append_gps_points, gps_ingestion
+from conftest import auth_headers
+
+def _points(start, count):
+    # ~11 m entre deux points, une seconde d'écart
+    return [
+        {'latitude': 48.85 + i * 0.0001, 'longitude': 2.35, 'timestamp': 1760000000000 + i * 1000}
+        for i in range(start, start + count)
+    ]
+
+def _start(client, headers):
+    response = client.post('/api/runs/start', headers=headers, json={})
+    assert response.status_code == 201
+    return response.get_json()['data']['id']
+
+def test_stop_uses_buffered_stats_for_a_single_worker_track(client, users):
+    _, bob = users
+    headers = auth_headers(bob)
+    run_id = _start(client, headers)
+    points = _points(0, 20)
+    client.post(f'/api/runs/{run_id}/locations', headers=headers, json={'locations': points})
+
+    data = client.post(f'/api/runs/{run_id}/stop', headers=headers, json={}).get_json()['data']
+    run = db.session.get(Run, run_id)
+    assert run.get_gps_points() == points
+    assert data['distance'] == round(TrackAccumulator.from_points(points).distance_m, 1)
+
+def test_stop_recomputes_stats_when_other_workers_appended_chunks(client, users):
+    _, bob = users
+    headers = auth_headers(bob)
+    run_id = _start(client, headers)
+
+    # 10 points reçus par ce process, 30 ajoutés directement par un autre worker
+    client.post(f'/api/runs/{run_id}/locations', headers=headers, json={'locations': _points(0, 10)})
+    gps_ingestion.flush(run_id)
+    append_gps_points(run_id, _points(10, 30))
+    db.session.commit()
+
+    data = client.post(f'/api/runs/{run_id}/stop', headers=headers, json={}).get_json()['data']
+    run = db.session.get(Run, run_id)
+    stored = run.get_gps_points()
+    assert len(stored) == 40
+    expected = TrackAccumulator.from_points(stored)
+    assert data['distance'] == round(expected.distance_m, 1)
+    assert data['max_speed'] == round(expected.max_speed_kmh, 2)
+    # Morceaux réécrits en une seule trace compacte
+    assert '.' not in run.gps_data
+
+def test_stop_recomputes_stats_when_another_worker_wrote_the_only_chunk(client, users):
+    _, bob = users
+    headers = auth_headers(bob)
+    run_id = _start(client, headers)
+    append_gps_points(run_id, _points(0, 15))
+    db.session.commit()
+
+    data = client.post(f'/api/runs/{run_id}/stop', headers=headers, json={}).get_json()['data']
+    assert data['distance'] == round(TrackAccumulator.from_points(_points(0, 15)).distance_m, 1)
+
+def test_points_flushed_after_stop_refresh_the_finished_run(client, users):
+    _, bob = users
+    headers = auth_headers(bob)
+    run_id = _start(client, headers)
+    client.post(f'/api/runs/{run_id}/locations', headers=headers, json={'locations': _points(0, 10)})
+    client.post(f'/api/runs/{run_id}/stop', headers=headers, json={})
+
+    # Tampon d'un autre worker vidé après l'arrêt
+    gps_ingestion.append(run_id, _points(10, 10))
+    gps_ingestion.flush_background()
+    db.session.expire_all()
+    run = db.session.get(Run, run_id)
+    assert len(run.get_gps_points()) == 20
+    assert run.distance == round(TrackAccumulator.from_points(run.get_gps_points()).distance_m, 1)
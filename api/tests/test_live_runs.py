@@ -0,0 +1,59 @@
+# tests/test_live_runs.py
+import threading
+from app import db
+from app.models.run import Run
+from app.services.live_runs import live_runs
+
+def _live_run(user):
+    run = Run(user_id=user.id, distance=0, status='in_progress')
+    db.session.add(run)
+    db.session.commit()
+    return run
+
+def test_resync_replays_starts_and_stops_received_during_the_query(app, users, monkeypatch):
+    _, bob = users
+    stopped = _live_run(bob)
+    live_runs.invalidate()
+
+    query = live_runs._query_entries
+    started = {}
+
+    def slow_query():
+        entries = query()
+        # Pendant la requête : fin d'une course lue comme en cours, départ d'une course absente du résultat
+        stopped.status = 'finished'
+        db.session.commit()
+        live_runs.run_stopped(stopped.id)
+        run = _live_run(bob)
+        live_runs.run_started(run)
+        started['id'] = run.id
+        return entries
+
+    monkeypatch.setattr(live_runs, '_query_entries', slow_query)
+    ids = {entry['id'] for entry in live_runs.active_runs()}
+    assert ids == {started['id']}
+
+def test_only_one_thread_resyncs_at_a_time(app, users, monkeypatch):
+    _, bob = users
+    run = _live_run(bob)
+    live_runs.invalidate()
+    assert [entry['id'] for entry in live_runs.active_runs()] == [run.id]
+
+    # Registre périmé : le thread qui relit la base bloque les autres seulement le temps de l'échange
+    live_runs._loaded_at -= 3600
+    query = live_runs._query_entries
+    calls = []
+    concurrent = []
+
+    def slow_query():
+        calls.append(1)
+        reader = threading.Thread(target=lambda: concurrent.append(live_runs.active_runs()))
+        reader.start()
+        reader.join(timeout=5)
+        assert not reader.is_alive()
+        return query()
+
+    monkeypatch.setattr(live_runs, '_query_entries', slow_query)
+    live_runs.active_runs()
+    assert len(calls) == 1
+    assert [entry['id'] for entry in concurrent[0]] == [run.id]
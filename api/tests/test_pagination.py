@@ -0,0 +1,61 @@
+# tests/test_pagination.py
+from datetime import datetime, timedelta
+import pytest
+from app import db
+from app.models.run import Run
+from app.utils.pagination import InvalidCursor, keyset_paginate
+from conftest import auth_headers
+
+def _runs(user, end_times):
+    start = datetime(2026, 10, 1, 8, 0)
+    runs = [Run(user_id=user.id, distance=1000, status='finished', start_time=start, end_time=end_time)
+            for end_time in end_times]
+    db.session.add_all(runs)
+    db.session.commit()
+    return runs
+
+def _all_pages(query, sort_column, descending, limit):
+    seen = []
+    cursor = None
+    while True:
+        items, pagination = keyset_paginate(query, sort_column, Run.id, cursor=cursor, limit=limit,
+                                            descending=descending)
+        seen.extend(run.id for run in items)
+        if not pagination['has_more']:
+            return seen
+        cursor = pagination['next_cursor']
+
+@pytest.mark.parametrize('descending', [True, False])
+@pytest.mark.parametrize('limit', [1, 2, 3])
+def test_cursor_walks_every_row_once_with_null_and_equal_sort_values(app, users, descending, limit):
+    _, bob = users
+    day = datetime(2026, 10, 1, 9, 0)
+    runs = _runs(bob, [None, day, None, day, day + timedelta(hours=1), None, day - timedelta(hours=1)])
+
+    # NULL est la plus petite valeur : en dernier en ordre décroissant, en premier en ordre croissant
+    def key(run):
+        return (run.end_time is not None, run.end_time or datetime.min, run.id)
+    expected = [run.id for run in sorted(runs, key=key, reverse=descending)]
+
+    assert _all_pages(Run.query, Run.end_time, descending, limit) == expected
+
+def test_invalid_cursor(app, users):
+    with pytest.raises(InvalidCursor):
+        keyset_paginate(Run.query, Run.start_time, Run.id, cursor='pas-un-curseur')
+
+def test_runs_listing_in_cursor_mode(client, users):
+    admin, bob = users
+    runs = _runs(bob, [None] * 5)
+    headers = auth_headers(admin)
+
+    ids = []
+    cursor = ''
+    while cursor is not None:
+        data = client.get(f'/api/runs?cursor={cursor}&limit=2', headers=headers).get_json()['data']
+        ids.extend(run['id'] for run in data['runs'])
+        cursor = data['pagination']['next_cursor']
+    # Même start_time partout : départage par id décroissant
+    assert ids == sorted((run.id for run in runs), reverse=True)
+
+    response = client.get('/api/runs?cursor=%%%&limit=2', headers=headers)
+    assert response.status_code == 400
@@ -0,0 +1,55 @@
+# tests/test_track_lod.py
+from app import db
+from app.models.track_lod import RunTrackLod
+from app.services.gps_ingestion import gps_ingestion
+from conftest import auth_headers
+
+def _points(start, count):
+    return [
+        {'latitude': 48.85 + i * 0.0001, 'longitude': 2.35 + (i % 7) * 0.00005, 'timestamp': 1760000000000 + i * 1000}
+        for i in range(start, start + count)
+    ]
+
+def _send(client, headers, run_id, points):
+    response = client.post(f'/api/runs/{run_id}/locations', headers=headers, json={'locations': points})
+    assert response.status_code in (200, 201, 202)
+    gps_ingestion.flush(run_id)
+
+def test_live_track_follows_stored_points_without_saving_lods(client, users):
+    _, bob = users
+    headers = auth_headers(bob)
+    run_id = client.post('/api/runs/start', headers=headers, json={}).get_json()['data']['id']
+
+    _send(client, headers, run_id, _points(0, 5))
+    track = client.get(f'/api/runs/{run_id}/track', headers=headers).get_json()['data']
+    assert track['source_points'] == 5
+    assert track['cached'] is False
+
+    _send(client, headers, run_id, _points(5, 45))
+    track = client.get(f'/api/runs/{run_id}/track', headers=headers).get_json()['data']
+    assert track['source_points'] == 50
+    assert track['cached'] is False
+    assert RunTrackLod.query.filter_by(run_id=run_id).count() == 0
+
+    assert client.post(f'/api/runs/{run_id}/stop', headers=headers, json={}).status_code == 200
+    track = client.get(f'/api/runs/{run_id}/track', headers=headers).get_json()['data']
+    assert track['source_points'] == 50
+    assert track['cached'] is True
+
+def test_finished_run_without_lods_is_not_written_on_read(client, users):
+    from app.models.run import Run
+    from app.services.track_lod import backfill_track_lods
+    _, bob = users
+    run = Run(user_id=bob.id, distance=500, duration=300, status='finished')
+    run.set_gps_points(_points(0, 20))
+    db.session.add(run)
+    db.session.commit()
+
+    track = client.get(f'/api/runs/{run.id}/track', headers=auth_headers(bob)).get_json()['data']
+    assert track['source_points'] == 20
+    assert track['cached'] is False
+    assert RunTrackLod.query.filter_by(run_id=run.id).count() == 0
+
+    assert backfill_track_lods() == 1
+    track = client.get(f'/api/runs/{run.id}/track', headers=auth_headers(bob)).get_json()['data']
+    assert track['cached'] is True
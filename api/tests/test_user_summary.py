@@ -0,0 +1,75 @@
+# tests/test_user_summary.py
+from app import db
+from app.models.user_summary import UserSummary
+from app.services import user_summary
+from conftest import auth_headers
+
+def _points(count, fast=0):
+    # ~11 m entre deux points, trois secondes d'écart (~13 km/h), deux pour les `fast` premiers
+    return [
+        {'latitude': 48.85 + i * 0.0001, 'longitude': 2.35,
+         'timestamp': 1760000000000 + i * 3000 - min(i, fast) * 1000}
+        for i in range(count)
+    ]
+
+def _stored(user_id):
+    db.session.expire_all()
+    row = db.session.get(UserSummary, user_id)
+    return {key: getattr(row, key) for key in user_summary.empty_summary(user_id)}
+
+def _recomputed(user_id):
+    connection = db.session.connection()
+    return user_summary.summarize_runs(user_id, user_summary._user_runs(connection, user_id))
+
+def _live_run(client, headers, points):
+    run_id = client.post('/api/runs/start', headers=headers, json={}).get_json()['data']['id']
+    client.post(f'/api/runs/{run_id}/locations', headers=headers, json={'locations': points})
+    # Durée envoyée par le client (la course du test dure moins d'une seconde d'horloge)
+    duration = (points[-1]['timestamp'] - points[0]['timestamp']) // 1000
+    assert client.post(f'/api/runs/{run_id}/stop', headers=headers, json={'duration': duration}).status_code == 200
+    return run_id
+
+def test_finishing_a_live_run_updates_the_summary_incrementally(client, users, monkeypatch):
+    _, bob = users
+    headers = auth_headers(bob)
+    _live_run(client, headers, _points(120))
+
+    full_refreshes = []
+    refresh = user_summary.refresh_user_summaries
+    monkeypatch.setattr(user_summary, 'refresh_user_summaries',
+                        lambda connection, user_ids: (full_refreshes.extend(user_ids), refresh(connection, user_ids)))
+
+    # Départ, fin de course (passage à « finished ») puis métriques GPS : aucun recalcul complet ;
+    # le premier kilomètre, plus rapide, devient le record mesuré
+    run_id = _live_run(client, headers, _points(150, fast=100))
+    assert full_refreshes == []
+
+    stored = _stored(bob.id)
+    expected = _recomputed(bob.id)
+    assert stored['runs_count'] == expected['runs_count'] == 2
+    assert stored['longest_run_id'] == run_id
+    assert stored['personal_records'] == expected['personal_records']
+    assert stored['personal_records']['1k']['run_id'] == run_id
+    assert stored['personal_records']['1k']['estimated'] is False
+    for key in ('total_distance', 'total_duration', 'avg_speed_sum', 'max_speed', 'month_distance'):
+        assert abs(stored[key] - expected[key]) < 1e-6
+    for key in ('avg_speed_count', 'total_calories', 'current_week_streak', 'month_runs'):
+        assert stored[key] == expected[key]
+
+def test_editing_a_finished_run_recomputes_the_summary(client, users, monkeypatch):
+    from app.models.run import Run
+    _, bob = users
+    headers = auth_headers(bob)
+    run_id = _live_run(client, headers, _points(120))
+
+    full_refreshes = []
+    refresh = user_summary.refresh_user_summaries
+    monkeypatch.setattr(user_summary, 'refresh_user_summaries',
+                        lambda connection, user_ids: (full_refreshes.extend(user_ids), refresh(connection, user_ids)))
+
+    run = db.session.get(Run, run_id)
+    run.distance = 500
+    db.session.commit()
+    assert full_refreshes == [bob.id]
+    assert _stored(bob.id)['total_distance'] == 500
+    assert _stored(bob.id)['personal_records'] == {}
@@ -18,10 +18,16 @@ import {
 import { ChartBarIcon } from '@heroicons/react/24/solid'
 import api from '../services/api'
 
+// Attente du traitement d'une image envoyée (réponse 202) : une requête par seconde, 1 minute au plus
+const IMAGE_JOB_POLL_MS = 1000
+const IMAGE_JOB_MAX_POLLS = 60
+
 const UserDetail = () => {
   const { userId } = useParams()
   const navigate = useNavigate()
   const fileInputRef = useRef(null)
+  // Faux après démontage : arrête l'attente d'un traitement d'image en cours
+  const mountedRef = useRef(true)
   
   // États React
   const [user, setUser] = useState(null)
@@ -36,6 +42,13 @@ const UserDetail = () => {
   const [saving, setSaving] = useState(false)
   const [showDeleteModal, setShowDeleteModal] = useState(false)
 
+  useEffect(() => {
+    mountedRef.current = true
+    return () => {
+      mountedRef.current = false
+    }
+  }, [])
+
   const formatDuration = (seconds) => {
     const hours = Math.floor(seconds / 3600)
     const minutes = Math.floor((seconds % 3600) / 60)
@@ -128,10 +141,29 @@ const UserDetail = () => {
         },
       })
 
+      let data = response.data.data
+      // 202 : image en cours de traitement, attendre la fin du job (au plus IMAGE_JOB_MAX_POLLS fois)
+      let polls = 0
+      while (response.status === 202 && data.status === 'processing') {
+        if (polls >= IMAGE_JOB_MAX_POLLS) {
+          setUploadError('Le traitement de l\'image prend plus de temps que prévu, rechargez la page plus tard')
+          return
+        }
+        await new Promise(resolve => setTimeout(resolve, IMAGE_JOB_POLL_MS))
+        if (!mountedRef.current) return
+        data = (await api.users.getImageJob(data.job_id)).data.data
+        if (!mountedRef.current) return
+        polls += 1
+      }
+      if (data.status === 'failed') {
+        setUploadError(data.error || 'Erreur lors du traitement de l\'image')
+        return
+      }
+
       if (response.data.status === 'success') {
         setUser(prev => ({
           ...prev,
-          profile_picture: response.data.data.profile_picture
+          profile_picture: data.image ? data.image.profile_picture : data.profile_picture
         }))
         setUploadError(null)
       }
@@ -139,7 +171,7 @@ const UserDetail = () => {
       console.error('Erreur upload image:', error)
       setUploadError(error.response?.data?.message || 'Erreur lors de l\'upload de l\'image')
     } finally {
-      setUploadLoading(false)
+      if (mountedRef.current) setUploadLoading(false)
     }
   }
 
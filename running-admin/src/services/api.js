@@ -158,11 +158,15 @@ const auth = {
   
   register: (userData) => instance.post('/api/auth/register', userData),
   
-  logout: () => instance.post('/api/auth/logout'),
+  // Révoque le token courant et, s'il est fourni, le refresh token de la session
+  logout: (refreshToken) => instance.post('/api/auth/logout', refreshToken ? { refresh_token: refreshToken } : {}),
   
   validateToken: () => instance.get('/api/auth/validate'),
   
-  refreshToken: () => instance.post('/api/auth/refresh'),
+  // Avec un refresh token : rotation (nouveau couple access_token / refresh_token, l'ancien est révoqué)
+  refreshToken: (refreshToken) => instance.post('/api/auth/refresh', null, refreshToken
+    ? { headers: { Authorization: `Bearer ${refreshToken}` } }
+    : undefined),
   
   changePassword: (currentPassword, newPassword) => 
     instance.post('/api/auth/change-password', { currentPassword, newPassword }),
@@ -195,7 +199,10 @@ const users = {
   uploadAvatar: (userId, formData) => 
     instance.post(`/api/users/${userId}/avatar`, formData, {
       headers: { 'Content-Type': 'multipart/form-data' }
-    })
+    }),
+  
+  // Traitement d'une image envoyée (réponse 202) : processing, done ou failed
+  getImageJob: (jobId) => instance.get(`/api/uploads/jobs/${jobId}`)
 }
 
 // Service courses/runs
@@ -273,6 +280,25 @@ const admin = {
   }
 }
 
+// Service statistiques
+const stats = {
+  // Résumé de l'utilisateur connecté : totaux, records, plus longue course, série, mois en cours
+  getSummary: () => instance.get('/api/stats'),
+  
+  // Série compacte { labels, values } : metric, bucket (day|week|month), from, to, user_id, route_id
+  // Réponse avec ETag : le navigateur revalide sans retélécharger si rien n'a changé
+  getSeries: (params = {}) => {
+    const queryParams = new URLSearchParams(params)
+    return instance.get(`/api/stats/series?${queryParams}`)
+  },
+  
+  // Percentiles et histogramme : metric (pace|distance|heart_rate), from, to, user_id, route_id
+  getDistribution: (params = {}) => {
+    const queryParams = new URLSearchParams(params)
+    return instance.get(`/api/stats/distribution?${queryParams}`)
+  }
+}
+
 // Service de santé/test de l'API
 const health = {
   check: () => instance.get('/api/health'),
@@ -345,6 +371,7 @@ const api = {
   runs,
   routes,
   admin,
+  stats,
   health,
   utils,
   // Instance axios pour accès direct si nécessaire